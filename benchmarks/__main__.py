@@ -0,0 +1,84 @@
+"""Run the micro-benchmark suite.
+
+Usage:
+    python -m benchmarks [--filter REGEX] [--output results.json] [--compare baseline.json] [--threshold 0.1]
+
+Examples:
+    # Save a baseline, then compare a later run against it.
+    python -m benchmarks --output baseline.json
+    python -m benchmarks --compare baseline.json --fail-on-regression
+
+    # Only the key-value formatter benchmarks, quickly.
+    python -m benchmarks --filter "formatter=key_value" --quick
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from . import cases  # noqa: F401  (registers the benchmarks)
+from .suite import (
+    BenchmarkReport,
+    BenchmarkResult,
+    case_key,
+    compare_reports,
+    format_seconds,
+    registered_benchmarks,
+    run_benchmarks,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--filter", help="Only run the cases whose key (e.g. 'value_parse[formatter=json,...]') matches."
+    )
+    parser.add_argument("--list", action="store_true", help="List the cases without running them.")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of rounds per case.")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum duration of a round, in seconds.")
+    parser.add_argument("--quick", action="store_true", help="Shortcut for --rounds 3 --min-time 0.01.")
+    parser.add_argument("--output", help="Save the results as JSON to this file.")
+    parser.add_argument("--compare", help="Compare the results with a JSON file saved by --output.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown reported as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression.")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.rounds, args.min_time = 3, 0.01
+
+    benchmarks = registered_benchmarks()
+    if args.list:
+        for bench in benchmarks:
+            for params in bench.cases():
+                print(case_key(bench.name, params))
+        return 0
+
+    def print_result(result: BenchmarkResult) -> None:
+        print(f"{result.key():<72} {format_seconds(result.median)} ± {format_seconds(result.stdev)}", flush=True)
+
+    report = run_benchmarks(
+        benchmarks, pattern=args.filter, rounds=args.rounds, min_time=args.min_time, on_result=print_result
+    )
+
+    if args.output:
+        report.to_json_file(args.output, indent=2)
+        print(f"\nSaved {len(report.results)} results to {args.output}")
+
+    if args.compare:
+        baseline = BenchmarkReport.from_json_file(args.compare)
+        comparisons = compare_reports(baseline, report)
+        regressions = [c for c in comparisons if c.is_regression(args.threshold)]
+        print(f"\nCompared with {args.compare} ({baseline.created_at}, Python {baseline.python})")
+        for c in comparisons:
+            mark = "REGRESSION" if c in regressions else ""
+            print(f"{c.key:<72} {format_seconds(c.baseline)} -> {format_seconds(c.current)} {c.ratio:6.2f}x {mark}")
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} in {len(comparisons)} compared case(s)")
+        if regressions and args.fail_on_regression:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
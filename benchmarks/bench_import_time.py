@@ -0,0 +1,49 @@
+"""Benchmark the wall-clock time of importing promptogen in a fresh interpreter.
+
+Each statement is run in a new subprocess so no module is cached between runs. The time of a bare interpreter start is
+reported as a baseline and subtracted from the other measurements.
+
+Usage:
+    python -m benchmarks.bench_import_time [--repeat 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+
+STATEMENTS = [
+    "import promptogen",
+    "import promptogen.prompt_collection",
+    "from promptogen import Prompt",
+    "from promptogen import PromptFormatter, KeyValuePromptFormatter",
+    "from promptogen.prompt_collection import PromptCollection",
+    "from promptogen.prompt_collection import PromptCollection; PromptCollection(load_predefined=True)",
+]
+
+
+def measure(statement: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = measure("pass", args.repeat)
+    print(f"{'interpreter start (baseline)':<100} {baseline * 1000:8.2f} ms")
+    for statement in STATEMENTS:
+        elapsed = measure(statement, args.repeat) - baseline
+        print(f"{statement:<100} {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark Prompt.rename_input_parameter / rename_output_parameter on prompts with many examples.
+
+The legacy implementation (deep copy of every example, then a deep copy of the whole prompt) is kept here as a
+reference so the improvement of the structural-sharing implementation can be measured.
+
+Usage:
+    python -m benchmarks.bench_prompt_rename [--examples 10000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable
+
+from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
+
+
+def make_prompt(num_examples: int) -> Prompt:
+    return Prompt(
+        name="bench",
+        description="benchmark prompt",
+        input_parameters=[
+            ParameterInfo(name="text", description="text"),
+            ParameterInfo(name="categories", description="categories"),
+        ],
+        output_parameters=[ParameterInfo(name="category", description="category")],
+        template=IOExample(input={"text": "text", "categories": ["a", "b"]}, output={"category": "a"}),
+        examples=[
+            IOExample(
+                input={"text": f"example text {i}" * 10, "categories": ["a", "b", "c"]},
+                output={"category": "a"},
+            )
+            for i in range(num_examples)
+        ],
+    )
+
+
+def legacy_rename_input_parameter(prompt: Prompt, old_name: str, new_name: str) -> Prompt:
+    input_parameters = [param.copy_me() for param in prompt.input_parameters]
+    for parameter in input_parameters:
+        if parameter.name == old_name:
+            parameter.name = new_name
+            break
+    template = prompt.template.copy_me()
+    template.input[new_name] = template.input.pop(old_name)
+    examples = []
+    for example in prompt.examples:
+        example = example.copy_me()
+        example.input[new_name] = example.input.pop(old_name)
+        examples.append(example)
+    return prompt.update(input_parameters=input_parameters, template=template, examples=examples)
+
+
+def measure(name: str, f: Callable[[], Prompt], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    print(f"{name:<10} best of {repeat}: {best * 1000:9.2f} ms, peak allocations: {peak / 1024 / 1024:8.2f} MiB")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    prompt = make_prompt(args.examples)
+    print(f"rename_input_parameter on a prompt with {args.examples} examples")
+    legacy = measure("legacy", lambda: legacy_rename_input_parameter(prompt, "text", "body"), args.repeat)
+    current = measure("current", lambda: prompt.rename_input_parameter("text", "body"), args.repeat)
+    print(f"speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
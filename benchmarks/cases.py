@@ -0,0 +1,251 @@
+"""The benchmarks of the micro-benchmark suite.
+
+Importing this module registers the benchmarks. Every benchmark runs offline and builds its inputs in its setup
+function, outside of the timed callable.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import tempfile
+from ast import literal_eval
+from typing import Any, Callable, Dict, List, Tuple
+
+from promptogen.model.output_schema import OutputSchema
+from promptogen.model.prompt import IOExample, ParameterInfo, Prompt, load_prompt_from_json_string
+from promptogen.model.value_formatter import Value, ValueFormatter
+from promptogen.prompt_formatter.json_formatter import (
+    JsonPromptFormatter,
+    JsonValueFormatter,
+    find_code_block,
+    with_code_block,
+)
+from promptogen.prompt_formatter.key_value_formatter import KeyValueFormatter, KeyValuePromptFormatter
+from promptogen.prompt_formatter.literal_parser import LiteralParser
+from promptogen.prompt_formatter.prompt_formatter import PromptFormatter
+
+from .suite import benchmark
+
+EXAMPLES = [0, 10, 100, 1000]
+VALUE_SIZES = [10, 1000, 100000]
+DEPTHS = [1, 4, 16]
+FORMATTERS = ["json", "key_value"]
+JSON_CODECS = ["stdlib"] + [name for name in ["orjson", "ujson"] if importlib.util.find_spec(name) is not None]
+
+_tmpdir = tempfile.TemporaryDirectory(prefix="promptogen-bench-")
+
+_value_formatters: Dict[str, Callable[[], ValueFormatter]] = {
+    "json": JsonValueFormatter,
+    "key_value": KeyValueFormatter,
+}
+
+_prompt_formatters: Dict[str, Callable[..., PromptFormatter]] = {
+    "json": JsonPromptFormatter,
+    "key_value": KeyValuePromptFormatter,
+}
+
+
+def make_prompt(num_examples: int) -> Prompt:
+    """Create a classification prompt with the given number of examples."""
+    return Prompt(
+        name="bench",
+        description="Classify the text into one of the categories.",
+        input_parameters=[
+            ParameterInfo(name="text", description="The text to classify."),
+            ParameterInfo(name="categories", description="The candidate categories."),
+        ],
+        output_parameters=[
+            ParameterInfo(name="reason", description="The reason for the classification."),
+            ParameterInfo(name="category", description="The category of the text."),
+        ],
+        template=IOExample(
+            input={"text": "text", "categories": ["a", "b"]},
+            output={"reason": "reason", "category": "a"},
+        ),
+        examples=[
+            IOExample(
+                input={"text": f"This is the example text number {i}.", "categories": ["a", "b", "c"]},
+                output={"reason": f"Because of the number {i}.", "category": "abc"[i % 3]},
+            )
+            for i in range(num_examples)
+        ],
+    )
+
+
+def make_value(size: int, depth: int) -> Value:
+    """Create an output value with a string of `size` characters and a dict nested `depth` levels deep."""
+    nested: Any = {"text": "x" * size, "numbers": [1, 2, 3], "ratio": 0.5, "done": True, "note": None}
+    for i in range(depth - 1):
+        nested = {f"level{i}": nested, "items": ["a", "b"]}
+    return {"reason": "x" * size, "detail": nested}
+
+
+def _output_keys(value: Value) -> List[Tuple[str, type]]:
+    return [(key, type(v)) for key, v in value.items()]
+
+
+@benchmark(formatter=FORMATTERS, examples=EXAMPLES, cached=[False, True])
+def format_prompt(formatter: str, examples: int, cached: bool):
+    """Only FrozenPrompts are cached; a cache hit should cost the same whatever the number of examples."""
+    prompt_formatter = _prompt_formatters[formatter](prefix_cache_size=128 if cached else 0)
+    prompt = make_prompt(examples).freeze() if cached else make_prompt(examples)
+    input_value = {"text": "The text to classify.", "categories": ["a", "b", "c"]}
+    return lambda: prompt_formatter.format_prompt(prompt, input_value)
+
+
+@benchmark(examples=EXAMPLES)
+def format_prompt_prefix_cache_hit(examples: int):
+    """The lookup of a cached prefix alone, which should not depend on the number of examples."""
+    prompt_formatter = JsonPromptFormatter()
+    prompt = make_prompt(examples).freeze()
+    prompt_formatter.format_prompt_prefix(prompt)
+    return lambda: prompt_formatter.format_prompt_prefix(prompt)
+
+
+@benchmark(formatter=FORMATTERS, examples=[20, 200], frozen=[False, True], validate=[False, True])
+def prompt_formatter_parse(formatter: str, examples: int, frozen: bool, validate: bool):
+    """The whole parse path of PromptFormatter, including the lookup of the output keys or schema of the prompt."""
+    prompt_formatter = _prompt_formatters[formatter](validate_output=validate)
+    prompt = make_prompt(examples).freeze() if frozen else make_prompt(examples)
+    output = prompt_formatter.output_formatter.format({"reason": "Because of the number 1.", "category": "b"})
+    return lambda: prompt_formatter.parse(prompt, output)
+
+
+@benchmark(formatter=FORMATTERS, size=VALUE_SIZES, depth=DEPTHS)
+def value_format(formatter: str, size: int, depth: int):
+    value_formatter = _value_formatters[formatter]()
+    value = make_value(size, depth)
+    return lambda: value_formatter.format(value)
+
+
+@benchmark(formatter=FORMATTERS, size=VALUE_SIZES, depth=DEPTHS)
+def value_parse(formatter: str, size: int, depth: int):
+    value_formatter = _value_formatters[formatter]()
+    value = make_value(size, depth)
+    output_keys = _output_keys(value)
+    output = value_formatter.format(value)
+    return lambda: value_formatter.parse(output_keys, output)
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_validate(examples: int):
+    d = make_prompt(examples).to_dict()
+    return lambda: Prompt.from_dict(d)
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_rename_input_parameter(examples: int):
+    prompt = make_prompt(examples)
+    return lambda: prompt.rename_input_parameter("text", "body")
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_rename_output_parameter(examples: int):
+    prompt = make_prompt(examples)
+    return lambda: prompt.rename_output_parameter("category", "label")
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_copy_me(examples: int):
+    return make_prompt(examples).copy_me
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_json_dump(examples: int):
+    return make_prompt(examples).model_dump_json
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_json_load(examples: int):
+    s = make_prompt(examples).model_dump_json()
+    return lambda: load_prompt_from_json_string(s)
+
+
+@benchmark(examples=EXAMPLES)
+def prompt_json_file_roundtrip(examples: int):
+    prompt = make_prompt(examples)
+    filename = os.path.join(_tmpdir.name, f"prompt-{examples}.json")
+
+    def roundtrip() -> Prompt:
+        prompt.to_json_file(filename)
+        return Prompt.from_json_file(filename)
+
+    return roundtrip
+
+
+@benchmark(size=VALUE_SIZES, depth=DEPTHS)
+def stdlib_json_roundtrip(size: int, depth: int):
+    """Reference point for value_format/value_parse: the cost of json alone."""
+    value = make_value(size, depth)
+    return lambda: json.loads(json.dumps(value, ensure_ascii=False, indent=1))
+
+
+@benchmark(codec=JSON_CODECS, compact=[False, True], size=VALUE_SIZES, depth=DEPTHS)
+def json_value_format(codec: str, compact: bool, size: int, depth: int):
+    value_formatter = JsonValueFormatter(codec=codec, compact=compact)
+    value = make_value(size, depth)
+    return lambda: value_formatter.format(value)
+
+
+@benchmark(codec=JSON_CODECS, size=VALUE_SIZES, depth=DEPTHS)
+def json_value_parse(codec: str, size: int, depth: int):
+    value_formatter = JsonValueFormatter(codec=codec)
+    value = make_value(size, depth)
+    output_keys = _output_keys(value)
+    output = value_formatter.format(value)
+    return lambda: value_formatter.parse(output_keys, output)
+
+
+@benchmark(codec=JSON_CODECS, examples=[10, 1000])
+def json_value_format_models(codec: str, examples: int):
+    """Values holding DataClass leaves, which the encoders convert while encoding."""
+    value_formatter = JsonValueFormatter(codec=codec)
+    value = {"examples": make_prompt(examples).examples}
+    return lambda: value_formatter.format(value)
+
+
+def _remove_code_block_by_replace(language: str, s: str) -> str:
+    """The previous implementation of remove_code_block, kept as the baseline of code_block_extract."""
+    return s.replace(f"```{language}", "").replace("```", "").strip()
+
+
+def _extract_code_block_by_scan(language: str, s: str) -> str:
+    start, end = find_code_block(language, s, strict=False)
+    return s[start:end]
+
+
+_code_block_extractors: Dict[str, Callable[[str, str], str]] = {
+    "replace": _remove_code_block_by_replace,
+    "scan": _extract_code_block_by_scan,
+}
+
+
+@benchmark(impl=["replace", "scan"], size=[1000, 1000000, 4000000])
+def code_block_extract(impl: str, size: int):
+    extract = _code_block_extractors[impl]
+    output = "Here is the output:\n" + with_code_block("json", json.dumps({"text": "x" * size})) + "\n"
+    return lambda: extract("json", output)
+
+
+@benchmark(size=VALUE_SIZES, depth=DEPTHS)
+def output_schema_validate(size: int, depth: int):
+    value = make_value(size, depth)
+    schema = OutputSchema(value)
+    return lambda: schema.validate(value)
+
+
+_literal_parsers: Dict[str, Callable[[str], Any]] = {
+    "literal_eval": literal_eval,
+    "literal_parser": LiteralParser().parse,
+}
+
+
+@benchmark(impl=["literal_eval", "literal_parser"], style=["json", "python"], items=[10, 1000, 100000])
+def literal_parse(impl: str, style: str, items: int):
+    parse = _literal_parsers[impl]
+    # no booleans or nulls, which literal_eval cannot read in JSON
+    value = [{"id": i, "name": f"item {i}", "score": i / 3, "tags": ["a", "b"]} for i in range(items)]
+    s = json.dumps(value) if style == "json" else repr(value)
+    return lambda: parse(s)
@@ -0,0 +1,258 @@
+"""A small, dependency-free micro-benchmark runner.
+
+Benchmarks are registered with the `benchmark` decorator on a setup function. The setup function is called once per
+combination of parameters and returns the zero-argument callable to time, so that building inputs is never measured.
+
+    @benchmark(examples=[10, 100])
+    def copy_me(examples: int):
+        prompt = make_prompt(examples)
+        return prompt.copy_me
+"""
+
+from __future__ import annotations
+
+import itertools
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from promptogen.model.dataclass import DataClass
+
+Setup = Callable[..., Callable[[], Any]]
+
+
+class Benchmark:
+    """A benchmark, parameterized by the cartesian product of its parameter values.
+
+    Args:
+        name: The name of the benchmark.
+        setup: A function that takes the parameters as keyword arguments and returns the callable to time.
+        params: The values of each parameter.
+    """
+
+    name: str
+    setup: Setup
+    params: Dict[str, List[Any]]
+
+    def __init__(self, name: str, setup: Setup, params: Dict[str, List[Any]]):
+        self.name = name
+        self.setup = setup
+        self.params = params
+
+    def cases(self) -> Iterator[Dict[str, Any]]:
+        """Yield the parameters of each case of the benchmark."""
+        keys = list(self.params)
+        for values in itertools.product(*(self.params[key] for key in keys)):
+            yield dict(zip(keys, values))
+
+
+_registry: List[Benchmark] = []
+
+
+def benchmark(name: Optional[str] = None, **params: List[Any]) -> Callable[[Setup], Setup]:
+    """Register a setup function as a benchmark.
+
+    Args:
+        name: The name of the benchmark. Defaults to the name of the setup function.
+        **params: The values of each parameter of the benchmark.
+    """
+
+    def decorator(setup: Setup) -> Setup:
+        _registry.append(Benchmark(name or setup.__name__, setup, params))
+        return setup
+
+    return decorator
+
+
+def registered_benchmarks() -> List[Benchmark]:
+    """Return the registered benchmarks, in registration order."""
+    return list(_registry)
+
+
+class BenchmarkResult(DataClass):
+    """The timing of one case of a benchmark.
+
+    Attributes:
+        name: The name of the benchmark.
+        params: The parameters of the case.
+        number: The number of calls per round.
+        rounds: The number of rounds.
+        min: The fastest time per call, in seconds.
+        median: The median time per call, in seconds.
+        mean: The mean time per call, in seconds.
+        stdev: The standard deviation of the time per call, in seconds.
+    """
+
+    name: str
+    params: Dict[str, Any]
+    number: int
+    rounds: int
+    min: float
+    median: float
+    mean: float
+    stdev: float
+
+    def key(self) -> str:
+        """Return a string that identifies the case, used to match results across reports."""
+        return case_key(self.name, self.params)
+
+
+def case_key(name: str, params: Dict[str, Any]) -> str:
+    """Return a string that identifies a case of a benchmark, e.g. `format_prompt[examples=10]`."""
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+class BenchmarkReport(DataClass):
+    """The results of a benchmark run, together with the environment it ran in."""
+
+    created_at: str
+    python: str
+    platform: str
+    results: List[BenchmarkResult]
+
+
+def time_callable(f: Callable[[], Any], *, rounds: int = 5, min_time: float = 0.05) -> Tuple[int, List[float]]:
+    """Time a callable.
+
+    The number of calls per round is increased until a round takes at least `min_time` seconds, so that the timer
+    resolution does not dominate fast operations. The callable is called once before timing to warm up caches.
+
+    Args:
+        f: The callable to time.
+        rounds: The number of rounds.
+        min_time: The minimum duration of a round, in seconds.
+
+    Returns:
+        The number of calls per round, and the time per call of each round in seconds.
+    """
+    f()
+    number = 1
+    while True:
+        elapsed = _time_round(f, number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed / number]
+    for _ in range(rounds - 1):
+        timings.append(_time_round(f, number) / number)
+    return number, timings
+
+
+def _time_round(f: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        f()
+    return time.perf_counter() - start
+
+
+def run_benchmarks(
+    benchmarks: Sequence[Benchmark],
+    *,
+    pattern: Optional[str] = None,
+    rounds: int = 5,
+    min_time: float = 0.05,
+    on_result: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> BenchmarkReport:
+    """Run benchmarks and collect their results.
+
+    Args:
+        benchmarks: The benchmarks to run.
+        pattern: A regular expression; only the cases whose key matches it are run.
+        rounds: The number of rounds per case.
+        min_time: The minimum duration of a round, in seconds.
+        on_result: A function called with each result as soon as it is available.
+
+    Returns:
+        The report of the run.
+    """
+    regex = re.compile(pattern) if pattern else None
+    results = []
+    for bench in benchmarks:
+        for params in bench.cases():
+            key = case_key(bench.name, params)
+            if regex is not None and not regex.search(key):
+                continue
+
+            f = bench.setup(**params)
+            number, timings = time_callable(f, rounds=rounds, min_time=min_time)
+            result = BenchmarkResult(
+                name=bench.name,
+                params=params,
+                number=number,
+                rounds=len(timings),
+                min=min(timings),
+                median=statistics.median(timings),
+                mean=statistics.mean(timings),
+                stdev=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            )
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    return BenchmarkReport(
+        created_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        results=results,
+    )
+
+
+class Comparison(DataClass):
+    """The change of a case between a baseline report and a current report.
+
+    Attributes:
+        key: The key of the case.
+        baseline: The baseline median time per call, in seconds.
+        current: The current median time per call, in seconds.
+        ratio: current / baseline.
+    """
+
+    key: str
+    baseline: float
+    current: float
+    ratio: float
+
+    def is_regression(self, threshold: float) -> bool:
+        """Return whether the case became slower by more than the given fraction."""
+        return self.ratio > 1 + threshold
+
+
+def compare_reports(baseline: BenchmarkReport, current: BenchmarkReport) -> List[Comparison]:
+    """Compare the median times of the cases found in both reports.
+
+    Args:
+        baseline: The report to compare against.
+        current: The new report.
+
+    Returns:
+        The comparison of each case of the current report that is also in the baseline.
+    """
+    baseline_medians = {result.key(): result.median for result in baseline.results}
+    comparisons = []
+    for result in current.results:
+        key = result.key()
+        if key not in baseline_medians:
+            continue
+        base = baseline_medians[key]
+        comparisons.append(
+            Comparison(
+                key=key,
+                baseline=base,
+                current=result.median,
+                ratio=result.median / base if base > 0 else float("inf"),
+            )
+        )
+    return comparisons
+
+
+def format_seconds(seconds: float) -> str:
+    """Format a duration with a unit that fits its magnitude."""
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
@@ -1,28 +1,38 @@
-import time
 from typing import List
 
+import openai
 import typer
 
 import promptogen as pg
-
-# from tenacity import retry, stop_after_attempt
 from examples.base import make_output_path
 from examples.classification.dataset_loader import DatasetLoader, IMDbSentimentDataset, TweetEvalEmotionDataset
 from examples.llm.openai_util import OpenAITextLLM
+from promptogen.evaluation import EvaluationStats, Evaluator, ExampleResult, key_match
+from promptogen.model.retry_policy import RetryPolicy
+from promptogen.text_llm import RateLimiter
 
 app = typer.Typer(add_completion=True)
 
+max_concurrency_option = typer.Option(8, help="Maximum number of requests in flight.")
+requests_per_second_option = typer.Option(1.0, help="Maximum number of requests started per second.")
+
 
 @app.command("tweet_eval_emotion")
-def run_tweet_eval_emotion():
+def run_tweet_eval_emotion(
+    max_concurrency: int = max_concurrency_option,
+    requests_per_second: float = requests_per_second_option,
+):
     dataset = TweetEvalEmotionDataset(seed=43)
-    benchmark_by_dataset(dataset)
+    benchmark_by_dataset(dataset, max_concurrency, requests_per_second)
 
 
 @app.command("imdb_sentiment")
-def run_imdb_sentiment():
+def run_imdb_sentiment(
+    max_concurrency: int = max_concurrency_option,
+    requests_per_second: float = requests_per_second_option,
+):
     dataset = IMDbSentimentDataset(seed=43)
-    benchmark_by_dataset(dataset)
+    benchmark_by_dataset(dataset, max_concurrency, requests_per_second)
 
 
 formatter = pg.KeyValuePromptFormatter()
@@ -30,47 +40,53 @@ llm = OpenAITextLLM(model="gpt-3.5-turbo-16k")
 prompt_runner = pg.TextLLMPromptRunner(llm=llm, formatter=formatter)
 
 
-def run_benchmark_prompt(prompt_to_test: pg.Prompt, test_examples: List[pg.IOExample], output_key: str):
-    total = 0
-    correct = 0
-
-    for example in test_examples:
-        time.sleep(3)
-
-        # @retry(stop=stop_after_attempt(2))
-        def f() -> pg.Value:
-            return prompt_runner.run_prompt(prompt_to_test, example.input)
-
-        try:
-            resp = f()
-        except Exception as e:
-            print(f"Error: {e}; skipping...")
-            total += 1
-            continue
-
-        total += 1
-
-        got = resp[output_key]
-        expected = example.output[output_key]
-
-        if got == expected:
-            correct += 1
-        else:
-            print(f"got {got} expected {expected}, input: {example.input}")
-
-        print(f"Total: {total}, Correct: {correct}, Accuracy: {correct/total}")
-
-
-def benchmark_by_dataset(dataset: DatasetLoader):
-    # dataset = TweetEvalEmotionDataset(seed=43)
-    dataset = IMDbSentimentDataset(seed=43)
+def run_benchmark_prompt(
+    prompt_to_test: pg.Prompt,
+    test_examples: List[pg.IOExample],
+    output_key: str,
+    max_concurrency: int,
+    requests_per_second: float,
+):
+    evaluator = Evaluator(
+        prompt_runner,
+        {"accuracy": key_match(output_key)},
+        max_concurrency=max_concurrency,
+        rate_limiter=RateLimiter(requests_per_minute=requests_per_second * 60),
+        retry_policy=RetryPolicy(
+            max_attempts=2,
+            transport_errors=(openai.error.APIConnectionError, openai.error.RateLimitError, openai.error.Timeout),
+            retry_on_parse_error=False,
+        ),
+    )
+
+    def on_result(result: ExampleResult, stats: EvaluationStats):
+        if result.error is not None:
+            print(f"Error: {result.error}; skipping...")
+        elif result.scores["accuracy"] < 1.0 and result.output is not None:
+            got = result.output.get(output_key)
+            expected = result.example.output[output_key]
+            print(f"got {got} expected {expected}, input: {result.example.input}")
+        print(
+            f"[{stats.completed}/{stats.total}] accuracy: {stats.scores['accuracy']:.3f}, "
+            f"errors: {stats.errors}, latency p50/p95: {stats.latency_p50:.2f}s/{stats.latency_p95:.2f}s"
+        )
+
+    report = evaluator.evaluate(prompt_to_test, test_examples, on_result=on_result)
+    stats = report.stats
+    correct = sum(result.scores["accuracy"] for result in report.results)
+    print(f"Total: {stats.total}, Correct: {correct:.0f}, Accuracy: {stats.scores['accuracy']}")
+
+
+def benchmark_by_dataset(dataset: DatasetLoader, max_concurrency: int, requests_per_second: float):
 
     prompt_to_test = pg.Prompt.from_json_file(make_output_path(dataset.attributes.name + ".json"))
     # prompt_to_test = pg.Prompt.from_json_file(make_json_path(dataset.attributes.name + '_with_reason.json'))
 
     test_examples = dataset.load_test_dataset()
 
-    run_benchmark_prompt(prompt_to_test, test_examples, dataset.attributes.output_key)
+    run_benchmark_prompt(
+        prompt_to_test, test_examples, dataset.attributes.output_key, max_concurrency, requests_per_second
+    )
 
 
 if __name__ == "__main__":
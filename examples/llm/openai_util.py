@@ -1,9 +1,10 @@
 import os
+from typing import Iterator
 
 import openai
 from dotenv import load_dotenv
 
-from promptogen.model.llm import TextLLM
+from promptogen.model.llm import StreamingTextLLM
 
 load_dotenv()
 
@@ -16,16 +17,23 @@ from colorama import Fore, init
 init(autoreset=True)
 
 
-class OpenAITextLLM(TextLLM):
+class OpenAITextLLM(StreamingTextLLM):
     def __init__(self, model: str, verbose=True):
         self.model = model
         self.verbose = verbose
 
-    def generate(self, text: str) -> str:
-        return generate_chat_completion(text, self.model, verbose=self.verbose)
+    def generate_stream(self, text: str) -> Iterator[str]:
+        return generate_chat_completion_stream(text, self.model, verbose=self.verbose)
+
+    def identity(self) -> str:
+        return f"openai:{self.model}"
 
 
 def generate_chat_completion(text: str, model: str, verbose=True) -> str:
+    return "".join(generate_chat_completion_stream(text, model, verbose=verbose))
+
+
+def generate_chat_completion_stream(text: str, model: str, verbose=True) -> Iterator[str]:
     if verbose:
         print(Fore.BLUE + "-- input --")
         print(Fore.BLUE + text)
@@ -38,14 +46,11 @@ def generate_chat_completion(text: str, model: str, verbose=True) -> str:
     )
     if verbose:
         print(Fore.GREEN + "-- output --")
-    raw_resp = ""
     for chunk in resp:
         chunk_content = chunk["choices"][0]["delta"].get("content", "")
-        raw_resp += chunk_content
 
         if verbose:
             print(Fore.GREEN + chunk_content, end="")
+        yield chunk_content
     if verbose:
         print()
-
-    return raw_resp
@@ -1,32 +1,45 @@
-from __future__ import annotations
-
-from importlib import metadata
-
-from .model import (
-    DataClass,
-    FunctionBasedTextLLM,
-    IOExample,
-    ParameterInfo,
-    Prompt,
-    PromptRunner,
-    TextLLM,
-    TextLLMPromptRunner,
-    Value,
-)
-from .prompt_formatter import (
-    JsonPromptFormatter,
-    KeyValuePromptFormatter,
-    PromptFormatter,
-    PromptFormatterConfig,
-    PromptFormatterInterface,
-)
+import typing as _typing
+
+from ._lazy_import import lazy_attributes as _lazy_attributes
 
-try:
-    __version__ = metadata.version(__package__)
-except metadata.PackageNotFoundError:
-    # Case where package metadata is not available.
-    __version__ = ""
-del metadata  # optional, avoids polluting the results of dir(__package__)
+if _typing.TYPE_CHECKING:
+    from .model import (
+        AsyncPromptRunner,
+        AsyncTextLLM,
+        AsyncTextLLMAdapter,
+        AsyncTextLLMPromptRunner,
+        DataClass,
+        FrozenPrompt,
+        FunctionBasedAsyncTextLLM,
+        FunctionBasedStreamingTextLLM,
+        FunctionBasedTextLLM,
+        HedgingPolicy,
+        HedgingStats,
+        HeuristicTokenCounter,
+        IOExample,
+        ParameterInfo,
+        Prompt,
+        PromptRunner,
+        PromptTokenCounts,
+        PromptTooLargeError,
+        RetryPolicy,
+        RetryStats,
+        StreamingTextLLM,
+        TextLLM,
+        TextLLMPromptRunner,
+        TokenCounter,
+        Value,
+    )
+    from .prompt_formatter import (
+        JsonPromptFormatter,
+        KeyValuePromptFormatter,
+        PromptFormatter,
+        PromptFormatterConfig,
+        PromptFormatterInterface,
+    )
+
+# NOTE: Resolved on first access, as reading the package metadata is slow.
+__version__: str
 
 __all__ = [
     # dataclass
@@ -34,6 +47,11 @@ __all__ = [
     # llm
     "TextLLM",
     "FunctionBasedTextLLM",
+    "StreamingTextLLM",
+    "FunctionBasedStreamingTextLLM",
+    "AsyncTextLLM",
+    "FunctionBasedAsyncTextLLM",
+    "AsyncTextLLMAdapter",
     # prompt formatter
     "JsonPromptFormatter",
     "KeyValuePromptFormatter",
@@ -41,6 +59,7 @@ __all__ = [
     # prompt
     "Value",
     "Prompt",
+    "FrozenPrompt",
     "ParameterInfo",
     "IOExample",
     "PromptFormatterConfig",
@@ -48,4 +67,70 @@ __all__ = [
     # prompt runner
     "PromptRunner",
     "TextLLMPromptRunner",
+    "AsyncPromptRunner",
+    "AsyncTextLLMPromptRunner",
+    "RetryPolicy",
+    "RetryStats",
+    "HedgingPolicy",
+    "HedgingStats",
+    # token counter
+    "TokenCounter",
+    "HeuristicTokenCounter",
+    "PromptTokenCounts",
+    "PromptTooLargeError",
 ]
+
+# NOTE: Submodules are imported on first access, so that `import promptogen` stays cheap.
+_lazy_getattr, __dir__ = _lazy_attributes(
+    __name__,
+    {
+        "DataClass": ".model",
+        "TextLLM": ".model",
+        "FunctionBasedTextLLM": ".model",
+        "StreamingTextLLM": ".model",
+        "FunctionBasedStreamingTextLLM": ".model",
+        "AsyncTextLLM": ".model",
+        "FunctionBasedAsyncTextLLM": ".model",
+        "AsyncTextLLMAdapter": ".model",
+        "Value": ".model",
+        "Prompt": ".model",
+        "FrozenPrompt": ".model",
+        "ParameterInfo": ".model",
+        "IOExample": ".model",
+        "PromptRunner": ".model",
+        "TextLLMPromptRunner": ".model",
+        "AsyncPromptRunner": ".model",
+        "AsyncTextLLMPromptRunner": ".model",
+        "RetryPolicy": ".model",
+        "RetryStats": ".model",
+        "HedgingPolicy": ".model",
+        "HedgingStats": ".model",
+        "TokenCounter": ".model",
+        "HeuristicTokenCounter": ".model",
+        "PromptTokenCounts": ".model",
+        "PromptTooLargeError": ".model",
+        "JsonPromptFormatter": ".prompt_formatter",
+        "KeyValuePromptFormatter": ".prompt_formatter",
+        "PromptFormatter": ".prompt_formatter",
+        "PromptFormatterConfig": ".prompt_formatter",
+        "PromptFormatterInterface": ".prompt_formatter",
+    },
+)
+
+
+def __getattr__(name: str) -> _typing.Any:
+    if name == "__version__":
+        version = _get_version()
+        globals()["__version__"] = version
+        return version
+    return _lazy_getattr(name)
+
+
+def _get_version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version(__package__)
+    except metadata.PackageNotFoundError:
+        # Case where package metadata is not available.
+        return ""
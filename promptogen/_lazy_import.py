@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import pkgutil
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_attributes(package: str, attributes: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Create the module-level `__getattr__` and `__dir__` of a package whose attributes are imported on first access.
+
+    Subpackages and submodules of the package are also resolved on first access, so that e.g. `promptogen.model`
+    works after a plain `import promptogen`.
+
+    Args:
+        package: The name of the package (`__name__`).
+        attributes: The attribute names, mapped to the (relative) module that defines them.
+
+    Returns:
+        The `__getattr__` and `__dir__` functions of the package.
+    """
+    module = importlib.import_module(package)
+
+    def __getattr__(name: str) -> Any:
+        module_name = attributes.get(name)
+        if module_name is None:
+            if not name.startswith("_") and importlib.util.find_spec(f"{package}.{name}") is not None:
+                # importing a submodule also sets it as an attribute of the package
+                return importlib.import_module(f"{package}.{name}")
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        # cache the attribute so that __getattr__ is not called again
+        setattr(module, name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        # only the public API, not the helpers imported by the package
+        submodules = [info.name for info in pkgutil.iter_modules(module.__path__) if not info.name.startswith("_")]
+        return sorted({*getattr(module, "__all__", attributes), *submodules})
+
+    return __getattr__, __dir__
@@ -0,0 +1,15 @@
+from .evaluator import DEFAULT_EVALUATION_RETRY_POLICY, EvaluationReport, EvaluationStats, Evaluator, ExampleResult
+from .scoring import Scorer, exact_match, key_match
+from .stub_llm import StubTextLLM
+
+__all__ = [
+    "Evaluator",
+    "EvaluationReport",
+    "EvaluationStats",
+    "ExampleResult",
+    "DEFAULT_EVALUATION_RETRY_POLICY",
+    "Scorer",
+    "exact_match",
+    "key_match",
+    "StubTextLLM",
+]
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from promptogen.model.dataclass import DataClass
+from promptogen.model.prompt import IOExample, Prompt
+from promptogen.model.prompt_runner import PromptRunner
+from promptogen.model.retry_policy import NEVER_RETRIED_ERRORS, PARSE_ERROR, TRANSPORT_ERROR, RetryPolicy
+from promptogen.model.value_formatter import Value
+from promptogen.text_llm.rate_limiter import RateLimiter
+
+from .scoring import Scorer, exact_match
+
+
+class ExampleResult(DataClass):
+    """The result of running a prompt on one example.
+
+    Attributes:
+        index: The index of the example in the evaluated examples.
+        example: The example.
+        output: The output of the prompt, or None if every attempt failed.
+        error: The error of the last attempt, or None if the prompt succeeded.
+        scores: The score of each scorer. Failed examples score 0.0.
+        latency: The duration of the last attempt, in seconds.
+        attempts: The number of attempts.
+    """
+
+    index: int
+    example: IOExample
+    output: Optional[Value] = None
+    error: Optional[str] = None
+    scores: Dict[str, float]
+    latency: float
+    attempts: int
+
+
+class EvaluationStats(DataClass):
+    """Running statistics of an evaluation.
+
+    Attributes:
+        total: The number of examples to evaluate.
+        completed: The number of examples evaluated so far.
+        errors: The number of examples whose every attempt failed.
+        scores: The mean score of each scorer over the completed examples.
+        latency_mean: The mean latency, in seconds.
+        latency_p50: The median latency, in seconds.
+        latency_p95: The 95th percentile latency, in seconds.
+        elapsed: The number of seconds since the evaluation started.
+    """
+
+    total: int
+    completed: int = 0
+    errors: int = 0
+    scores: Dict[str, float] = {}
+    latency_mean: float = 0.0
+    latency_p50: float = 0.0
+    latency_p95: float = 0.0
+    elapsed: float = 0.0
+
+
+class EvaluationReport(DataClass):
+    """The results of an evaluation, in the order of the evaluated examples, and their statistics."""
+
+    results: List[ExampleResult]
+    stats: EvaluationStats
+
+
+# the retry policy of Evaluator: up to 2 retries of connection errors and timeouts
+DEFAULT_EVALUATION_RETRY_POLICY = RetryPolicy(max_attempts=3, initial_backoff=0.5, retry_on_parse_error=False)
+
+
+class Evaluator:
+    """Evaluate a prompt on examples, running them concurrently.
+
+    Each example is run with the prompt runner on a thread pool. Its output is compared to the output of the example
+    by each scorer, and the statistics are updated as soon as the example completes.
+
+    An example that fails with a transient error is run again according to the retry policy. The default policy
+    retries connection errors and timeouts twice; parse errors and other errors are not transient and are reported
+    at once. Errors raised while running the prompt are classified as parse or transport errors by the
+    `parse_errors` and `transport_errors` of the policy. PromptTooLargeError and TypeError are never retried.
+
+    Args:
+        runner: The prompt runner to use, e.g. a TextLLMPromptRunner.
+        scorers: The scorers, by name. Defaults to {"exact_match": exact_match}.
+        max_concurrency: The maximum number of examples running at the same time. Defaults to 8.
+        rate_limiter: The rate limiter every attempt, retries included, waits for before it starts. The tokens of an
+            attempt are estimated from the input of its example only; wrap the LLM in a RateLimitedTextLLM to
+            account for the whole prompt. Defaults to None (no limit).
+        retry_policy: When to run a failed example again. Defaults to None, which uses
+            `DEFAULT_EVALUATION_RETRY_POLICY`.
+    """
+
+    runner: PromptRunner
+    scorers: Dict[str, Scorer]
+    max_concurrency: int
+    rate_limiter: Optional[RateLimiter]
+    retry_policy: RetryPolicy
+
+    def __init__(
+        self,
+        runner: PromptRunner,
+        scorers: Optional[Dict[str, Scorer]] = None,
+        *,
+        max_concurrency: int = 8,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+        self.runner = runner
+        self.scorers = scorers if scorers is not None else {"exact_match": exact_match}
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else DEFAULT_EVALUATION_RETRY_POLICY
+
+    def evaluate(
+        self,
+        prompt: Prompt,
+        examples: Sequence[IOExample],
+        on_result: Optional[Callable[[ExampleResult, EvaluationStats], None]] = None,
+    ) -> EvaluationReport:
+        """Evaluate the prompt on the examples.
+
+        Args:
+            prompt: The prompt to evaluate.
+            examples: The examples to evaluate the prompt on.
+            on_result: A function called with each result and the statistics so far, as soon as the result is
+                available.
+
+        Returns:
+            The report of the evaluation.
+        """
+        results = []
+        stats = EvaluationStats(total=len(examples))
+        for result, stats in self.evaluate_iter(prompt, examples):
+            results.append(result)
+            if on_result is not None:
+                on_result(result, stats)
+
+        results.sort(key=lambda r: r.index)
+        return EvaluationReport(results=results, stats=stats)
+
+    def evaluate_iter(
+        self, prompt: Prompt, examples: Sequence[IOExample]
+    ) -> Iterator[Tuple[ExampleResult, EvaluationStats]]:
+        """Evaluate the prompt on the examples, yielding each result with the statistics so far as it completes.
+
+        Results are yielded in completion order. Closing the iterator early cancels the examples not yet started.
+
+        Args:
+            prompt: The prompt to evaluate.
+            examples: The examples to evaluate the prompt on.
+        """
+        accumulator = _StatsAccumulator(total=len(examples), scorer_names=list(self.scorers))
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        futures: List[Future[ExampleResult]] = []
+        try:
+            futures = [executor.submit(self._evaluate_example, prompt, i, ex) for i, ex in enumerate(examples)]
+            for future in as_completed(futures):
+                result = future.result()
+                yield result, accumulator.add(result)
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _evaluate_example(self, prompt: Prompt, index: int, example: IOExample) -> ExampleResult:
+        policy = self.retry_policy
+        first_start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            limit = (
+                self.rate_limiter.limit(json.dumps(example.input, ensure_ascii=False, default=str))
+                if self.rate_limiter is not None
+                else nullcontext()
+            )
+            with limit:
+                start = time.perf_counter()
+                try:
+                    output = self.runner.run_prompt(prompt, example.input)
+                    error = None
+                except Exception as e:
+                    error = e
+                latency = time.perf_counter() - start
+
+            if error is not None:
+                cause = _retry_cause(policy, error)
+                delay = policy.next_delay(attempts, cause, time.monotonic() - first_start) if cause else None
+                if delay is not None:
+                    time.sleep(delay)
+                    continue
+                return ExampleResult(
+                    index=index,
+                    example=example,
+                    error=f"{type(error).__name__}: {error}",
+                    scores={name: 0.0 for name in self.scorers},
+                    latency=latency,
+                    attempts=attempts,
+                )
+            break
+
+        return ExampleResult(
+            index=index,
+            example=example,
+            output=output,
+            scores={name: scorer(example.output, output) for name, scorer in self.scorers.items()},
+            latency=latency,
+            attempts=attempts,
+        )
+
+
+class _StatsAccumulator:
+    """Update evaluation statistics one result at a time."""
+
+    def __init__(self, total: int, scorer_names: List[str]):
+        self.total = total
+        self.completed = 0
+        self.errors = 0
+        self.score_sums = {name: 0.0 for name in scorer_names}
+        self.latencies: List[float] = []
+        self.latency_sum = 0.0
+        self.start = time.perf_counter()
+
+    def add(self, result: ExampleResult) -> EvaluationStats:
+        self.completed += 1
+        if result.error is not None:
+            self.errors += 1
+        for name, score in result.scores.items():
+            self.score_sums[name] += score
+        bisect.insort(self.latencies, result.latency)
+        self.latency_sum += result.latency
+
+        return EvaluationStats(
+            total=self.total,
+            completed=self.completed,
+            errors=self.errors,
+            scores={name: s / self.completed for name, s in self.score_sums.items()},
+            latency_mean=self.latency_sum / self.completed,
+            latency_p50=_percentile(self.latencies, 0.50),
+            latency_p95=_percentile(self.latencies, 0.95),
+            elapsed=time.perf_counter() - self.start,
+        )
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # nearest-rank percentile
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def _retry_cause(policy: RetryPolicy, error: Exception) -> Optional[str]:
+    """Return the cause of a failed attempt to pass to `RetryPolicy.next_delay`, or None if it is never retried."""
+    if isinstance(error, NEVER_RETRIED_ERRORS):
+        return None
+    if isinstance(error, policy.parse_errors):
+        return PARSE_ERROR
+    if isinstance(error, policy.transport_errors):
+        return TRANSPORT_ERROR
+    return None
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from promptogen.model.value_formatter import Value
+
+Scorer = Callable[[Value, Value], float]
+"""A function that scores an output against the expected output: (expected, actual) -> score in [0, 1]."""
+
+
+def exact_match(expected: Value, actual: Value) -> float:
+    """Score 1.0 if every key of the expected output has the same value in the actual output, else 0.0.
+
+    Args:
+        expected: The expected output.
+        actual: The actual output.
+    """
+    return 1.0 if all(key in actual and actual[key] == value for key, value in expected.items()) else 0.0
+
+
+def key_match(key: str, *, normalize: bool = False) -> Scorer:
+    """Return a scorer that compares the value of a single output key.
+
+    Args:
+        key: The output key to compare.
+        normalize: Whether to compare strings case-insensitively, ignoring surrounding whitespace. Defaults to False.
+    """
+
+    def score(expected: Value, actual: Value) -> float:
+        if key not in actual:
+            return 0.0
+        return 1.0 if _normalize(expected[key], normalize) == _normalize(actual[key], normalize) else 0.0
+
+    return score
+
+
+def _normalize(value: Any, normalize: bool) -> Any:
+    if normalize and isinstance(value, str):
+        return value.strip().lower()
+    return value
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Optional
+
+from promptogen.model.llm import TextLLM
+
+
+class StubTextLLM(TextLLM):
+    """A TextLLM that answers with a function, for running evaluations offline.
+
+    Args:
+        respond: (input_text: str) -> (output_text: str). It may raise to simulate a failed request.
+        latency: The number of seconds each call sleeps before responding, to simulate a remote model.
+            Defaults to 0.0.
+        name: The identity of the model, used e.g. to key cached responses. Defaults to an identity unique to the
+            instance.
+    """
+
+    latency: float
+    calls: int
+
+    def __init__(self, respond: Callable[[str], str], *, latency: float = 0.0, name: Optional[str] = None):
+        if latency < 0:
+            raise ValueError(f"latency must be >= 0, got {latency}.")
+        self._respond = respond
+        self.latency = latency
+        self._name = name
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, input_text: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self._respond(input_text)
+
+    def identity(self) -> str:
+        if self._name is not None:
+            return self._name
+        return super().identity()
+
+    def has_stable_identity(self) -> bool:
+        return self._name is not None
@@ -1,6 +1,18 @@
 from .dataclass import DataClass
-from .llm import LLM, FunctionBasedTextLLM, TextLLM
+from .hedging_policy import HedgingPolicy, HedgingStats
+from .llm import (
+    LLM,
+    AsyncTextLLM,
+    AsyncTextLLMAdapter,
+    FunctionBasedAsyncTextLLM,
+    FunctionBasedStreamingTextLLM,
+    FunctionBasedTextLLM,
+    StreamingTextLLM,
+    TextLLM,
+)
+from .output_schema import OutputSchema, OutputSchemaError, compile_output_schema
 from .prompt import (
+    FrozenPrompt,
     IOExample,
     ParameterInfo,
     Prompt,
@@ -10,16 +22,33 @@ from .prompt import (
     load_prompt_from_json_string,
 )
 from .prompt_interceptor import LoggingInterceptor, PromptInterceptor
-from .prompt_runner import PromptRunner, TextLLMPromptRunner
-from .value_formatter import Value, ValueFormatter
+from .prompt_runner import AsyncPromptRunner, AsyncTextLLMPromptRunner, PromptRunner, TextLLMPromptRunner
+from .response_cache import CachedResponse, ResponseCache, response_cache_key
+from .retry_policy import RetryPolicy, RetryStats
+from .token_counter import (
+    FunctionBasedTokenCounter,
+    HeuristicTokenCounter,
+    PromptTokenCounts,
+    PromptTooLargeError,
+    TokenCounter,
+    estimate_tokens,
+)
+from .value_formatter import BufferedValueParser, IncrementalValueParser, OutputFormatError, Value, ValueFormatter
 
 __all__ = [
     # common
     "DataClass",
     "Value",
     "ValueFormatter",
+    "IncrementalValueParser",
+    "BufferedValueParser",
+    "OutputFormatError",
+    "OutputSchema",
+    "OutputSchemaError",
+    "compile_output_schema",
     # prompt
     "Prompt",
+    "FrozenPrompt",
     "ParameterInfo",
     "IOExample",
     "create_sample_prompt",
@@ -31,9 +60,33 @@ __all__ = [
     "LLM",
     "TextLLM",
     "FunctionBasedTextLLM",
+    "StreamingTextLLM",
+    "FunctionBasedStreamingTextLLM",
+    "AsyncTextLLM",
+    "FunctionBasedAsyncTextLLM",
+    "AsyncTextLLMAdapter",
     # prompt runner
     "PromptRunner",
     "TextLLMPromptRunner",
+    "AsyncPromptRunner",
+    "AsyncTextLLMPromptRunner",
+    # retry
+    "RetryPolicy",
+    "RetryStats",
+    # hedging
+    "HedgingPolicy",
+    "HedgingStats",
+    # token counter
+    "TokenCounter",
+    "FunctionBasedTokenCounter",
+    "HeuristicTokenCounter",
+    "PromptTokenCounts",
+    "PromptTooLargeError",
+    "estimate_tokens",
+    # response cache
+    "ResponseCache",
+    "CachedResponse",
+    "response_cache_key",
     # prompt interceptor
     "PromptInterceptor",
     "LoggingInterceptor",
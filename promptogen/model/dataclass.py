@@ -45,6 +45,22 @@ class DataClass(BaseModel):
             raise ValueError(f"Invalid keys: {kwargs.keys()}")
         return self.model_copy(deep=True, update=kwargs)
 
+    def replace(self: Model, **kwargs: Any) -> Model:
+        """Create a shallow copy of the dataclass with updated values.
+
+        Unlike `update`, the fields that are not updated are shared with this dataclass instead of being deep-copied,
+        so it is cheap even for large dataclasses. Do not modify the shared values in place.
+
+        Args:
+            **kwargs: The values to update.
+
+        Returns:
+            A copy of the dataclass with updated values.
+        """
+        if not all((key in type(self).model_fields.keys() for key in kwargs.keys())):
+            raise ValueError(f"Invalid keys: {kwargs.keys()}")
+        return self.model_copy(update=kwargs)
+
     @classmethod
     def from_dict(cls: type[Model], d: Dict[str, Any]) -> Model:
         """Create a dataclass from a dictionary.
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import math
+from typing import Optional, Sequence
+
+from .dataclass import DataClass
+
+
+class HedgingPolicy(DataClass):
+    """When to send a duplicate of an LLM request that is slower than usual.
+
+    If a request has not completed after the given percentile of the latencies recently observed by the runner, a
+    duplicate is sent and whichever response parses successfully first is used. Until `min_samples` latencies have
+    been observed, `initial_delay` is used instead.
+
+    Attributes:
+        percentile: The percentile of the observed latencies after which a duplicate is sent, between 0 and 100.
+            Defaults to 95.0.
+        window: The number of most recent latencies the percentile is computed over. Defaults to 1000.
+        min_samples: The number of latencies to observe before using the percentile. Defaults to 20.
+        initial_delay: The delay, in seconds, used until `min_samples` latencies have been observed. Defaults to 2.0.
+        min_delay: The minimum delay, in seconds. Defaults to 0.0.
+        max_delay: The maximum delay, in seconds. Defaults to None (no maximum).
+    """
+
+    percentile: float = 95.0
+    window: int = 1000
+    min_samples: int = 20
+    initial_delay: float = 2.0
+    min_delay: float = 0.0
+    max_delay: Optional[float] = None
+
+    def hedge_delay(self, sorted_latencies: Sequence[float]) -> float:
+        """Return the number of seconds to wait before sending a duplicate request.
+
+        Args:
+            sorted_latencies: The recently observed latencies, in seconds, in ascending order.
+        """
+        if len(sorted_latencies) < max(1, self.min_samples):
+            delay = self.initial_delay
+        else:
+            # nearest-rank percentile
+            rank = math.ceil(self.percentile / 100 * len(sorted_latencies))
+            delay = sorted_latencies[min(len(sorted_latencies), max(1, rank)) - 1]
+        delay = max(self.min_delay, delay)
+        if self.max_delay is not None:
+            delay = min(self.max_delay, delay)
+        return delay
+
+
+class HedgingStats(DataClass):
+    """Counters of the duplicate requests sent by a prompt runner, to tune its HedgingPolicy.
+
+    Attributes:
+        requests: The number of requests that could have been hedged.
+        hedges: The number of duplicate requests sent.
+        hedge_wins: The number of duplicate requests whose response was used.
+        cancelled: The number of losing requests stopped before they completed.
+        extra_input_tokens: The estimated number of input tokens sent by duplicate requests.
+        extra_output_tokens: The estimated number of output tokens generated by losing requests.
+    """
+
+    requests: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    cancelled: int = 0
+    extra_input_tokens: int = 0
+    extra_output_tokens: int = 0
@@ -1,11 +1,32 @@
+import asyncio
+import inspect
+import uuid
 from abc import ABC, abstractmethod
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
 
 
 class LLM(ABC):
     """Language model interface."""
 
-    pass  # pragma: no cover
+    def identity(self) -> str:
+        """Return a string identifying the model, used e.g. to key cached responses.
+
+        Defaults to the qualified class name followed by a random token unique to the instance, so responses are
+        never shared between instances, nor between processes, and a persistent cache (e.g. SQLiteResponseCache)
+        refuses the LLM. Subclasses must override it to share cached responses, e.g. with the qualified class name
+        and the model name, and include every setting that changes the outputs (e.g. a temperature passed to the
+        constructor) in the identity.
+        """
+        return _instance_identity(self)
+
+    def has_stable_identity(self) -> bool:
+        """Return whether `identity` is the same for every instance of the same model, in every process.
+
+        Defaults to whether the class overrides `identity`. Prompt runners only use a persistent response cache with
+        LLMs that have a stable identity.
+        """
+        return type(self).identity is not LLM.identity
 
 
 class TextLLM(LLM, ABC):
@@ -23,16 +44,19 @@ class FunctionBasedTextLLM(TextLLM):
 
     _gen: Callable[[str], str]
 
-    def __init__(self, generate_text_by_text: Callable[[str], str]):
+    def __init__(self, generate_text_by_text: Callable[[str], str], *, identity: Optional[str] = None):
         """Initialize a TextBasedLLMWrapper.
 
         Args:
             generate_text_by_text: (input_text: str) -> (output_text: str)
                 A function that generates text by the given text.
+            identity: The identity of the model, used e.g. to key cached responses. Defaults to None, which derives
+                it from the function (see `identity`).
         """
         if not callable(generate_text_by_text):
             raise TypeError("generate_text_by_text must be callable")
         self._gen = generate_text_by_text
+        self._identity = identity
 
     def generate(self, input_text: str) -> str:
         """Generate text by the given text.
@@ -43,3 +67,205 @@ class FunctionBasedTextLLM(TextLLM):
         Returns:
             The generated text. It is a str."""
         return self._gen(input_text)
+
+    def identity(self) -> str:
+        """Return a string identifying the model.
+
+        It is the identity given to the constructor, or else the qualified name of the wrapped function if it is
+        defined at the top level of a module. Other callables (lambdas, closures, bound methods, ...) may wrap
+        different models under the same name, so they get an identity unique to this instance.
+        """
+        if self._identity is not None:
+            return self._identity
+        return _function_identity(self._gen) or _instance_identity(self)
+
+    def has_stable_identity(self) -> bool:
+        """Return whether an identity was given to the constructor, or the wrapped function is named."""
+        return self._identity is not None or _function_identity(self._gen) is not None
+
+
+class StreamingTextLLM(TextLLM, ABC):
+    """Language model interface that generates text from text chunk by chunk."""
+
+    @abstractmethod
+    def generate_stream(self, input_text: str) -> Iterator[str]:
+        pass  # pragma: no cover
+
+    def generate(self, input_text: str) -> str:
+        """Generate text by the given text, concatenating the streamed chunks.
+
+        Args:
+            input_text: The input text. It must be a str.
+
+        Returns:
+            The generated text. It is a str."""
+        return "".join(self.generate_stream(input_text))
+
+
+class FunctionBasedStreamingTextLLM(StreamingTextLLM):
+    """Streaming text-based language model wrapper.
+    It wraps a function that generates chunks of text by the given text.
+    """
+
+    _gen_stream: Callable[[str], Iterable[str]]
+
+    def __init__(self, generate_stream_by_text: Callable[[str], Iterable[str]], *, identity: Optional[str] = None):
+        """Initialize a FunctionBasedStreamingTextLLM.
+
+        Args:
+            generate_stream_by_text: (input_text: str) -> (output_chunks: Iterable[str])
+                A function that generates chunks of text by the given text.
+            identity: The identity of the model, used e.g. to key cached responses. Defaults to None, which derives
+                it from the function (see `identity`).
+        """
+        if not callable(generate_stream_by_text):
+            raise TypeError("generate_stream_by_text must be callable")
+        self._gen_stream = generate_stream_by_text
+        self._identity = identity
+
+    def generate_stream(self, input_text: str) -> Iterator[str]:
+        """Generate chunks of text by the given text.
+
+        Args:
+            input_text: The input text. It must be a str.
+
+        Returns:
+            An iterator of the generated chunks."""
+        return iter(self._gen_stream(input_text))
+
+    def identity(self) -> str:
+        """Return a string identifying the model.
+
+        It is the identity given to the constructor, or else the qualified name of the wrapped function if it is
+        defined at the top level of a module. Other callables (lambdas, closures, bound methods, ...) may wrap
+        different models under the same name, so they get an identity unique to this instance.
+        """
+        if self._identity is not None:
+            return self._identity
+        return _function_identity(self._gen_stream) or _instance_identity(self)
+
+    def has_stable_identity(self) -> bool:
+        """Return whether an identity was given to the constructor, or the wrapped function is named."""
+        return self._identity is not None or _function_identity(self._gen_stream) is not None
+
+
+class AsyncTextLLM(LLM, ABC):
+    """Language model interface that asynchronously generates text from text."""
+
+    @abstractmethod
+    async def agenerate(self, input_text: str) -> str:
+        pass  # pragma: no cover
+
+
+class FunctionBasedAsyncTextLLM(AsyncTextLLM):
+    """Asynchronous text-based language model wrapper.
+    It wraps a coroutine function that generates text by the given text.
+    """
+
+    _agen: Callable[[str], Awaitable[str]]
+
+    def __init__(self, agenerate_text_by_text: Callable[[str], Awaitable[str]], *, identity: Optional[str] = None):
+        """Initialize a FunctionBasedAsyncTextLLM.
+
+        Args:
+            agenerate_text_by_text: async (input_text: str) -> (output_text: str)
+                A coroutine function that generates text by the given text.
+            identity: The identity of the model, used e.g. to key cached responses. Defaults to None, which derives
+                it from the coroutine function (see `identity`).
+        """
+        if not callable(agenerate_text_by_text):
+            raise TypeError("agenerate_text_by_text must be callable")
+        self._agen = agenerate_text_by_text
+        self._identity = identity
+
+    async def agenerate(self, input_text: str) -> str:
+        """Generate text by the given text.
+
+        Args:
+            input_text: The input text. It must be a str.
+
+        Returns:
+            The generated text. It is a str."""
+        return await self._agen(input_text)
+
+    def identity(self) -> str:
+        """Return a string identifying the model.
+
+        It is the identity given to the constructor, or else the qualified name of the wrapped coroutine function if it is
+        defined at the top level of a module. Other callables (lambdas, closures, bound methods, ...) may wrap
+        different models under the same name, so they get an identity unique to this instance.
+        """
+        if self._identity is not None:
+            return self._identity
+        return _function_identity(self._agen) or _instance_identity(self)
+
+    def has_stable_identity(self) -> bool:
+        """Return whether an identity was given to the constructor, or the wrapped function is named."""
+        return self._identity is not None or _function_identity(self._agen) is not None
+
+
+class AsyncTextLLMAdapter(AsyncTextLLM):
+    """Lift a synchronous TextLLM into an AsyncTextLLM.
+
+    Each call to `generate` runs on a dedicated thread pool, so at most `max_workers` calls are in flight at the
+    same time and the event loop is never blocked.
+    """
+
+    text_llm: TextLLM
+
+    def __init__(self, text_llm: TextLLM, *, max_workers: int = 8):
+        """Initialize an AsyncTextLLMAdapter.
+
+        Args:
+            text_llm: The synchronous LLM to wrap.
+            max_workers: The maximum number of concurrent calls to `text_llm.generate`. Defaults to 8.
+        """
+        if not isinstance(text_llm, TextLLM):
+            raise TypeError(f"text_llm must be an instance of TextLLM, got {type(text_llm).__name__}")
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, got {max_workers}")
+        self.text_llm = text_llm
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="promptogen-llm")
+
+    async def agenerate(self, input_text: str) -> str:
+        """Generate text by the given text on the adapter's thread pool.
+
+        Args:
+            input_text: The input text. It must be a str.
+
+        Returns:
+            The generated text. It is a str."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.text_llm.generate, input_text)
+
+    def identity(self) -> str:
+        """Return the identity of the wrapped LLM."""
+        return self.text_llm.identity()
+
+    def has_stable_identity(self) -> bool:
+        return self.text_llm.has_stable_identity()
+
+    def close(self) -> None:
+        """Shut down the thread pool. Calls already in flight are allowed to finish."""
+        self._executor.shutdown(wait=False)
+
+
+def _function_identity(f: Callable) -> Optional[str]:
+    """Return the qualified name of a function defined at the top level of a module, or None for other callables."""
+    if not inspect.isfunction(f):
+        return None
+    qualname = f.__qualname__
+    if "<" in qualname or "." in qualname:
+        # lambdas and closures (`<lambda>`, `<locals>`), and methods of classes that may be configured per instance
+        return None
+    return f"{f.__module__}.{qualname}"
+
+
+def _instance_identity(obj: Any) -> str:
+    identity = obj.__dict__.get("_instance_identity")
+    if identity is None:
+        cls = type(obj)
+        identity = obj.__dict__.setdefault(
+            "_instance_identity", f"{cls.__module__}.{cls.__qualname__}@{uuid.uuid4().hex}"
+        )
+    return identity
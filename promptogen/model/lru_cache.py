@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+from .dataclass import DataClass
+
+V = TypeVar("V")
+
+
+class CacheInfo(DataClass):
+    """Statistics of a cache.
+
+    Attributes:
+        hits: The number of lookups that found a cached value.
+        misses: The number of lookups that did not find a cached value.
+        maxsize: The maximum number of entries the cache can hold.
+        currsize: The current number of entries in the cache.
+    """
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe, size-bounded cache with least-recently-used eviction.
+
+    Args:
+        maxsize: The maximum number of entries to keep. If it is 0, nothing is cached.
+    """
+
+    maxsize: int
+    hits: int
+    misses: int
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be >= 0, got {maxsize}.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Get the value for the given key and mark it as recently used.
+
+        Args:
+            key: The key to look up.
+
+        Returns:
+            The cached value, or None if the key is not cached.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        """Store the value for the given key, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key: The key to store the value under.
+            value: The value to store.
+        """
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        """Return the statistics of the cache."""
+        with self._lock:
+            return CacheInfo(hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
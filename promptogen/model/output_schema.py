@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .lru_cache import LRUCache
+from .prompt import FrozenPrompt, Prompt
+from .value_formatter import OutputFormatError, Value
+
+_Check = Callable[[Any], Any]
+
+
+class OutputSchemaError(OutputFormatError):
+    """The parsed output does not match the types of the template of the prompt.
+
+    Attributes:
+        path: The location of the mismatching value, e.g. `["items"][0]["name"]`.
+    """
+
+    path: str
+
+    def __init__(self, message: str, path: str = ""):
+        super().__init__(f"Invalid output value at {path}: {message}" if path else f"Invalid output value: {message}")
+        self.path = path
+
+
+class _Mismatch(Exception):
+    """Raised by compiled checks; the path is built while it propagates, so valid values pay nothing for it."""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.path: List[Union[str, int]] = []
+
+
+class OutputSchema:
+    """The types of the output of a prompt, compiled from its template into a validator and coercer.
+
+    The type of each output value is the type of the template's value. Nested dicts are checked recursively for
+    the keys they share with the template, as templates often show illustrative keys, and lists for the type of the
+    items of the template's list if they all have the same type. Values are converted when it loses nothing: an int
+    or float to str, an integral float or a numeric string to int, an int or numeric string to a finite float,
+    "true" or "false" to bool, and a tuple to list. Template values of None, and of other types, accept any value.
+
+    Args:
+        template: The output of the template of the prompt.
+        keys: The output keys, in the order of the output parameters. Defaults to the keys of the template.
+
+    Attributes:
+        keys: The output keys with the type of their template value, as expected by `ValueFormatter.parse`.
+    """
+
+    keys: List[Tuple[str, type]]
+
+    def __init__(self, template: Value, keys: Optional[List[str]] = None):
+        if keys is None:
+            keys = list(template.keys())
+        self.keys = [(key, type(template[key])) for key in keys]
+        self._checks: Dict[str, _Check] = {key: _compile(template[key]) for key in keys}
+
+    def validate(self, value: Value) -> Value:
+        """Check the value against the schema, and return it with its values converted to the template's types.
+
+        Keys that are not in the schema are kept as they are.
+
+        Args:
+            value: The parsed output.
+
+        Returns:
+            The converted value. The given value is not modified.
+
+        Raises:
+            OutputSchemaError: If a key is missing, or a value cannot be converted.
+        """
+        if not isinstance(value, dict):
+            raise OutputSchemaError(f"expected a dict, got {type(value).__name__}")
+        validated = dict(value)
+        for key, check in self._checks.items():
+            if key not in value:
+                raise OutputSchemaError(f"missing key {key!r}")
+            validated[key] = self._check(key, check, value[key])
+        return validated
+
+    def validate_key(self, key: str, value: Any) -> Any:
+        """Check the value of one output key, e.g. as soon as an incremental parser completes it.
+
+        Args:
+            key: The output key. Keys that are not in the schema accept any value.
+            value: The parsed value of the key.
+
+        Returns:
+            The converted value.
+
+        Raises:
+            OutputSchemaError: If the value cannot be converted.
+        """
+        check = self._checks.get(key)
+        if check is None:
+            return value
+        return self._check(key, check, value)
+
+    def _check(self, key: str, check: _Check, value: Any) -> Any:
+        try:
+            return check(value)
+        except _Mismatch as e:
+            e.path.append(key)
+            raise OutputSchemaError(e.message, "".join(f"[{p!r}]" for p in reversed(e.path))) from None
+
+
+_schema_cache: LRUCache[OutputSchema] = LRUCache(maxsize=256)
+
+
+def compile_output_schema(prompt: Prompt) -> OutputSchema:
+    """Return the output schema of the prompt, reusing a previously compiled one if available.
+
+    The schema of a FrozenPrompt is memoized on the prompt, and shared with equal prompts by their fingerprint.
+    Other prompts may be changed in place, and computing their fingerprint costs more than compiling the schema, so
+    their schema is compiled on every call.
+
+    Args:
+        prompt: The prompt whose template defines the schema.
+
+    Returns:
+        The compiled schema.
+    """
+    if not isinstance(prompt, FrozenPrompt):
+        return _compile_output_schema(prompt)
+    memo = prompt._memo
+    if memo.output_schema is not None:
+        return memo.output_schema
+    key = prompt.fingerprint()
+    schema = _schema_cache.get(key)
+    if schema is None:
+        schema = _compile_output_schema(prompt)
+        _schema_cache.put(key, schema)
+    memo.output_schema = schema
+    return schema
+
+
+def _compile_output_schema(prompt: Prompt) -> OutputSchema:
+    return OutputSchema(prompt.template.output, [p.name for p in prompt.output_parameters])
+
+
+def _compile(template: Any) -> _Check:
+    if isinstance(template, bool):
+        return _check_bool
+    if isinstance(template, int):
+        return _check_int
+    if isinstance(template, float):
+        return _check_float
+    if isinstance(template, str):
+        return _check_str
+    if isinstance(template, dict):
+        return _compile_dict(template)
+    if isinstance(template, (list, tuple)):
+        return _compile_list(template)
+    return _check_any
+
+
+def _compile_dict(template: Dict[Any, Any]) -> _Check:
+    checks = [(key, _compile(value)) for key, value in template.items()]
+
+    def check(value: Any) -> Any:
+        if not isinstance(value, dict):
+            raise _Mismatch(f"expected a dict, got {type(value).__name__}")
+        validated = dict(value)
+        for key, check_item in checks:
+            if key not in value:
+                continue
+            try:
+                validated[key] = check_item(value[key])
+            except _Mismatch as e:
+                e.path.append(key)
+                raise
+        return validated
+
+    return check
+
+
+def _compile_list(template: Union[List[Any], Tuple[Any, ...]]) -> _Check:
+    item_types = {type(item) for item in template}
+    check_item = _compile(template[0]) if len(item_types) == 1 else _check_any
+
+    def check(value: Any) -> Any:
+        if not isinstance(value, (list, tuple)):
+            raise _Mismatch(f"expected a list, got {type(value).__name__}")
+        if check_item is _check_any:
+            return list(value)
+        validated = []
+        for i, item in enumerate(value):
+            try:
+                validated.append(check_item(item))
+            except _Mismatch as e:
+                e.path.append(i)
+                raise
+        return validated
+
+    return check
+
+
+def _check_any(value: Any) -> Any:
+    return value
+
+
+def _check_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Mismatch(f"expected a str, got {type(value).__name__}")
+
+
+def _check_int(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise _Mismatch(f"expected an int, got {value!r}")
+
+
+def _check_float(value: Any) -> float:
+    # inf and nan are rejected whether they are parsed as floats or as strings
+    converted: Optional[float] = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            converted = float(value)
+        except OverflowError:
+            pass
+    elif isinstance(value, str):
+        try:
+            converted = float(value.strip())
+        except ValueError:
+            pass
+    if converted is not None and math.isfinite(converted):
+        return converted
+    raise _Mismatch(f"expected a finite float, got {value!r}")
+
+
+def _check_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    raise _Mismatch(f"expected a bool, got {value!r}")
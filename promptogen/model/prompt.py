@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import hashlib
+import json
+from typing import Any, Dict, List, Mapping, Optional, TypeVar
 
-from pydantic import model_validator
+from pydantic import ConfigDict, PrivateAttr, model_validator
+from pydantic_core import PydanticSerializationError
 
 from .dataclass import DataClass
 from .value_formatter import Value
 
+P = TypeVar("P", bound="Prompt")
+F = TypeVar("F", bound="FrozenPrompt")
+
 
 class ParameterInfo(DataClass):
     """Information about a parameter.
@@ -30,6 +36,34 @@ class IOExample(DataClass):
     input: Value
     output: Value
 
+    def fingerprint(self) -> str:
+        """Return a stable hash of the content of the example.
+
+        Returns:
+            A hex digest of the content of the example.
+        """
+        return _content_hash(self)
+
+
+class _PromptMemo:
+    """Values derived from the content of a FrozenPrompt, computed on first use.
+
+    A memo always compares equal to another memo, so that memoized values do not affect the equality of prompts.
+    """
+
+    fingerprint: Optional[str]
+    # the OutputSchema of the prompt, set by `compile_output_schema`
+    output_schema: Optional[Any]
+
+    def __init__(self) -> None:
+        self.fingerprint = None
+        self.output_schema = None
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _PromptMemo)
+
+    __hash__ = None  # type: ignore
+
 
 class Prompt(DataClass):
     """A prompt.
@@ -50,12 +84,30 @@ class Prompt(DataClass):
     template: IOExample
     examples: List[IOExample]
 
+    def fingerprint(self) -> str:
+        """Return a stable hash of the content of the prompt.
+
+        As nested values (e.g. `examples`) may be changed in place, it is computed on every call, which costs a dump
+        of the whole prompt. It is memoized by FrozenPrompt.
+
+        Returns:
+            A hex digest of the content of the prompt.
+        """
+        return _content_hash(self)
+
+    def freeze(self) -> FrozenPrompt:
+        """Return an immutable, hashable copy of the prompt.
+
+        Returns:
+            A FrozenPrompt with the same content.
+        """
+        return FrozenPrompt(**dict(self.copy_me()))
+
     @model_validator(mode="after")
     def validate_template(self):
         input_parameters = self.input_parameters
         output_parameters = self.output_parameters
         template = self.template
-        examples = self.examples
 
         input_parameter_keys = {parameter.name for parameter in input_parameters}
         output_parameter_keys = {parameter.name for parameter in output_parameters}
@@ -68,23 +120,92 @@ class Prompt(DataClass):
                 f"Template output keys do not match output parameters: {template.output.keys()} vs {output_parameters}"
             )
 
+        self.validate_examples(self.examples)
+
+        return self
+
+    def validate_examples(self, examples: List[IOExample]) -> None:
+        """Check that the examples have the input and output keys of this prompt's parameters.
+
+        Args:
+            examples: The examples to check. They do not need to be part of the prompt.
+
+        Raises:
+            ValueError: If the keys of an example do not match the parameters.
+        """
+        input_parameter_keys = {parameter.name for parameter in self.input_parameters}
+        output_parameter_keys = {parameter.name for parameter in self.output_parameters}
         for example in examples:
             if example.input.keys() != input_parameter_keys:
                 raise ValueError(
                     f"Example input keys do not match input parameters: "
-                    f"{example.input.keys()} vs {input_parameters}"
+                    f"{example.input.keys()} vs {self.input_parameters}"
                 )
             if example.output.keys() != output_parameter_keys:
                 raise ValueError(
                     f"Example output keys do not match output parameters: "
-                    f"{example.output.keys()} vs {output_parameters}"
+                    f"{example.output.keys()} vs {self.output_parameters}"
                 )
 
-        return self
+    @classmethod
+    def construct_trusted(cls: type[P], **kwargs: Any) -> P:
+        """Create a prompt without validating it.
+
+        This is meant for internal copies of already validated prompts that are never handed out to callers, where
+        running the validation again would only cost time; public APIs return prompts created by the constructor.
+        The values must already have the right types (e.g. IOExample instances rather than dicts) and the keys of the
+        template and examples must match the parameters; nothing is checked.
+
+        Args:
+            **kwargs: The fields of the prompt. Missing fields take their default values.
+
+        Returns:
+            The created prompt.
+        """
+        return cls.model_construct(**kwargs)
+
+    def with_examples(self: P, examples: List[IOExample]) -> P:
+        """Return a copy of the prompt with the given examples.
+
+        Only the examples that are not already in this prompt are validated; the other fields are shared with this
+        prompt.
+
+        Args:
+            examples: The new examples.
+
+        Returns:
+            A copy of the prompt with the given examples.
+
+        Raises:
+            ValueError: If the keys of a new example do not match the parameters.
+        """
+        known = {id(example) for example in self.examples}
+        self.validate_examples([example for example in examples if id(example) not in known])
+        return self.replace(examples=list(examples))
+
+    def add_examples(self: P, examples: List[IOExample]) -> P:
+        """Return a copy of the prompt with the given examples appended.
+
+        Only the appended examples are validated; the other fields are shared with this prompt.
+
+        Args:
+            examples: The examples to append.
+
+        Returns:
+            A copy of the prompt with the examples appended.
+
+        Raises:
+            ValueError: If the keys of an appended example do not match the parameters.
+        """
+        self.validate_examples(examples)
+        return self.replace(examples=[*self.examples, *examples])
 
     def rename_input_parameter(self, old_name: str, new_name: str) -> "Prompt":
         """Rename an input parameter.
 
+        Only the parameter list, the input dicts of the template and examples are rebuilt; everything else is shared
+        with this prompt.
+
         Args:
             old_name: The old name of the input parameter.
             new_name: The new name of the input parameter.
@@ -92,39 +213,25 @@ class Prompt(DataClass):
         Returns:
             A copy of the prompt with the input parameter renamed.
         """
-        input_parameters = [param.copy_me() for param in self.input_parameters]
-        # find the parameter
-        found = False
-        index = -1
-        for i, parameter in enumerate(input_parameters):
-            if parameter.name == old_name:
-                found = True
-                index = i
-                break
-        if not found:
-            raise ValueError(f"Could not find input parameter with name {old_name}")
-        input_parameters[index].name = new_name
-
-        # rename in template
-        template = self.template.copy_me()
-        template.input[new_name] = template.input.pop(old_name)
-
-        # rename in examples
-        examples = []
-        for example in self.examples:
-            example = example.copy_me()
-            example.input[new_name] = example.input.pop(old_name)
-            examples.append(example)
-
-        return self.update(
+        input_parameters = _rename_parameter(self.input_parameters, old_name, new_name, "input")
+
+        return self.replace(
             input_parameters=input_parameters,
-            template=template,
-            examples=examples,
+            template=IOExample.model_construct(
+                input=_rename_key(self.template.input, old_name, new_name), output=self.template.output
+            ),
+            examples=[
+                IOExample.model_construct(input=_rename_key(example.input, old_name, new_name), output=example.output)
+                for example in self.examples
+            ],
         )
 
     def rename_output_parameter(self, old_name: str, new_name: str) -> "Prompt":
         """Rename an output parameter.
 
+        Only the parameter list, the output dicts of the template and examples are rebuilt; everything else is
+        shared with this prompt.
+
         Args:
             old_name: The old name of the output parameter.
             new_name: The new name of the output parameter.
@@ -132,35 +239,17 @@ class Prompt(DataClass):
         Returns:
             A copy of the prompt with the output parameter renamed.
         """
-        output_parameters = [param.copy_me() for param in self.output_parameters]
-
-        # find the parameter
-        found = False
-        index = -1
-        for i, parameter in enumerate(output_parameters):
-            if parameter.name == old_name:
-                found = True
-                index = i
-                break
-        if not found:
-            raise ValueError(f"Could not find output parameter with name {old_name}")
-        output_parameters[index].name = new_name
-
-        # rename in template
-        template = self.template.copy_me()
-        template.output[new_name] = template.output.pop(old_name)
-
-        # rename in examples
-        examples = []
-        for example in self.examples:
-            example = example.copy_me()
-            example.output[new_name] = example.output.pop(old_name)
-            examples.append(example)
-
-        return self.update(
+        output_parameters = _rename_parameter(self.output_parameters, old_name, new_name, "output")
+
+        return self.replace(
             output_parameters=output_parameters,
-            template=template,
-            examples=examples,
+            template=IOExample.model_construct(
+                input=self.template.input, output=_rename_key(self.template.output, old_name, new_name)
+            ),
+            examples=[
+                IOExample.model_construct(input=example.input, output=_rename_key(example.output, old_name, new_name))
+                for example in self.examples
+            ],
         )
 
     def summary(self) -> str:
@@ -234,6 +323,64 @@ class Prompt(DataClass):
         return f"{self.input_signature()} -> {self.output_signature()}"
 
 
+class FrozenPrompt(Prompt):
+    """An immutable prompt. It is hashable, so it can be used as a dict key or in a set.
+
+    Its fields cannot be assigned; nested values (lists and dicts) must not be modified in place either, as the hash
+    is memoized.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    _memo: _PromptMemo = PrivateAttr(default_factory=_PromptMemo)
+
+    def fingerprint(self) -> str:
+        """Return a stable hash of the content of the prompt, computed on first use.
+
+        Returns:
+            A hex digest of the content of the prompt.
+        """
+        memo = self._memo
+        if memo.fingerprint is None:
+            memo.fingerprint = _content_hash(self)
+        return memo.fingerprint
+
+    def model_copy(self: F, *, update: Optional[Mapping[str, Any]] = None, deep: bool = False) -> F:
+        copied = super().model_copy(update=update, deep=deep)
+        # the fingerprint of a copy is computed again on first use, so that it never inherits a stale one
+        copied._memo = _PromptMemo()
+        return copied
+
+    def __deepcopy__(self: F, memo: Optional[Dict[int, Any]] = None) -> F:
+        copied = super().__deepcopy__(memo)
+        copied._memo = _PromptMemo()
+        return copied
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint())
+
+
+def _rename_parameter(parameters: List[ParameterInfo], old_name: str, new_name: str, kind: str) -> List[ParameterInfo]:
+    for i, parameter in enumerate(parameters):
+        if parameter.name == old_name:
+            return [*parameters[:i], parameter.replace(name=new_name), *parameters[i + 1 :]]
+    raise ValueError(f"Could not find {kind} parameter with name {old_name}")
+
+
+def _rename_key(value: Value, old_name: str, new_name: str) -> Value:
+    renamed = {k: v for k, v in value.items() if k != old_name}
+    renamed[new_name] = value[old_name]
+    return renamed
+
+
+def _content_hash(value: DataClass) -> str:
+    try:
+        content = value.model_dump_json()
+    except PydanticSerializationError:
+        content = json.dumps(value.model_dump(), ensure_ascii=False, default=repr)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 def load_prompt_from_json_file(filename: str) -> Prompt:
     """Load a prompt from a JSON file.
 
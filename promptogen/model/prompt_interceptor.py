@@ -20,6 +20,20 @@ class PromptInterceptor(ABC):
         """Process after running the prompt. Can modify the output_value."""
         pass
 
+    async def abefore_run(self, prompt: Prompt, input_value: Value) -> Value:
+        """Asynchronous version of `before_run`, used by async prompt runners.
+
+        Defaults to calling `before_run`. Override it if the hook performs I/O.
+        """
+        return self.before_run(prompt, input_value)
+
+    async def aafter_run(self, prompt: Prompt, output_value: Value) -> Value:
+        """Asynchronous version of `after_run`, used by async prompt runners.
+
+        Defaults to calling `after_run`. Override it if the hook performs I/O.
+        """
+        return self.after_run(prompt, output_value)
+
 
 class LoggingInterceptor(PromptInterceptor):
     def before_run(self, _: Prompt, input_value: Value) -> Value:
@@ -1,9 +1,18 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
-from promptogen.model.llm import TextLLM
+from promptogen.model.hedging_policy import HedgingPolicy, HedgingStats
+from promptogen.model.llm import AsyncTextLLM, AsyncTextLLMAdapter, StreamingTextLLM, TextLLM
 from promptogen.model.prompt import Prompt
 from promptogen.model.prompt_interceptor import PromptInterceptor
+from promptogen.model.response_cache import CachedResponse, ResponseCache, response_cache_key
+from promptogen.model.retry_policy import NEVER_RETRIED_ERRORS, PARSE_ERROR, TRANSPORT_ERROR, RetryPolicy, RetryStats
+from promptogen.model.token_counter import PromptTooLargeError, estimate_tokens
 from promptogen.model.value_formatter import Value
 from promptogen.prompt_formatter.prompt_formatter import PromptFormatter
 
@@ -19,33 +28,963 @@ class PromptRunner(ABC):
 class TextLLMPromptRunner(PromptRunner):
     """A text-based prompt runner is responsible for running a prompt and returning the result."""
 
-    def __init__(self, llm: TextLLM, formatter: PromptFormatter, interceptors: List[PromptInterceptor] = []):
+    def __init__(
+        self,
+        llm: TextLLM,
+        formatter: PromptFormatter,
+        interceptors: List[PromptInterceptor] = [],
+        *,
+        cache: Optional[ResponseCache] = None,
+        cache_parsed_value: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        hedge_llm: Optional[TextLLM] = None,
+        max_prompt_tokens: Optional[int] = None,
+        max_concurrency: int = 8,
+    ):
         """Initialize a TextBasedPromptRunner.
 
         Args:
             llm: The LLM to use. It must be an instance of TextBasedLLM.
             formatter: The prompt formatter to use. It must be an instance of PromptFormatter.
+            cache: The cache of LLM responses. If a response for the same rendered request and LLM is cached,
+                the LLM is not called. LLMs are told apart by `LLM.identity()`; give the LLM an explicit identity to
+                share cached responses between instances or processes. A persistent cache (e.g. SQLiteResponseCache)
+                raises ValueError if the LLM has no stable identity, as its responses would never be found again.
+                Defaults to None (no caching).
+            cache_parsed_value: Whether to also cache the parsed value, so cache hits skip parsing as well.
+                Defaults to False.
+            retry_policy: When to retry a failed LLM call or an output that cannot be parsed. It applies to
+                `run_prompt` and `run_prompt_batch`. Defaults to None (errors are raised immediately).
+            hedging_policy: When to send a duplicate of a slow LLM call, using whichever response parses first.
+                It applies to `run_prompt` and `run_prompt_batch`. A losing call is stopped between chunks if its
+                LLM is a StreamingTextLLM, and runs to completion otherwise. The calls run on a thread pool of the
+                runner, created on first use; call `close` to shut it down. Defaults to None (no hedging).
+            hedge_llm: The LLM that duplicate calls are sent to. Its responses are cached under its own identity, so
+                they are served only to runners that hedge with it, never as responses of `llm` alone.
+                Defaults to None (the same LLM).
+            max_prompt_tokens: The maximum number of tokens of a formatted prompt, counted by the token counter of
+                the formatter. A larger prompt raises PromptTooLargeError without calling the LLM.
+                Defaults to None (no limit).
+            max_concurrency: The maximum number of hedged prompts running at the same time. The thread pool of the
+                hedged calls has two workers per prompt, for its call and its duplicate; further prompts wait for a
+                worker, and their hedge delay only starts once their call starts. A prompt that gets no worker within
+                the hedge delay makes its call on its own thread, unhedged. Match it to the `max_concurrency` of
+                `run_prompt_batch`. Defaults to 8.
         """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+        if cache is not None and cache.persistent:
+            for cached_llm in (llm, hedge_llm):
+                if cached_llm is not None and not cached_llm.has_stable_identity():
+                    raise ValueError(
+                        f"{type(cached_llm).__name__} has no stable identity, so a persistent cache would never hit "
+                        "for it; override LLM.identity, or pass identity= to a function-based LLM"
+                    )
         self.text_llm = llm
         self.formatter = formatter
         self.interceptors = interceptors
+        self.cache = cache
+        self.cache_parsed_value = cache_parsed_value
+        self.retry_policy = retry_policy
+        self._retry_counter = _RetryCounter()
+        self.hedging_policy = hedging_policy
+        self.hedge_llm = hedge_llm
+        self._hedge_state = _HedgeState(hedging_policy) if hedging_policy is not None else None
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_concurrency = max_concurrency
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_executor_lock = threading.Lock()
 
-    def run_prompt(self, prompt: Prompt, input_value: Value) -> Value:
+    def run_prompt(self, prompt: Prompt, input_value: Value, *, bypass_cache: bool = False) -> Value:
         """Run the given prompt and return the result.
 
         Args:
             prompt: The prompt to run. It must be an instance of Prompt.
             input_value: The input value to use. It must be an instance of Value, which is a dict.
+            bypass_cache: Whether to skip the cache lookup and call the LLM. The fresh response still replaces the
+                cached one. Defaults to False.
+        """
+        return self._run_prompt(prompt, input_value, bypass_cache=bypass_cache)
+
+    def run_prompt_batch(
+        self,
+        prompt: Prompt,
+        input_values: Sequence[Value],
+        *,
+        max_concurrency: int = 8,
+        return_exceptions: bool = True,
+    ) -> List[Union[Value, Exception]]:
+        """Run the given prompt for each input value concurrently on a thread pool.
+
+        The prompt is rendered without input only once for the whole batch.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_values: The input values to use.
+            max_concurrency: The maximum number of prompts running at the same time. Defaults to 8.
+            return_exceptions: Whether to return the exception raised for an input in place of its result.
+                If False, the first exception (in input order) is raised and pending inputs are cancelled.
+                Defaults to True.
+
+        Returns:
+            The results, in the same order as input_values.
         """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+
+        prefix = self.formatter.format_prompt_prefix(prompt)
+        results: List[Union[Value, Exception]] = []
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = [executor.submit(self._run_prompt, prompt, input_value, prefix) for input_value in input_values]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    if not return_exceptions:
+                        for f in futures:
+                            f.cancel()
+                        raise
+                    results.append(e)
+
+        return results
+
+    def run_prompt_packed(
+        self,
+        prompt: Prompt,
+        input_values: Sequence[Value],
+        *,
+        pack_size: int = 10,
+        max_concurrency: int = 8,
+        return_exceptions: bool = True,
+    ) -> List[Union[Value, Exception]]:
+        """Run the given prompt for many input values, answering up to `pack_size` of them in each LLM call.
+
+        The prompt prefix is sent once per pack instead of once per input, which cuts the number of requests and
+        tokens for prompts whose examples are much longer than their inputs. Packs run concurrently on a thread pool.
+        An input whose output is missing or cannot be parsed, or all inputs of a pack that cannot be formatted or is
+        too large (PromptTooLargeError), fall back to an individual `run_prompt` call, which uses the cache, retry and
+        hedging policies of the runner. The packed LLM call itself is retried according to the retry policy; if it
+        still fails, its error is the result of every input of the pack, so that a throttled or failing LLM is not
+        called once per input.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_values: The input values to use.
+            pack_size: The maximum number of inputs per LLM call. Defaults to 10.
+            max_concurrency: The maximum number of packs running at the same time. Defaults to 8.
+            return_exceptions: Whether to return the exception raised for an input in place of its result.
+                If False, the first exception (in input order) is raised once all packs are done. Defaults to True.
+
+        Returns:
+            The results, in the same order as input_values.
+        """
+        if pack_size < 1:
+            raise ValueError(f"pack_size must be >= 1, got {pack_size}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+
+        prefix = self.formatter.format_prompt_prefix(prompt)
+        packs = [input_values[i : i + pack_size] for i in range(0, len(input_values), pack_size)]
+        results: List[Union[Value, Exception]] = []
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for pack_results in executor.map(lambda pack: self._run_pack(prompt, pack, prefix), packs):
+                results.extend(pack_results)
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
 
+    def _run_pack(self, prompt: Prompt, input_values: Sequence[Value], prefix: str) -> List[Union[Value, Exception]]:
+        # the interceptors run once per input, whether it is answered by the pack or falls back to its own call
+        intercepted: Dict[int, Value] = {}
+        errors: Dict[int, Exception] = {}
+        for i, input_value in enumerate(input_values):
+            try:
+                intercepted[i] = self._before_run(prompt, input_value)
+            except Exception as e:
+                errors[i] = e
+
+        packed = list(intercepted)
+        parsed: Dict[int, Union[Value, Exception]] = {}
+        raw_req = (
+            _format_pack(self.formatter, self.max_prompt_tokens, prompt, [intercepted[i] for i in packed], prefix)
+            if len(packed) > 1
+            else None
+        )
+        if raw_req is not None:
+            try:
+                raw_resp = self._generate_pack(raw_req)
+            except PromptTooLargeError:
+                pass
+            except Exception as e:
+                errors.update((i, e) for i in packed)
+            else:
+                parsed = _parse_pack(self.formatter, prompt, raw_resp, packed)
+
+        results: List[Union[Value, Exception]] = []
+        for i in range(len(input_values)):
+            if i in errors:
+                results.append(errors[i])
+                continue
+            input_value, resp = intercepted[i], parsed.get(i)
+            try:
+                if resp is None or isinstance(resp, Exception):
+                    results.append(self._run_intercepted(prompt, input_value, prefix))
+                else:
+                    results.append(self._after_run(prompt, resp))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _generate_pack(self, raw_req: str) -> str:
+        # only transport errors are retried: a packed output that cannot be parsed falls back to individual calls
+        policy = self.retry_policy or _NO_RETRY
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._retry_counter.add_attempt()
+            try:
+                return self.text_llm.generate(raw_req)
+            except NEVER_RETRIED_ERRORS:
+                raise
+            except policy.transport_errors as e:
+                error = e
+
+            delay = self._retry_counter.next_delay(policy, attempt, TRANSPORT_ERROR, time.monotonic() - start)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    def _before_run(self, prompt: Prompt, input_value: Value) -> Value:
         for interceptor in self.interceptors:
             input_value = interceptor.before_run(prompt, input_value)
+        return input_value
+
+    def _after_run(self, prompt: Prompt, resp: Value) -> Value:
+        for interceptor in reversed(self.interceptors):
+            resp = interceptor.after_run(prompt, resp)
+        return resp
+
+    def _run_prompt(
+        self, prompt: Prompt, input_value: Value, prefix: Optional[str] = None, bypass_cache: bool = False
+    ) -> Value:
+        input_value = self._before_run(prompt, input_value)
+        return self._run_intercepted(prompt, input_value, prefix, bypass_cache)
+
+    def _run_intercepted(
+        self, prompt: Prompt, input_value: Value, prefix: Optional[str] = None, bypass_cache: bool = False
+    ) -> Value:
+        raw_req = self.formatter.format_prompt(prompt, input_value, prefix=prefix)
+        _check_prompt_tokens(self.formatter, self.max_prompt_tokens, raw_req)
+        key, resp = self._lookup_cache(prompt, raw_req, bypass_cache)
+        if resp is None:
+            llm, raw_resp, resp = self._generate_with_retry(prompt, raw_req)
+            if key is not None and llm is not self.text_llm:
+                # a response of the hedge LLM is cached under its own identity
+                key = response_cache_key(llm, raw_req)
+            self._store_cache(key, raw_resp, resp)
+
+        return self._after_run(prompt, resp)
+
+    def _generate_with_retry(self, prompt: Prompt, raw_req: str) -> Tuple[TextLLM, str, Value]:
+        # returns the LLM that generated the response along with it
+        policy = self.retry_policy or _NO_RETRY
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self._hedge_state is None:
+                    return (self.text_llm,) + self._call(self.text_llm, prompt, raw_req, policy)
+                return self._hedged_call(prompt, raw_req, policy)
+            except _AttemptFailed as e:
+                failure = e
+
+            delay = self._retry_counter.next_delay(policy, attempt, failure.cause, time.monotonic() - start)
+            if delay is None:
+                raise failure.error
+            time.sleep(delay)
+
+    def _call(
+        self,
+        llm: TextLLM,
+        prompt: Prompt,
+        raw_req: str,
+        policy: RetryPolicy,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Tuple[str, Value]:
+        # errors handled by the retry policy are raised as _AttemptFailed
+        self._retry_counter.add_attempt()
+        try:
+            raw_resp = _generate_until_cancelled(llm, raw_req, cancelled)
+        except NEVER_RETRIED_ERRORS:
+            raise
+        except policy.transport_errors as e:
+            raise _AttemptFailed(TRANSPORT_ERROR, e)
+        try:
+            return raw_resp, self.formatter.parse(prompt, raw_resp)
+        except NEVER_RETRIED_ERRORS:
+            raise
+        except policy.parse_errors as e:
+            raise _AttemptFailed(PARSE_ERROR, e, raw_resp)
+
+    def _hedged_call(self, prompt: Prompt, raw_req: str, policy: RetryPolicy) -> Tuple[TextLLM, str, Value]:
+        state = self._hedge_state
+        assert state is not None
+        state.add(requests=1)
+
+        def submit(llm: TextLLM, started: Optional[threading.Event] = None) -> "Future[Tuple[str, Value]]":
+            cancelled = threading.Event()
+            future = self._hedge_pool().submit(self._timed_call, llm, prompt, raw_req, policy, cancelled, started)
+            calls[future] = cancelled
+            return future
+
+        calls: Dict["Future[Tuple[str, Value]]", threading.Event] = {}
+        started = threading.Event()
+        primary = submit(self.text_llm, started)
+        hedge_llm = self.hedge_llm or self.text_llm
+        winner = None
+        try:
+            # the hedge delay runs from the start of the primary call, not from its submission, so that calls queued
+            # behind a busy pool do not trigger hedges that would only queue as well
+            delay = state.delay()
+            if not started.wait(timeout=delay) and primary.cancel():
+                # the pool is still saturated after the hedge delay, so the call is made on this thread, unhedged
+                del calls[primary]
+                return (self.text_llm,) + self._timed_call(self.text_llm, prompt, raw_req, policy, threading.Event())
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                winner = primary
+                return (self.text_llm,) + primary.result()
+
+            hedge = submit(hedge_llm)
+            state.add(hedges=1, extra_input_tokens=estimate_tokens(raw_req))
+            pending = set(calls)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # prefer the primary call if both completed
+                for future in sorted(done, key=lambda f: f is hedge):
+                    if future.exception() is None:
+                        winner = future
+                        if future is hedge:
+                            state.add(hedge_wins=1)
+                            return (hedge_llm,) + future.result()
+                        return (self.text_llm,) + future.result()
+            # both calls failed
+            return (self.text_llm,) + primary.result()
+        finally:
+            for future, cancelled in calls.items():
+                if future is not winner:
+                    cancelled.set()
+                    if winner is not None:
+                        future.add_done_callback(state.account_loser)
 
+    def _timed_call(
+        self,
+        llm: TextLLM,
+        prompt: Prompt,
+        raw_req: str,
+        policy: RetryPolicy,
+        cancelled: threading.Event,
+        started: Optional[threading.Event] = None,
+    ) -> Tuple[str, Value]:
+        assert self._hedge_state is not None
+        if started is not None:
+            started.set()
+        start = time.monotonic()
+        result = self._call(llm, prompt, raw_req, policy, cancelled)
+        self._hedge_state.record_latency(time.monotonic() - start)
+        return result
+
+    def retry_stats(self) -> RetryStats:
+        """Return the counters of the LLM calls and retries made by this runner."""
+        return self._retry_counter.stats()
+
+    def hedging_stats(self) -> HedgingStats:
+        """Return the counters of the duplicate calls made by this runner, or empty counters without hedging."""
+        if self._hedge_state is None:
+            return HedgingStats()
+        return self._hedge_state.stats()
+
+    def _hedge_pool(self) -> ThreadPoolExecutor:
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=2 * self.max_concurrency, thread_name_prefix="promptogen-hedge"
+                )
+            return self._hedge_executor
+
+    def close(self) -> None:
+        """Shut down the thread pool of the hedged calls. Calls already in flight are allowed to finish.
+
+        Closing is idempotent, and does not end the runner: a later hedged call starts a new thread pool. The runner
+        can also be used as a context manager, which closes it on exit.
+        """
+        with self._hedge_executor_lock:
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __enter__(self) -> "TextLLMPromptRunner":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def run_prompt_stream(self, prompt: Prompt, input_value: Value, *, bypass_cache: bool = False) -> Iterator[Value]:
+        """Run the given prompt and yield the output as it is generated.
+
+        Each time output keys become complete, the value of all keys completed so far is yielded. The last value
+        yielded is the complete output, after the `after_run` hooks of the interceptors. If the LLM is not a
+        StreamingTextLLM, its whole response is parsed as a single chunk.
+
+        As soon as the output received so far cannot be parsed, the stream is closed, which cancels the generation
+        for LLMs whose streams release the request on close, and OutputFormatError is raised. Streamed runs are not
+        retried, as part of the output has already been yielded.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_value: The input value to use. It must be an instance of Value, which is a dict.
+            bypass_cache: Whether to skip the cache lookup and call the LLM. Defaults to False.
+        """
+        input_value = self._before_run(prompt, input_value)
         raw_req = self.formatter.format_prompt(prompt, input_value)
-        raw_resp = self.text_llm.generate(raw_req)
-        resp = self.formatter.parse(prompt, raw_resp)
+        _check_prompt_tokens(self.formatter, self.max_prompt_tokens, raw_req)
+        key, resp = self._lookup_cache(prompt, raw_req, bypass_cache)
+        if resp is None:
+            parser = self.formatter.incremental_parser(prompt)
+            chunks = []
+            partial: Value = {}
+            stream = self._generate_stream(raw_req)
+            try:
+                for chunk in stream:
+                    chunks.append(chunk)
+                    completed = parser.feed(chunk)
+                    if completed:
+                        partial.update(completed)
+                        yield dict(partial)
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+            resp = parser.close()
+            self._store_cache(key, "".join(chunks), resp)
 
         for interceptor in reversed(self.interceptors):
             resp = interceptor.after_run(prompt, resp)
 
+        yield resp
+
+    def _generate_stream(self, raw_req: str) -> Iterator[str]:
+        if isinstance(self.text_llm, StreamingTextLLM):
+            return self.text_llm.generate_stream(raw_req)
+        return iter([self.text_llm.generate(raw_req)])
+
+    def _lookup_cache(self, prompt: Prompt, raw_req: str, bypass_cache: bool) -> Tuple[Optional[str], Optional[Value]]:
+        if self.cache is None:
+            return None, None
+        key = response_cache_key(self.text_llm, raw_req)
+        if bypass_cache:
+            return key, None
+        keys = [key]
+        if self._hedge_state is not None and self.hedge_llm is not None and self.hedge_llm is not self.text_llm:
+            # a hedged run accepts the answer of either LLM, so the wins of the hedge LLM are hits as well
+            keys.append(response_cache_key(self.hedge_llm, raw_req))
+        for cache_key in keys:
+            cached = self.cache.get(cache_key)
+            if cached is None:
+                continue
+            if cached.value is not None:
+                return key, cached.value
+            try:
+                return key, self.formatter.parse(prompt, cached.raw_response)
+            except (ValueError, SyntaxError):
+                # e.g. cached before output validation was turned on or the template changed: the entry is a miss,
+                # and the fresh response replaces it
+                continue
+        return key, None
+
+    def _store_cache(self, key: Optional[str], raw_resp: str, resp: Value) -> None:
+        # only responses that could be parsed are cached
+        if self.cache is not None and key is not None:
+            self.cache.set(key, CachedResponse(raw_response=raw_resp, value=resp if self.cache_parsed_value else None))
+
+
+class AsyncPromptRunner(ABC):
+    """An async prompt runner is responsible for running a prompt and returning the result without blocking."""
+
+    @abstractmethod
+    async def arun_prompt(self, prompt: Prompt, input_value: Value) -> Value:
+        pass  # pragma: no cover
+
+
+class AsyncTextLLMPromptRunner(AsyncPromptRunner):
+    """A text-based prompt runner that awaits an AsyncTextLLM, so many prompts can be in flight at once."""
+
+    def __init__(
+        self,
+        llm: Union[AsyncTextLLM, TextLLM],
+        formatter: PromptFormatter,
+        interceptors: List[PromptInterceptor] = [],
+        *,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        hedge_llm: Optional[Union[AsyncTextLLM, TextLLM]] = None,
+        max_prompt_tokens: Optional[int] = None,
+    ):
+        """Initialize an AsyncTextLLMPromptRunner.
+
+        Args:
+            llm: The LLM to use. If it is only a synchronous TextLLM, it is wrapped in an AsyncTextLLMAdapter.
+            formatter: The prompt formatter to use. It must be an instance of PromptFormatter.
+            interceptors: The interceptors to apply. Their async hooks are awaited.
+            retry_policy: When to retry a failed LLM call or an output that cannot be parsed.
+                Defaults to None (errors are raised immediately).
+            hedging_policy: When to send a duplicate of a slow LLM call, using whichever response parses first.
+                The losing call is cancelled. Defaults to None (no hedging).
+            hedge_llm: The LLM that duplicate calls are sent to. If it is only a synchronous TextLLM, it is wrapped
+                in an AsyncTextLLMAdapter. Defaults to None (the same LLM).
+            max_prompt_tokens: The maximum number of tokens of a formatted prompt, counted by the token counter of
+                the formatter. A larger prompt raises PromptTooLargeError without calling the LLM.
+                Defaults to None (no limit).
+        """
+        if not isinstance(llm, AsyncTextLLM):
+            llm = AsyncTextLLMAdapter(llm)
+        if hedge_llm is not None and not isinstance(hedge_llm, AsyncTextLLM):
+            hedge_llm = AsyncTextLLMAdapter(hedge_llm)
+        self.async_text_llm = llm
+        self.formatter = formatter
+        self.interceptors = interceptors
+        self.retry_policy = retry_policy
+        self._retry_counter = _RetryCounter()
+        self.hedging_policy = hedging_policy
+        self.async_hedge_llm = hedge_llm
+        self._hedge_state = _HedgeState(hedging_policy) if hedging_policy is not None else None
+        self.max_prompt_tokens = max_prompt_tokens
+
+    async def arun_prompt(self, prompt: Prompt, input_value: Value) -> Value:
+        """Run the given prompt and return the result.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_value: The input value to use. It must be an instance of Value, which is a dict.
+        """
+        return await self._arun_prompt(prompt, input_value)
+
+    async def arun_prompt_batch(
+        self,
+        prompt: Prompt,
+        input_values: Sequence[Value],
+        *,
+        max_concurrency: int = 64,
+        return_exceptions: bool = True,
+    ) -> List[Union[Value, BaseException]]:
+        """Run the given prompt for each input value concurrently as asyncio tasks.
+
+        The prompt is rendered without input only once for the whole batch.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_values: The input values to use.
+            max_concurrency: The maximum number of prompts running at the same time. Defaults to 64.
+            return_exceptions: Whether to return the exception raised for an input in place of its result.
+                If False, the first exception raised is propagated once the other inputs are cancelled.
+                Defaults to True.
+
+        Returns:
+            The results, in the same order as input_values.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+
+        prefix = self.formatter.format_prompt_prefix(prompt)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(input_value: Value) -> Value:
+            async with semaphore:
+                return await self._arun_prompt(prompt, input_value, prefix)
+
+        tasks = [asyncio.ensure_future(run(input_value)) for input_value in input_values]
+        if return_exceptions:
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            # gather does not stop the other tasks when one of them fails, so they would keep calling the LLM
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def arun_prompt_packed(
+        self,
+        prompt: Prompt,
+        input_values: Sequence[Value],
+        *,
+        pack_size: int = 10,
+        max_concurrency: int = 64,
+        return_exceptions: bool = True,
+    ) -> List[Union[Value, Exception]]:
+        """Run the given prompt for many input values, answering up to `pack_size` of them in each LLM call.
+
+        This is the async counterpart of `TextLLMPromptRunner.run_prompt_packed`: packs run concurrently as asyncio
+        tasks, and inputs whose output is missing or cannot be parsed fall back to an individual `arun_prompt` call.
+
+        Args:
+            prompt: The prompt to run. It must be an instance of Prompt.
+            input_values: The input values to use.
+            pack_size: The maximum number of inputs per LLM call. Defaults to 10.
+            max_concurrency: The maximum number of packs running at the same time. Defaults to 64.
+            return_exceptions: Whether to return the exception raised for an input in place of its result.
+                If False, the first exception (in input order) is raised once all packs are done. Defaults to True.
+
+        Returns:
+            The results, in the same order as input_values.
+        """
+        if pack_size < 1:
+            raise ValueError(f"pack_size must be >= 1, got {pack_size}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+
+        prefix = self.formatter.format_prompt_prefix(prompt)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(pack: Sequence[Value]) -> List[Union[Value, Exception]]:
+            async with semaphore:
+                return await self._arun_pack(prompt, pack, prefix)
+
+        packs = [input_values[i : i + pack_size] for i in range(0, len(input_values), pack_size)]
+        results = [
+            result for pack_results in await asyncio.gather(*[run(pack) for pack in packs]) for result in pack_results
+        ]
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    async def _arun_pack(
+        self, prompt: Prompt, input_values: Sequence[Value], prefix: str
+    ) -> List[Union[Value, Exception]]:
+        intercepted: Dict[int, Value] = {}
+        errors: Dict[int, Exception] = {}
+        for i, input_value in enumerate(input_values):
+            try:
+                intercepted[i] = await self._abefore_run(prompt, input_value)
+            except Exception as e:
+                errors[i] = e
+
+        packed = list(intercepted)
+        parsed: Dict[int, Union[Value, Exception]] = {}
+        raw_req = (
+            _format_pack(self.formatter, self.max_prompt_tokens, prompt, [intercepted[i] for i in packed], prefix)
+            if len(packed) > 1
+            else None
+        )
+        if raw_req is not None:
+            try:
+                raw_resp = await self._agenerate_pack(raw_req)
+            except PromptTooLargeError:
+                pass
+            except Exception as e:
+                errors.update((i, e) for i in packed)
+            else:
+                parsed = _parse_pack(self.formatter, prompt, raw_resp, packed)
+
+        results: List[Union[Value, Exception]] = []
+        for i in range(len(input_values)):
+            if i in errors:
+                results.append(errors[i])
+                continue
+            input_value, resp = intercepted[i], parsed.get(i)
+            try:
+                if resp is None or isinstance(resp, Exception):
+                    results.append(await self._arun_intercepted(prompt, input_value, prefix))
+                else:
+                    results.append(await self._aafter_run(prompt, resp))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _agenerate_pack(self, raw_req: str) -> str:
+        policy = self.retry_policy or _NO_RETRY
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._retry_counter.add_attempt()
+            try:
+                return await self.async_text_llm.agenerate(raw_req)
+            except NEVER_RETRIED_ERRORS:
+                raise
+            except policy.transport_errors as e:
+                error = e
+
+            delay = self._retry_counter.next_delay(policy, attempt, TRANSPORT_ERROR, time.monotonic() - start)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    async def _abefore_run(self, prompt: Prompt, input_value: Value) -> Value:
+        for interceptor in self.interceptors:
+            input_value = await interceptor.abefore_run(prompt, input_value)
+        return input_value
+
+    async def _aafter_run(self, prompt: Prompt, resp: Value) -> Value:
+        for interceptor in reversed(self.interceptors):
+            resp = await interceptor.aafter_run(prompt, resp)
         return resp
+
+    async def _arun_prompt(self, prompt: Prompt, input_value: Value, prefix: Optional[str] = None) -> Value:
+        input_value = await self._abefore_run(prompt, input_value)
+        return await self._arun_intercepted(prompt, input_value, prefix)
+
+    async def _arun_intercepted(self, prompt: Prompt, input_value: Value, prefix: Optional[str] = None) -> Value:
+        raw_req = self.formatter.format_prompt(prompt, input_value, prefix=prefix)
+        _check_prompt_tokens(self.formatter, self.max_prompt_tokens, raw_req)
+        resp = await self._agenerate_with_retry(prompt, raw_req)
+        return await self._aafter_run(prompt, resp)
+
+    async def _agenerate_with_retry(self, prompt: Prompt, raw_req: str) -> Value:
+        policy = self.retry_policy or _NO_RETRY
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self._hedge_state is None:
+                    _, resp = await self._acall(self.async_text_llm, prompt, raw_req, policy)
+                else:
+                    _, resp = await self._ahedged_call(prompt, raw_req, policy)
+                return resp
+            except _AttemptFailed as e:
+                failure = e
+
+            delay = self._retry_counter.next_delay(policy, attempt, failure.cause, time.monotonic() - start)
+            if delay is None:
+                raise failure.error
+            await asyncio.sleep(delay)
+
+    async def _acall(self, llm: AsyncTextLLM, prompt: Prompt, raw_req: str, policy: RetryPolicy) -> Tuple[str, Value]:
+        # errors handled by the retry policy are raised as _AttemptFailed
+        self._retry_counter.add_attempt()
+        try:
+            raw_resp = await llm.agenerate(raw_req)
+        except NEVER_RETRIED_ERRORS:
+            raise
+        except policy.transport_errors as e:
+            raise _AttemptFailed(TRANSPORT_ERROR, e)
+        try:
+            return raw_resp, self.formatter.parse(prompt, raw_resp)
+        except NEVER_RETRIED_ERRORS:
+            raise
+        except policy.parse_errors as e:
+            raise _AttemptFailed(PARSE_ERROR, e, raw_resp)
+
+    async def _ahedged_call(self, prompt: Prompt, raw_req: str, policy: RetryPolicy) -> Tuple[str, Value]:
+        state = self._hedge_state
+        assert state is not None
+        state.add(requests=1)
+
+        async def timed_call(llm: AsyncTextLLM) -> Tuple[str, Value]:
+            start = time.monotonic()
+            result = await self._acall(llm, prompt, raw_req, policy)
+            state.record_latency(time.monotonic() - start)
+            return result
+
+        primary = asyncio.ensure_future(timed_call(self.async_text_llm))
+        tasks = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=state.delay())
+            if done:
+                winner = primary
+                return primary.result()
+
+            hedge = asyncio.ensure_future(timed_call(self.async_hedge_llm or self.async_text_llm))
+            tasks.append(hedge)
+            state.add(hedges=1, extra_input_tokens=estimate_tokens(raw_req))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # prefer the primary call if both completed
+                for task in sorted(done, key=lambda t: t is hedge):
+                    if task.exception() is None:
+                        winner = task
+                        if task is hedge:
+                            state.add(hedge_wins=1)
+                        return task.result()
+            # both calls failed
+            return primary.result()
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                    if winner is not None:
+                        state.add(cancelled=1)
+                elif winner is not None:
+                    state.account_loser(task)
+
+    def retry_stats(self) -> RetryStats:
+        """Return the counters of the LLM calls and retries made by this runner."""
+        return self._retry_counter.stats()
+
+    def hedging_stats(self) -> HedgingStats:
+        """Return the counters of the duplicate calls made by this runner, or empty counters without hedging."""
+        if self._hedge_state is None:
+            return HedgingStats()
+        return self._hedge_state.stats()
+
+
+_NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+def _check_prompt_tokens(formatter: PromptFormatter, max_prompt_tokens: Optional[int], raw_req: str) -> None:
+    # the rendered request is counted as sent, so the prompt is not rendered a second time
+    if max_prompt_tokens is None:
+        return
+    tokens = formatter.token_counter.count(raw_req)
+    if tokens > max_prompt_tokens:
+        raise PromptTooLargeError(tokens, max_prompt_tokens)
+
+
+def _format_pack(
+    formatter: PromptFormatter,
+    max_prompt_tokens: Optional[int],
+    prompt: Prompt,
+    input_values: List[Value],
+    prefix: str,
+) -> Optional[str]:
+    """Format the packed request, or return None if the inputs must fall back to individual calls."""
+    try:
+        raw_req = formatter.format_packed_prompt(prompt, input_values, prefix=prefix)
+    except (ValueError, TypeError):
+        return None
+    if max_prompt_tokens is not None and formatter.token_counter.count(raw_req) > max_prompt_tokens:
+        return None
+    return raw_req
+
+
+def _parse_pack(
+    formatter: PromptFormatter, prompt: Prompt, raw_resp: str, packed: List[int]
+) -> Dict[int, Union[Value, Exception]]:
+    # the output of an input that cannot be parsed is an exception, and falls back to an individual call
+    try:
+        return dict(zip(packed, formatter.parse_packed(prompt, raw_resp, len(packed))))
+    except (ValueError, SyntaxError):
+        return {}
+
+
+class _AttemptFailed(Exception):
+    """An error of an LLM call or of parsing its output that the retry policy handles."""
+
+    def __init__(self, cause: str, error: Exception, raw_response: Optional[str] = None):
+        super().__init__(cause, error)
+        self.cause = cause
+        self.error = error
+        self.raw_response = raw_response
+
+
+class _Cancelled(Exception):
+    """Raised in a losing hedged call to stop its stream."""
+
+    def __init__(self, partial_response: str):
+        super().__init__()
+        self.partial_response = partial_response
+
+
+def _generate_until_cancelled(llm: TextLLM, raw_req: str, cancelled: Optional[threading.Event]) -> str:
+    if cancelled is None or not isinstance(llm, StreamingTextLLM):
+        return llm.generate(raw_req)
+
+    chunks: List[str] = []
+    stream = llm.generate_stream(raw_req)
+    try:
+        for chunk in stream:
+            if cancelled.is_set():
+                raise _Cancelled("".join(chunks))
+            chunks.append(chunk)
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return "".join(chunks)
+
+
+class _HedgeState:
+    """The recent latencies and the counters of the hedged calls of a runner."""
+
+    def __init__(self, policy: HedgingPolicy):
+        self.policy = policy
+        self._latencies: Deque[float] = deque(maxlen=policy.window)
+        self._stats = HedgingStats()
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return self.policy.hedge_delay(latencies)
+
+    def record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self._stats, name, getattr(self._stats, name) + count)
+
+    def account_loser(self, future: Any) -> None:
+        """Count the output generated by a losing call, once it is done. `future` is a Future or an asyncio Task."""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.add(extra_output_tokens=estimate_tokens(future.result()[0]))
+            return
+        if isinstance(error, _AttemptFailed):
+            if error.raw_response is not None:
+                self.add(extra_output_tokens=estimate_tokens(error.raw_response))
+                return
+            error = error.error
+        if isinstance(error, _Cancelled):
+            self.add(cancelled=1, extra_output_tokens=estimate_tokens(error.partial_response))
+
+    def stats(self) -> HedgingStats:
+        with self._lock:
+            return self._stats.copy_me()
+
+
+class _RetryCounter:
+    """Thread-safe counters behind RetryStats."""
+
+    def __init__(self):
+        self._stats = RetryStats()
+        self._lock = threading.Lock()
+
+    def add_attempt(self) -> None:
+        with self._lock:
+            self._stats.attempts += 1
+
+    def next_delay(self, policy: RetryPolicy, attempt: int, cause: str, elapsed: float) -> Optional[float]:
+        """Ask the policy whether to retry, and count the retry or the failure."""
+        delay = policy.next_delay(attempt, cause, elapsed)
+        with self._lock:
+            if delay is None:
+                self._stats.failures += 1
+            elif cause == TRANSPORT_ERROR:
+                self._stats.transport_retries += 1
+            else:
+                self._stats.parse_retries += 1
+        return delay
+
+    def stats(self) -> RetryStats:
+        with self._lock:
+            return self._stats.copy_me()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from .dataclass import DataClass
+from .llm import LLM
+from .lru_cache import CacheInfo
+from .value_formatter import Value
+
+
+class CachedResponse(DataClass):
+    """A response of an LLM stored in a ResponseCache.
+
+    Attributes:
+        raw_response: The raw text generated by the LLM.
+        value: The value parsed from raw_response, if the runner was asked to cache parsed values.
+    """
+
+    raw_response: str
+    value: Optional[Value] = None
+
+
+class ResponseCache(ABC):
+    """A cache of LLM responses, keyed on the rendered request and the identity of the LLM.
+
+    Attributes:
+        persistent: Whether the responses outlive the process. A persistent cache is only used with LLMs that have a
+            stable identity (see `LLM.has_stable_identity`). Defaults to False.
+    """
+
+    persistent: bool = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached response for the key, or None if it is missing or expired."""
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def set(self, key: str, response: CachedResponse) -> None:
+        """Store the response under the key."""
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def cache_info(self) -> CacheInfo:
+        """Return the hit/miss statistics of the cache."""
+        pass  # pragma: no cover
+
+
+def response_cache_key(llm: LLM, raw_request: str) -> str:
+    """Return a stable cache key for sending the raw request to the LLM.
+
+    Args:
+        llm: The LLM the request is sent to.
+        raw_request: The rendered request text.
+
+    Returns:
+        A hex digest identifying the pair.
+    """
+    h = hashlib.sha256(llm.identity().encode())
+    h.update(b"\0")
+    h.update(raw_request.encode())
+    return h.hexdigest()
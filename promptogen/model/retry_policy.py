@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import random
+from typing import Optional, Tuple, Type
+
+from .dataclass import DataClass
+from .token_counter import PromptTooLargeError
+
+TRANSPORT_ERROR = "transport"
+PARSE_ERROR = "parse"
+
+# errors that fail the same way on every attempt, so that they are never retried whatever the policy
+NEVER_RETRIED_ERRORS: Tuple[Type[Exception], ...] = (PromptTooLargeError, TypeError)
+
+
+class RetryPolicy(DataClass):
+    """When and how long to wait before retrying a prompt whose LLM call or output parsing failed.
+
+    Errors are classified by where they are raised: an error raised by the LLM is a transport error, and an error
+    raised while parsing the output (ValueError and SyntaxError by default, e.g. OutputFormatError) is a parse error.
+    Only connection errors and timeouts are transport errors by default; add the transient errors of your LLM client
+    (e.g. its rate limit error) to `transport_errors`. Other errors, and the errors in NEVER_RETRIED_ERRORS
+    (PromptTooLargeError and TypeError), are raised at once. The rendered request is reused across attempts.
+
+    The n-th retry waits `initial_backoff * backoff_multiplier ** (n - 1)` seconds, capped at `max_backoff`, and
+    reduced by a random fraction of up to `jitter` so that concurrent callers do not retry in lockstep.
+
+    Attributes:
+        max_attempts: The maximum number of attempts, including the first one. Defaults to 3.
+        initial_backoff: The number of seconds to wait before the first retry. Defaults to 0.5.
+        backoff_multiplier: The factor applied to the wait after each retry. Defaults to 2.0.
+        max_backoff: The maximum number of seconds to wait before a retry. Defaults to 30.0.
+        jitter: The maximum fraction of the wait removed at random, between 0 and 1. Defaults to 0.5.
+        deadline: The maximum number of seconds from the first attempt after which no retry is started.
+            Defaults to None (no deadline).
+        retry_on_transport_error: Whether to retry transport errors. Defaults to True.
+        retry_on_parse_error: Whether to retry parse errors. Defaults to True.
+        transport_errors: The exceptions raised by the LLM that are retried. Defaults to
+            (ConnectionError, TimeoutError).
+        parse_errors: The exceptions raised while parsing the output that are retried.
+            Defaults to (ValueError, SyntaxError).
+    """
+
+    max_attempts: int = 3
+    initial_backoff: float = 0.5
+    backoff_multiplier: float = 2.0
+    max_backoff: float = 30.0
+    jitter: float = 0.5
+    deadline: Optional[float] = None
+    retry_on_transport_error: bool = True
+    retry_on_parse_error: bool = True
+    transport_errors: Tuple[Type[Exception], ...] = (ConnectionError, TimeoutError)
+    parse_errors: Tuple[Type[Exception], ...] = (ValueError, SyntaxError)
+
+    def backoff(self, retry: int) -> float:
+        """Return the number of seconds to wait before the given retry, jitter included.
+
+        Args:
+            retry: The number of the retry, starting at 1.
+        """
+        delay = min(self.max_backoff, self.initial_backoff * self.backoff_multiplier ** (retry - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def next_delay(self, attempt: int, cause: str, elapsed: float) -> Optional[float]:
+        """Decide whether to retry after a failed attempt.
+
+        Args:
+            attempt: The number of attempts made so far, starting at 1.
+            cause: The cause of the failure, "transport" or "parse".
+            elapsed: The number of seconds since the first attempt started.
+
+        Returns:
+            The number of seconds to wait before the next attempt, or None not to retry.
+        """
+        if cause == TRANSPORT_ERROR and not self.retry_on_transport_error:
+            return None
+        if cause == PARSE_ERROR and not self.retry_on_parse_error:
+            return None
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+
+class RetryStats(DataClass):
+    """Counters of the retries made by a prompt runner.
+
+    Attributes:
+        attempts: The number of LLM calls made.
+        transport_retries: The number of retries after a transport error.
+        parse_retries: The number of retries after a parse error.
+        failures: The number of prompts that failed after their last attempt.
+    """
+
+    attempts: int = 0
+    transport_retries: int = 0
+    parse_retries: int = 0
+    failures: int = 0
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Callable, List
+
+from .dataclass import DataClass
+
+
+class TokenCounter(ABC):
+    """Interface for counting the tokens of a text.
+
+    A TokenCounter is also a `(text: str) -> int` callable, so it can be passed wherever a token estimating function
+    is expected (e.g. to a RateLimiter).
+    """
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass  # pragma: no cover
+
+    def __call__(self, text: str) -> int:
+        return self.count(text)
+
+
+class FunctionBasedTokenCounter(TokenCounter):
+    """Token counter wrapper.
+    It wraps a function that counts the tokens of the given text, e.g. `lambda s: len(tokenizer.encode(s))`.
+    """
+
+    _count: Callable[[str], int]
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        """Initialize a FunctionBasedTokenCounter.
+
+        Args:
+            count_tokens: (text: str) -> (tokens: int)
+                A function that counts the tokens of the given text.
+        """
+        if not callable(count_tokens):
+            raise TypeError("count_tokens must be callable")
+        self._count = count_tokens
+
+    def count(self, text: str) -> int:
+        return self._count(text)
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """Estimate the number of tokens of a text without a tokenizer.
+
+    ASCII text is assumed to take about `chars_per_token` characters per token, and every other character (e.g.
+    Japanese or Chinese) one token, which is close to what BPE tokenizers produce. The estimate never returns 0.
+
+    Args:
+        chars_per_token: The number of ASCII characters per token. Defaults to 4.0.
+    """
+
+    chars_per_token: float
+
+    def __init__(self, chars_per_token: float = 4.0):
+        if chars_per_token <= 0:
+            raise ValueError(f"chars_per_token must be > 0, got {chars_per_token}")
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        if text.isascii():
+            return int(len(text) / self.chars_per_token) + 1
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return int(ascii_chars / self.chars_per_token) + len(text) - ascii_chars + 1
+
+
+_default_token_counter = HeuristicTokenCounter()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text with the default HeuristicTokenCounter."""
+    return _default_token_counter.count(text)
+
+
+class PromptTokenCounts(DataClass):
+    """The number of tokens of each section of a formatted prompt.
+
+    Sections are counted separately, so their sum may differ slightly from `total`, which also counts the headings
+    and separators between them.
+
+    Attributes:
+        description: The tokens of the description of the prompt, the formatter and the parameters.
+        template: The tokens of the template, or 0 if it is not shown.
+        examples: The tokens of each example shown, in order.
+        input: The tokens of the input, or 0 if the prompt is formatted without input.
+        total: The tokens of the whole formatted prompt.
+    """
+
+    description: int
+    template: int
+    examples: List[int]
+    input: int
+    total: int
+
+
+class PromptTooLargeError(ValueError):
+    """Raised when a formatted prompt has more tokens than allowed."""
+
+    tokens: int
+    max_tokens: int
+
+    def __init__(self, tokens: int, max_tokens: int):
+        super().__init__(f"The prompt has {tokens} tokens, more than the maximum of {max_tokens}.")
+        self.tokens = tokens
+        self.max_tokens = max_tokens
@@ -8,6 +8,14 @@ from typing_extensions import TypeAlias
 Value: TypeAlias = Dict[str, Any]
 
 
+class OutputFormatError(ValueError):
+    """The output does not match the format expected by the formatter.
+
+    Incremental parsers raise it as soon as the output received so far can no longer become valid, so the
+    generation can be abandoned before it completes.
+    """
+
+
 class ValueFormatter(ABC):
     @abstractmethod
     def description(self) -> str:
@@ -20,3 +28,55 @@ class ValueFormatter(ABC):
     @abstractmethod
     def parse(self, key_types: List[Tuple[str, type]], s: str) -> Value:
         pass  # pragma: no cover
+
+    def incremental_parser(self, key_types: List[Tuple[str, type]]) -> IncrementalValueParser:
+        """Return a parser that consumes the output chunk by chunk.
+
+        Formatters that can tell when a key is complete before the whole output is available override this.
+        By default, the output is buffered and parsed once it is complete.
+        """
+        return BufferedValueParser(self, key_types)
+
+
+class IncrementalValueParser(ABC):
+    """A parser that consumes an output chunk by chunk and reports each key as soon as its value is complete."""
+
+    @abstractmethod
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of the output.
+
+        Args:
+            chunk: The next chunk of the output.
+
+        Returns:
+            The keys whose values became complete with this chunk, with their parsed values.
+
+        Raises:
+            OutputFormatError: If the output received so far can no longer be parsed.
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def close(self) -> Value:
+        """Finish parsing and return the whole parsed value.
+
+        Raises:
+            ValueError: If the output is invalid, as the formatter's parse would.
+        """
+        pass  # pragma: no cover
+
+
+class BufferedValueParser(IncrementalValueParser):
+    """An incremental parser that buffers the output and parses it with the formatter once it is complete."""
+
+    def __init__(self, formatter: ValueFormatter, key_types: List[Tuple[str, type]]):
+        self.formatter = formatter
+        self.key_types = key_types
+        self._chunks: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._chunks.append(chunk)
+        return []
+
+    def close(self) -> Value:
+        return self.formatter.parse(self.key_types, "".join(self._chunks))
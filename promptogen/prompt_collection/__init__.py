@@ -1,15 +1,25 @@
-from .prompt_collection import PromptCollection
-from .prompts import (
-    ExampleCreatorPrompt,
-    PromptCreatorPrompt,
-    PromptOptimizerPrompt,
-    PythonCodeGeneratorPrompt,
-    TextCategorizerPrompt,
-    TextSummarizerPrompt,
-)
+import typing as _typing
+
+from promptogen._lazy_import import lazy_attributes as _lazy_attributes
+
+if _typing.TYPE_CHECKING:
+    from .lazy_prompt_collection import LazyPromptCollection, PromptIndex, PromptIndexEntry, save_lazy_prompt_collection
+    from .prompt_collection import PromptCollection
+    from .prompts import (
+        ExampleCreatorPrompt,
+        PromptCreatorPrompt,
+        PromptOptimizerPrompt,
+        PythonCodeGeneratorPrompt,
+        TextCategorizerPrompt,
+        TextSummarizerPrompt,
+    )
 
 __all__ = [
     "PromptCollection",
+    "LazyPromptCollection",
+    "PromptIndex",
+    "PromptIndexEntry",
+    "save_lazy_prompt_collection",
     # prompts
     "PromptCreatorPrompt",
     "TextCategorizerPrompt",
@@ -18,3 +28,21 @@ __all__ = [
     "PromptOptimizerPrompt",
     "PythonCodeGeneratorPrompt",
 ]
+
+# NOTE: The predefined prompts build their examples when their module is imported, so they are imported on first access.
+__getattr__, __dir__ = _lazy_attributes(
+    __name__,
+    {
+        "PromptCollection": ".prompt_collection",
+        "LazyPromptCollection": ".lazy_prompt_collection",
+        "PromptIndex": ".lazy_prompt_collection",
+        "PromptIndexEntry": ".lazy_prompt_collection",
+        "save_lazy_prompt_collection": ".lazy_prompt_collection",
+        "PromptCreatorPrompt": ".prompts.prompt_creator",
+        "TextCategorizerPrompt": ".prompts.text_categorizer",
+        "TextSummarizerPrompt": ".prompts.text_summarizer",
+        "ExampleCreatorPrompt": ".prompts.prompt_example_creator",
+        "PromptOptimizerPrompt": ".prompts.prompt_optimizer",
+        "PythonCodeGeneratorPrompt": ".prompts.python_code_generator",
+    },
+)
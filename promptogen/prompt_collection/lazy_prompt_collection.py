@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from promptogen.model.dataclass import DataClass
+from promptogen.model.lru_cache import CacheInfo, LRUCache
+from promptogen.model.prompt import FrozenPrompt, Prompt
+
+from .prompt_collection import PromptCollection
+
+LAZY_PROMPT_COLLECTION_FORMAT_VERSION = 1
+
+
+class PromptIndexEntry(DataClass):
+    """An entry of the index of a lazy prompt collection file.
+
+    Attributes:
+        name: The name of the prompt.
+        signature: The function signature of the prompt.
+        description: The description of the prompt.
+        offset: The byte offset of the serialized prompt, relative to the end of the index line.
+        length: The byte length of the serialized prompt.
+        fingerprint: The fingerprint of the prompt.
+    """
+
+    name: str
+    signature: str
+    description: str
+    offset: int
+    length: int
+    fingerprint: str
+
+
+class PromptIndex(DataClass):
+    """The index of a lazy prompt collection file."""
+
+    version: int = LAZY_PROMPT_COLLECTION_FORMAT_VERSION
+    entries: List[PromptIndexEntry]
+
+
+def save_lazy_prompt_collection(
+    filename: str, prompts: Union[PromptCollection, Dict[str, Prompt], Iterable[Prompt]]
+) -> None:
+    """Save prompts in the lazy prompt collection format.
+
+    The file starts with a one-line JSON index, followed by one line of JSON per prompt, so that a
+    LazyPromptCollection can read the index alone and seek to each prompt on demand.
+
+    Args:
+        filename: The name of the file to save the prompts to.
+        prompts: The prompts to save. Prompts given as an iterable are keyed on their names.
+
+    Raises:
+        ValueError: If two prompts have the same name.
+    """
+    if isinstance(prompts, PromptCollection):
+        items = list(prompts.prompts.items())
+    elif isinstance(prompts, dict):
+        items = list(prompts.items())
+    else:
+        items = [(prompt.name, prompt) for prompt in prompts]
+
+    entries = []
+    lines = []
+    offset = 0
+    names = set()
+    for name, prompt in items:
+        if name in names:
+            raise ValueError(f"Duplicate prompt name: {name}")
+        names.add(name)
+        line = prompt.model_dump_json().encode() + b"\n"
+        entries.append(
+            PromptIndexEntry(
+                name=name,
+                signature=prompt.function_signature(),
+                description=prompt.description,
+                offset=offset,
+                length=len(line) - 1,
+                fingerprint=prompt.fingerprint(),
+            )
+        )
+        lines.append(line)
+        offset += len(line)
+
+    with open(filename, "wb") as f:
+        f.write(PromptIndex(entries=entries).model_dump_json().encode() + b"\n")
+        for line in lines:
+            f.write(line)
+
+
+class LazyPromptCollection:
+    """A read-only collection of prompts that are loaded from a file only when accessed.
+
+    Opening the collection reads only the index of the file, so listing names, `summary()` and `details()` do not
+    deserialize any prompt. A prompt is read, validated and returned as a FrozenPrompt when it is first accessed, and
+    kept in a bounded cache.
+
+    Args:
+        filename: The name of a file written by `save_lazy_prompt_collection`.
+        cache_size: The maximum number of deserialized prompts to keep. Defaults to 128.
+    """
+
+    filename: str
+    index: PromptIndex
+
+    def __init__(self, filename: str, cache_size: int = 128):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            header = f.readline()
+        self.index = PromptIndex.model_validate_json(header)
+        if self.index.version != LAZY_PROMPT_COLLECTION_FORMAT_VERSION:
+            raise ValueError(f"Unsupported lazy prompt collection format version: {self.index.version}")
+        self._data_start = len(header)
+        self._entries = {entry.name: entry for entry in self.index.entries}
+        self._cache: LRUCache[FrozenPrompt] = LRUCache(maxsize=cache_size)
+
+    def __repr__(self) -> str:
+        prompt_names = self.names()[:20]
+        return f"{self.__class__.__name__}(prompt_names={prompt_names!r})"
+
+    def __str__(self) -> str:
+        return self.summary()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __getitem__(self, name: str) -> FrozenPrompt:
+        prompt = self.get(name)
+        if prompt is None:
+            raise KeyError(name)
+        return prompt
+
+    def names(self) -> List[str]:
+        """Return the names of the prompts, in the order they were saved."""
+        return list(self._entries)
+
+    def get(self, name: str) -> Optional[FrozenPrompt]:
+        """Return the prompt with the given name, loading it from the file if it is not cached.
+
+        Args:
+            name: The name of the prompt.
+
+        Returns:
+            The prompt, or None if the collection has no prompt with the name.
+
+        Raises:
+            ValueError: If the fingerprint of the prompt does not match the index.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+
+        prompt = self._cache.get(name)
+        if prompt is None:
+            prompt = FrozenPrompt.model_validate_json(self._read(entry))
+            # the formatter caches are keyed on the fingerprint, so a stale index must not be trusted
+            if prompt.fingerprint() != entry.fingerprint:
+                raise ValueError(f"The index of {self.filename} does not match the prompt {name!r}; save it again")
+            self._cache.put(name, prompt)
+        return prompt
+
+    def _read(self, entry: PromptIndexEntry) -> bytes:
+        with open(self.filename, "rb") as f:
+            f.seek(self._data_start + entry.offset)
+            return f.read(entry.length)
+
+    def cache_info(self) -> CacheInfo:
+        """Return the hit/miss statistics of the cache of deserialized prompts."""
+        return self._cache.cache_info()
+
+    def summary(self) -> str:
+        def section_header(title):
+            return f"\n{title}\n" + "-" * len(title)
+
+        prompt_overview = section_header("Prompts Overview")
+        for entry in self.index.entries:
+            prompt_overview += f"\n  {entry.name}: {entry.signature}"
+
+        return f"{prompt_overview}\n\nUse 'details()' method to view full details of each prompt."
+
+    def details(self) -> str:
+        def section_header(title):
+            return f"\n{title}\n" + "-" * len(title)
+
+        prompt_details = section_header("Prompts Details")
+        for entry in self.index.entries:
+            prompt_details += f"\n  {entry.name}: {entry.description}\n"
+
+        return f"{prompt_details}"
+
+    def to_prompt_collection(self) -> PromptCollection:
+        """Load every prompt and return them as a PromptCollection."""
+        return PromptCollection(
+            prompts={entry.name: Prompt.model_validate_json(self._read(entry)) for entry in self.index.entries},
+        )
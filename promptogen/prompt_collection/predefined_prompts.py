@@ -4,19 +4,20 @@ from typing import List
 
 from promptogen.model.prompt import Prompt
 
-from .prompts import (
-    DictTranslatorPrompt,
-    ExampleCreatorPrompt,
-    PromptCreatorPrompt,
-    PromptOptimizerPrompt,
-    PythonCodeGeneratorPrompt,
-    TextCategorizerPrompt,
-    TextCondenserPrompt,
-    TextSummarizerPrompt,
-)
-
 
 def load_predefined_prompts() -> List[Prompt]:
+    # NOTE: Imported here so that the predefined prompts are only built when they are needed.
+    from .prompts import (
+        DictTranslatorPrompt,
+        ExampleCreatorPrompt,
+        PromptCreatorPrompt,
+        PromptOptimizerPrompt,
+        PythonCodeGeneratorPrompt,
+        TextCategorizerPrompt,
+        TextCondenserPrompt,
+        TextSummarizerPrompt,
+    )
+
     prompts: List[Prompt] = [
         PromptCreatorPrompt(),
         TextCategorizerPrompt(),
@@ -1,11 +1,16 @@
-from .dict_translator import DictTranslatorPrompt
-from .prompt_creator import PromptCreatorPrompt
-from .prompt_example_creator import ExampleCreatorPrompt
-from .prompt_optimizer import PromptOptimizerPrompt
-from .python_code_generator import PythonCodeGeneratorPrompt
-from .text_categorizer import TextCategorizerPrompt
-from .text_condenser import TextCondenserPrompt
-from .text_summarizer import TextSummarizerPrompt
+import typing as _typing
+
+from promptogen._lazy_import import lazy_attributes as _lazy_attributes
+
+if _typing.TYPE_CHECKING:
+    from .dict_translator import DictTranslatorPrompt
+    from .prompt_creator import PromptCreatorPrompt
+    from .prompt_example_creator import ExampleCreatorPrompt
+    from .prompt_optimizer import PromptOptimizerPrompt
+    from .python_code_generator import PythonCodeGeneratorPrompt
+    from .text_categorizer import TextCategorizerPrompt
+    from .text_condenser import TextCondenserPrompt
+    from .text_summarizer import TextSummarizerPrompt
 
 __all__ = [
     "PromptCreatorPrompt",
@@ -17,3 +22,17 @@ __all__ = [
     "TextCondenserPrompt",
     "DictTranslatorPrompt",
 ]
+
+__getattr__, __dir__ = _lazy_attributes(
+    __name__,
+    {
+        "PromptCreatorPrompt": ".prompt_creator",
+        "ExampleCreatorPrompt": ".prompt_example_creator",
+        "PromptOptimizerPrompt": ".prompt_optimizer",
+        "PythonCodeGeneratorPrompt": ".python_code_generator",
+        "TextCategorizerPrompt": ".text_categorizer",
+        "TextSummarizerPrompt": ".text_summarizer",
+        "TextCondenserPrompt": ".text_condenser",
+        "DictTranslatorPrompt": ".dict_translator",
+    },
+)
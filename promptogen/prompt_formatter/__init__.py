@@ -1,5 +1,7 @@
+from .json_codec import JsonCodec, OrjsonJsonCodec, StdlibJsonCodec, UjsonJsonCodec, get_json_codec
 from .json_formatter import JsonPromptFormatter, JsonValueFormatter
 from .key_value_formatter import KeyValueFormatter, KeyValuePromptFormatter
+from .literal_parser import LiteralParseError, LiteralParser, parse_literal
 from .prompt_formatter import PromptFormatter, PromptFormatterConfig, PromptFormatterInterface
 from .text_formatter import TextValueFormatter
 
@@ -12,4 +14,12 @@ __all__ = [
     "TextValueFormatter",
     "JsonValueFormatter",
     "JsonPromptFormatter",
+    "JsonCodec",
+    "StdlibJsonCodec",
+    "OrjsonJsonCodec",
+    "UjsonJsonCodec",
+    "get_json_codec",
+    "LiteralParser",
+    "LiteralParseError",
+    "parse_literal",
 ]
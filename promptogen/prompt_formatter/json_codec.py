@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from promptogen.model.dataclass import DataClass
+
+
+class JsonCodec(ABC):
+    """Interface for encoding values to JSON and decoding them back.
+
+    Encoders convert DataClass and BaseModel values wherever they appear in the value, while encoding it, so the
+    value does not need to be converted to plain dicts beforehand.
+    """
+
+    name: str
+
+    @abstractmethod
+    def dumps(self, value: Any, *, indent: Optional[int] = None, compact: bool = False) -> str:
+        """Encode a value to a JSON string, keeping non-ASCII characters as they are.
+
+        Args:
+            value: The value to encode.
+            indent: The indent of nested values, or None to write the value on one line. Defaults to None.
+            compact: Whether to omit the spaces after separators. It only applies when indent is None.
+                Defaults to False.
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def loads(self, s: str) -> Any:
+        """Decode a JSON string.
+
+        Raises:
+            ValueError: If the string is not valid JSON.
+        """
+        pass  # pragma: no cover
+
+
+class StdlibJsonCodec(JsonCodec):
+    """The JSON codec of the standard library.
+
+    Note that encoding with an indent is done in pure Python, so `indent=None` is several times faster on large
+    values.
+    """
+
+    name = "stdlib"
+
+    def dumps(self, value: Any, *, indent: Optional[int] = None, compact: bool = False) -> str:
+        separators = (",", ":") if compact and indent is None else None
+        return json.dumps(value, ensure_ascii=False, indent=indent, separators=separators, default=encode_model)
+
+    def loads(self, s: str) -> Any:
+        return json.loads(s)
+
+
+class OrjsonJsonCodec(JsonCodec):
+    """The JSON codec of orjson, which is several times faster than the standard library.
+
+    orjson only supports an indent of 2 and writes single-line values without spaces, so the output differs from
+    StdlibJsonCodec for other settings. Any indent is rendered with 2 spaces, and `compact` has no effect.
+
+    Raises:
+        ImportError: If orjson is not installed.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, value: Any, *, indent: Optional[int] = None, compact: bool = False) -> str:
+        option = self._orjson.OPT_NON_STR_KEYS
+        if indent is not None:
+            option |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(value, option=option, default=encode_model).decode()
+
+    def loads(self, s: str) -> Any:
+        return self._orjson.loads(s)
+
+
+class UjsonJsonCodec(JsonCodec):
+    """The JSON codec of ujson, which is faster than the standard library.
+
+    ujson writes single-line values without spaces, so `compact` has no effect.
+
+    Raises:
+        ImportError: If ujson is not installed.
+    """
+
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson
+
+        self._ujson = ujson
+
+    def dumps(self, value: Any, *, indent: Optional[int] = None, compact: bool = False) -> str:
+        return self._ujson.dumps(value, ensure_ascii=False, indent=indent or 0, default=encode_model)
+
+    def loads(self, s: str) -> Any:
+        return self._ujson.loads(s)
+
+
+_codecs: Dict[str, Type[JsonCodec]] = {
+    "stdlib": StdlibJsonCodec,
+    "orjson": OrjsonJsonCodec,
+    "ujson": UjsonJsonCodec,
+}
+
+_FASTEST = ["orjson", "ujson", "stdlib"]
+
+_instances: Dict[str, JsonCodec] = {}
+
+
+def get_json_codec(name: str = "stdlib") -> JsonCodec:
+    """Return the JSON codec with the given name.
+
+    Args:
+        name: "stdlib", "orjson", "ujson", or "fastest" for the fastest codec installed. Defaults to "stdlib".
+
+    Raises:
+        ValueError: If the name is unknown.
+        ImportError: If the library of the codec is not installed.
+    """
+    if name == "fastest":
+        for candidate in _FASTEST:
+            try:
+                return get_json_codec(candidate)
+            except ImportError:
+                continue
+    if name not in _codecs:
+        raise ValueError(f"Unknown JSON codec {name!r}, expected one of {sorted([*_codecs, 'fastest'])}.")
+
+    codec = _instances.get(name)
+    if codec is None:
+        codec = _instances[name] = _codecs[name]()
+    return codec
+
+
+def encode_model(o: Any) -> Any:
+    """Convert a DataClass or BaseModel to a dict, for the `default` hook of JSON encoders.
+
+    Raises:
+        TypeError: If the value is not a DataClass or BaseModel.
+    """
+    if isinstance(o, DataClass):
+        return o.to_dict()
+    if isinstance(o, BaseModel):
+        return o.model_dump()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
@@ -1,18 +1,31 @@
-import json
-from typing import List, Optional, Tuple
+import re
+from typing import Any, Callable, List, Optional, Tuple, Union
 
-from promptogen.model.value_formatter import Value, ValueFormatter
-from promptogen.prompt_formatter.prompt_formatter import (
-    PromptFormatter,
-    PromptFormatterConfig,
-    convert_dataclass_to_dict,
-)
+from promptogen.model.token_counter import TokenCounter
+from promptogen.model.value_formatter import IncrementalValueParser, OutputFormatError, Value, ValueFormatter
+from promptogen.prompt_formatter.json_codec import JsonCodec, get_json_codec
+from promptogen.prompt_formatter.prompt_formatter import PromptFormatter, PromptFormatterConfig
 
 
 class JsonPromptFormatter(PromptFormatter):
-    def __init__(self, *, config: PromptFormatterConfig = PromptFormatterConfig(), strict: bool = True):
+    def __init__(
+        self,
+        *,
+        config: PromptFormatterConfig = PromptFormatterConfig(),
+        strict: bool = True,
+        prefix_cache_size: int = 128,
+        token_counter: Union[TokenCounter, Callable[[str], int], None] = None,
+        validate_output: bool = False,
+        codec: Union[JsonCodec, str] = "stdlib",
+        compact: bool = False,
+    ):
         super().__init__(
-            input_formatter=JsonValueFormatter(), output_formatter=JsonValueFormatter(strict=strict), config=config
+            input_formatter=JsonValueFormatter(codec=codec, compact=compact),
+            output_formatter=JsonValueFormatter(strict=strict, codec=codec, compact=compact),
+            config=config,
+            prefix_cache_size=prefix_cache_size,
+            token_counter=token_counter,
+            validate_output=validate_output,
         )
 
 
@@ -22,14 +35,29 @@ class JsonValueFormatter(ValueFormatter):
     Args:
         strict (bool, optional): Whether to check if the output starts and ends with ```json. Defaults to True.
         indent (int | None, optional): The indent to use. Defaults to 1.
+        codec (JsonCodec | str, optional): The JSON codec, or the name of a codec for `get_json_codec`: "stdlib",
+            "orjson", "ujson" or "fastest". Defaults to "stdlib".
+        compact (bool, optional): Whether to write values on a single line without spaces, ignoring indent. It is
+            the fastest to encode and the shortest in tokens. Defaults to False.
     """
 
     strict: bool
     indent: Optional[int]
+    codec: JsonCodec
+    compact: bool
 
-    def __init__(self, strict: bool = True, indent: Optional[int] = 1):
+    def __init__(
+        self,
+        strict: bool = True,
+        indent: Optional[int] = 1,
+        *,
+        codec: Union[JsonCodec, str] = "stdlib",
+        compact: bool = False,
+    ):
         self.strict = strict
         self.indent = indent
+        self.codec = get_json_codec(codec) if isinstance(codec, str) else codec
+        self.compact = compact
 
     def description(self) -> str:
         """The description of the json output formatter."""
@@ -52,26 +80,152 @@ Be careful with the order of brackets in the json."""
         if not isinstance(value, dict):
             raise TypeError(f"Expected output to be an instance of OutputValue, got {type(value).__name__}.")
 
-        value = convert_dataclass_to_dict(value)
-
-        return with_code_block("json", json.dumps(value, ensure_ascii=False, indent=self.indent))
+        indent = None if self.compact else self.indent
+        return with_code_block("json", self.codec.dumps(value, indent=indent, compact=self.compact))
 
     def parse(self, output_keys: List[Tuple[str, type]], output: str) -> Value:
-        output = output.strip()
+        """Parse the output into a value.
+
+        In strict mode, the output must be a ```json code block, surrounded by whitespace only. Otherwise, the JSON
+        is taken from the first code block of the output, ignoring any text around it, or from the whole output if
+        it has no code block.
+
+        Args:
+            output_keys: The keys to parse from the output.
+            output: The output of the LLM.
+
+        Raises:
+            ValueError: If the output is not valid JSON, or lacks one of the keys.
+        """
+        start, end = find_code_block("json", output, strict=self.strict)
+        return _check_output_keys(output_keys, self.codec.loads(output[start:end]))
+
+    def incremental_parser(self, output_keys: List[Tuple[str, type]]) -> IncrementalValueParser:
+        """Return a parser that emits each top-level key as soon as its value is complete.
+
+        Args:
+            output_keys: The keys to parse from the output.
+        """
+        return IncrementalJsonParser(self, output_keys)
+
+
+class IncrementalJsonParser(IncrementalValueParser):
+    """Parse a JSON object chunk by chunk.
+
+    The output is scanned for the first top-level object, tracking strings and nesting, and each top-level value is
+    decoded as soon as the following comma or the closing brace arrives. Anything before the object (such as the
+    code block opener) is skipped. On close, the output is validated by the formatter in strict mode, and only the
+    object found by `feed` is decoded otherwise.
+
+    OutputFormatError is raised by `feed` as soon as the output is definitely invalid: a value that cannot be
+    decoded, text other than the code block closer after the object, or, in strict mode, an output that does not
+    start with ```json. In non-strict mode, text after the object is ignored.
+    """
+
+    def __init__(self, formatter: JsonValueFormatter, output_keys: List[Tuple[str, type]]):
+        self.formatter = formatter
+        self.output_keys = output_keys
+        self._wanted = {key for key, _ in output_keys}
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+        self._key_start = -1
+        self._key: Optional[str] = None
+        self._value_start = -1
+        self._opener_checked = False
+        self._object_start = -1
+        self._object_end = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._buffer += chunk
+        buf = self._buffer
+        completed: List[Tuple[str, Any]] = []
+        if self.formatter.strict and not self._opener_checked:
+            self._check_opener(buf)
+
+        i = self._pos
+        depth, in_string, escape = self._depth, self._in_string, self._escape
+        while i < len(buf) and not self._done:
+            c = buf[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif c == "\\":
+                    escape = True
+                elif c == '"':
+                    in_string = False
+                    if depth == 1 and self._value_start == -1:
+                        self._key = self.formatter.codec.loads(buf[self._key_start : i + 1])
+            elif depth == 0:
+                if c == "{":
+                    depth = 1
+                    self._object_start = i
+            elif c == '"':
+                in_string = True
+                if depth == 1 and self._value_start == -1:
+                    self._key_start = i
+            elif c == ":":
+                if depth == 1 and self._value_start == -1 and self._key is not None:
+                    self._value_start = i + 1
+            elif c == "{" or c == "[":
+                depth += 1
+            elif c == "}" or c == "]":
+                depth -= 1
+                if depth == 0:
+                    self._complete_value(buf[self._value_start : i], completed)
+                    self._done = True
+                    self._object_end = i + 1
+            elif c == "," and depth == 1:
+                self._complete_value(buf[self._value_start : i], completed)
+            i += 1
+
+        if self._done:
+            trailing = buf[i:].strip().strip("`")
+            if trailing and self.formatter.strict:
+                raise OutputFormatError(f"Unexpected text after the JSON object: {trailing[:20]!r}.")
+            i = len(buf)
+
+        self._pos = i
+        self._depth, self._in_string, self._escape = depth, in_string, escape
+        return completed
 
-        if self.strict:
-            if not output.startswith("```json"):
-                raise ValueError("Expected output to start with ```json.")
-            if not output.endswith("```"):
-                raise ValueError("Expected output to end with ```.")
+    def _check_opener(self, buf: str) -> None:
+        s = buf.lstrip()
+        if len(s) >= len(_JSON_CODE_BLOCK_OPENER):
+            if not s.startswith(_JSON_CODE_BLOCK_OPENER):
+                raise OutputFormatError("Expected output to start with ```json.")
+            self._opener_checked = True
+        elif not _JSON_CODE_BLOCK_OPENER.startswith(s):
+            raise OutputFormatError("Expected output to start with ```json.")
 
-        resp = json.loads(remove_code_block("json", output))
+    def _complete_value(self, s: str, completed: List[Tuple[str, Any]]) -> None:
+        if self._value_start != -1 and self._key is not None and self._key in self._wanted:
+            try:
+                completed.append((self._key, self.formatter.codec.loads(s)))
+            except ValueError as e:
+                raise OutputFormatError(f"Invalid JSON value for key {self._key}: {e}") from e
+        self._key = None
+        self._value_start = -1
 
-        for key, _ in output_keys:
-            if key not in resp:
-                raise ValueError(f"Expected output to have key {key}.")
+    def close(self) -> Value:
+        if self.formatter.strict or not self._done:
+            return self.formatter.parse(self.output_keys, self._buffer)
+        # the text after the object was already tolerated by feed
+        obj = self.formatter.codec.loads(self._buffer[self._object_start : self._object_end])
+        return _check_output_keys(self.output_keys, obj)
 
-        return resp
+
+def _check_output_keys(output_keys: List[Tuple[str, type]], resp: Value) -> Value:
+    for key, _ in output_keys:
+        if key not in resp:
+            raise ValueError(f"Expected output to have key {key}.")
+    return resp
+
+
+_JSON_CODE_BLOCK_OPENER = "```json"
 
 
 def with_code_block(language: str, s: str) -> str:
@@ -87,14 +241,85 @@ def with_code_block(language: str, s: str) -> str:
     return f"```{language}\n{s}```"
 
 
+def find_code_block(language: str, s: str, *, strict: bool = True) -> Tuple[int, int]:
+    """Find the body of the code block in the string, without copying it.
+
+    In strict mode, the string must start with the ```language opener and end with the ``` closer, ignoring
+    surrounding whitespace. Otherwise, the body is taken from the first ```language opener (or any ``` opener if
+    there is none) to the first ``` that starts or ends a line or follows a closing bracket, so text before and after
+    the code block is ignored. As a raw newline cannot appear in a JSON string, backticks inside JSON values are not
+    taken for the closer unless they follow a bracket. A string without opener, or that starts with a JSON object or
+    array, is returned whole.
+
+    Args:
+        language (str): The language of the code block.
+        s (str): The string to search.
+        strict (bool, optional): Whether the string must be exactly one code block. Defaults to True.
+
+    Returns:
+        Tuple[int, int]: The start and end offsets of the body, so that `s[start:end]` is the body.
+
+    Raises:
+        ValueError: If strict is True and the string is not a code block.
+    """
+    opener = f"```{language}"
+    start, end = 0, len(s)
+    while start < end and s[start].isspace():
+        start += 1
+    while end > start and s[end - 1].isspace():
+        end -= 1
+
+    if strict:
+        if not s.startswith(opener, start):
+            raise ValueError(f"Expected output to start with {opener}.")
+        if end - start < len(opener) + 3 or not s.endswith("```", 0, end):
+            raise ValueError("Expected output to end with ```.")
+        return start + len(opener), end - 3
+
+    if s.startswith(("{", "["), start):
+        return start, end
+
+    i = s.find(opener, start, end)
+    if i != -1:
+        body_start = i + len(opener)
+    else:
+        m = _CODE_BLOCK_OPENER.search(s, start, end)
+        if m is None:
+            return start, end
+        body_start = m.end()
+
+    i = s.find("```", body_start, end)
+    while i != -1 and not _is_code_block_closer(s, body_start, i, end):
+        i = s.find("```", i + 3, end)
+    return body_start, i if i != -1 else end
+
+
+def _is_code_block_closer(s: str, body_start: int, i: int, end: int) -> bool:
+    # the ``` ends a line
+    j = i + 3
+    while j < end and s[j] in " \t\r":
+        j += 1
+    if j == end or s[j] == "\n":
+        return True
+    # the ``` starts a line or follows a closing bracket
+    j = i - 1
+    while j >= body_start and s[j] in " \t\r":
+        j -= 1
+    return j >= body_start and s[j] in "}]\n"
+
+
+_CODE_BLOCK_OPENER = re.compile(r"```[\w+-]*")
+
+
 def remove_code_block(language: str, s: str) -> str:
-    """Remove the code block from the string.
+    """Remove the code block around the string, and any text outside of it.
 
     Args:
         language (str): The language of the code block.
         s (str): The string to remove the code block from.
 
     Returns:
-        str: The string without the code block.
+        str: The body of the code block.
     """
-    return s.replace(f"```{language}", "").replace("```", "").strip()
+    start, end = find_code_block(language, s, strict=False)
+    return s[start:end].strip()
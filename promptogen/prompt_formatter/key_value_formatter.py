@@ -1,10 +1,12 @@
 import json
 import re
-from ast import literal_eval
 from pprint import pformat
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 
-from promptogen.model.value_formatter import Value, ValueFormatter
+from promptogen.model.lru_cache import LRUCache
+from promptogen.model.token_counter import TokenCounter
+from promptogen.model.value_formatter import IncrementalValueParser, OutputFormatError, Value, ValueFormatter
+from promptogen.prompt_formatter.literal_parser import LiteralParser
 from promptogen.prompt_formatter.prompt_formatter import (
     PromptFormatter,
     PromptFormatterConfig,
@@ -26,11 +28,18 @@ class KeyValuePromptFormatter(PromptFormatter):
         self,
         *,
         config: PromptFormatterConfig = PromptFormatterConfig(),
+        prefix_cache_size: int = 128,
+        token_counter: Union[TokenCounter, Callable[[str], int], None] = None,
+        validate_output: bool = False,
+        literal_parser: Optional[LiteralParser] = None,
     ):
         super().__init__(
-            input_formatter=KeyValueFormatter(),
-            output_formatter=KeyValueFormatter(quote_for_single_line='"""'),
+            input_formatter=KeyValueFormatter(literal_parser=literal_parser),
+            output_formatter=KeyValueFormatter(quote_for_single_line='"""', literal_parser=literal_parser),
             config=config,
+            prefix_cache_size=prefix_cache_size,
+            token_counter=token_counter,
+            validate_output=validate_output,
         )
 
 
@@ -43,15 +52,25 @@ class KeyValueFormatter(ValueFormatter):
     # value_formatter: KeyValueValueFormatter
     quote_for_single_line: str = '"'
     use_json_dumps: bool = True
+    literal_parser: LiteralParser
 
-    def __init__(self, quote_for_single_line: str = '"', use_json_dumps: bool = True):
+    def __init__(
+        self,
+        quote_for_single_line: str = '"',
+        use_json_dumps: bool = True,
+        *,
+        literal_parser: Optional[LiteralParser] = None,
+    ):
         """Initialize a KeyValueFormatter.
 
         Args:
             quote_for_single_line: The quote to use for a single line string.
+            literal_parser: The parser of the values of non-string keys, which bounds their size and depth.
+                Defaults to LiteralParser().
         """
         self.quote_for_single_line = quote_for_single_line
         self.use_json_dumps = use_json_dumps
+        self.literal_parser = literal_parser if literal_parser is not None else LiteralParser()
 
     def description(self) -> str:
         return ""
@@ -97,31 +116,161 @@ class KeyValueFormatter(ValueFormatter):
         if len(output_keys) == 0:
             raise ValueError("Expected output_keys to have at least one key.")
 
-        result = {}
+        return compile_key_value_parser(output_keys, self.literal_parser).parse(output)
 
-        for idx, (key, key_type) in enumerate(output_keys):
-            next_key = output_keys[idx + 1][0] if idx + 1 < len(output_keys) else None
-            if next_key:
-                pattern = re.compile(f"{key}:.*?(?={next_key}:)", re.MULTILINE | re.DOTALL)
-            else:
-                pattern = re.compile(f"{key}:.*", re.MULTILINE | re.DOTALL)
-            value = re.search(pattern, output)
-            if value is None:
+    def incremental_parser(self, output_keys: List[Tuple[str, type]]) -> IncrementalValueParser:
+        """Return a parser that emits each key as soon as the next key appears in the output.
+
+        Args:
+            output_keys: The keys to parse from the output.
+        """
+        return IncrementalKeyValueParser(compile_key_value_parser(output_keys, self.literal_parser))
+
+
+class KeyValueParser:
+    """A parser for key-value formatted output, compiled once per output-key signature.
+
+    The output is scanned in a single pass: each key is searched for right after the previous one, and the text
+    between two consecutive keys is taken as the value of the former.
+
+    Args:
+        output_keys: The keys to parse from the output, in the order they appear.
+        literal_parser: The parser of the values of non-string keys. Defaults to LiteralParser().
+    """
+
+    def __init__(self, output_keys: Sequence[Tuple[str, type]], literal_parser: Optional[LiteralParser] = None):
+        if len(output_keys) == 0:
+            raise ValueError("Expected output_keys to have at least one key.")
+
+        self.keys = [key for key, _ in output_keys]
+        self.markers = [f"{key}:" for key in self.keys]
+        self.is_str = [key_type == str for _, key_type in output_keys]
+        self.literal_parser = literal_parser if literal_parser is not None else LiteralParser()
+
+    def split(self, output: str) -> List[str]:
+        """Split the output into the raw (unparsed) section of each key.
+
+        Args:
+            output: The output to split.
+
+        Returns:
+            The stripped section of each key, in the order of the keys.
+
+        Raises:
+            ValueError: If a key is not found in the output.
+        """
+        starts = []
+        ends = []
+        pos = 0
+        for key, marker in zip(self.keys, self.markers):
+            idx = output.find(marker, pos)
+            if idx == -1:
                 raise ValueError(f"Expected output to have key {key}.")
+            starts.append(idx + len(marker))
+            ends.append(idx)
+            pos = idx + len(marker)
 
-            m: re.Match[str] = value
-            s = m.group().replace(f"{key}:", "").strip()
+        ends = ends[1:] + [len(output)]
+        return [output[start:end].strip() for start, end in zip(starts, ends)]
+
+    def parse(self, output: str) -> Value:
+        """Parse the given output.
+
+        Args:
+            output: The output to parse.
+
+        Returns:
+            The parsed output as a dict.
+        """
+        return {key: self.parse_section(i, s) for i, (key, s) in enumerate(zip(self.keys, self.split(output)))}
+
+    def parse_section(self, index: int, s: str) -> Any:
+        """Parse the raw section of the key at the given index.
+
+        Args:
+            index: The index of the key in output_keys.
+            s: The stripped section of the key.
+
+        Returns:
+            The parsed value of the key.
+
+        Raises:
+            SyntaxError: If the value of a string key is not a string.
+            LiteralParseError: If the value of another key is not a literal, or exceeds the limits of the parser.
+        """
+        if self.is_str[index]:
+            extracted_str, found = extract_string(s)
+            if found:
+                return extracted_str
+            raise SyntaxError(f"invalid syntax for key {self.keys[index]}: {s}")
+        return self.literal_parser.parse(s)
+
+
+class IncrementalKeyValueParser(IncrementalValueParser):
+    """Parse key-value formatted output chunk by chunk.
+
+    A key is complete as soon as the next key appears in the output; the last key is complete only when the output
+    is closed. If the value of a completed key cannot be parsed, OutputFormatError is raised right away.
+    """
+
+    def __init__(self, parser: KeyValueParser):
+        self.parser = parser
+        self._buffer = ""
+        self._starts: List[int] = []
+        self._scan_from = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        while len(self._starts) < len(self.parser.keys):
+            i = len(self._starts)
+            marker = self.parser.markers[i]
+            idx = self._buffer.find(marker, self._scan_from)
+            if idx == -1:
+                # the marker may be split across chunks, so rescan its possible beginning next time
+                self._scan_from = max(self._scan_from, len(self._buffer) - len(marker) + 1)
+                break
+            if i > 0:
+                section = self._buffer[self._starts[i - 1] : idx].strip()
+                try:
+                    value = self.parser.parse_section(i - 1, section)
+                except (ValueError, SyntaxError) as e:
+                    raise OutputFormatError(f"Invalid value for key {self.parser.keys[i - 1]}: {e}") from e
+                completed.append((self.parser.keys[i - 1], value))
+            self._starts.append(idx + len(marker))
+            self._scan_from = idx + len(marker)
+        return completed
+
+    def close(self) -> Value:
+        return self.parser.parse(self._buffer)
+
+
+_parser_cache: LRUCache[KeyValueParser] = LRUCache(maxsize=256)
+
+
+def compile_key_value_parser(
+    output_keys: Sequence[Tuple[str, type]], literal_parser: Optional[LiteralParser] = None
+) -> KeyValueParser:
+    """Return the parser for the given output keys, reusing a previously compiled one if available.
+
+    Args:
+        output_keys: The keys to parse from the output.
+        literal_parser: The parser of the values of non-string keys. Defaults to LiteralParser().
+
+    Returns:
+        The compiled parser.
+    """
+    if literal_parser is None:
+        literal_parser = LiteralParser()
+    signature = (tuple(output_keys), literal_parser)
+    parser = _parser_cache.get(signature)
+    if parser is None:
+        parser = KeyValueParser(signature[0], literal_parser)
+        _parser_cache.put(signature, parser)
+    return parser
 
-            if key_type == str:
-                extracted_str, found = extract_string(s)
-                if found:
-                    result[key] = extracted_str
-                else:
-                    raise SyntaxError(f"invalid syntax for key {key}: {s}")
-            else:
-                result[key] = literal_eval(s)
 
-        return result
+_QUOTE_PATTERNS = [(quote, re.compile(f"{quote}(.*?){quote}", re.DOTALL)) for quote in ("'''", '"""', "'", '"')]
 
 
 def extract_string(s: str) -> Tuple[str, bool]:
@@ -129,17 +278,10 @@ def extract_string(s: str) -> Tuple[str, bool]:
     If the given string starts with a quote, extract the string enclosed by the quote.
     Otherwise, return the original string.
     """
-    quotes_flags = [
-        ("'''", re.DOTALL),
-        ('"""', re.DOTALL),
-        ("'", re.DOTALL),
-        ('"', re.DOTALL),
-    ]
-
-    for quote, flag in quotes_flags:
+    for quote, pattern in _QUOTE_PATTERNS:
         if not s.startswith(quote):
             continue
-        match = re.search(f"{quote}(.*?){quote}", s, flag)
+        match = pattern.search(s)
         if match:
             return match.group(1), True
         else:
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import re
+from ast import literal_eval
+from itertools import accumulate
+from typing import Any, Match, Optional
+
+from promptogen.model.value_formatter import OutputFormatError
+
+
+class LiteralParseError(OutputFormatError):
+    """The text is not a JSON or Python literal, or exceeds the size or depth limits of the parser."""
+
+
+class LiteralParser:
+    """Parse a JSON or Python literal with bounded size and nesting depth.
+
+    The text is decoded as JSON first, which covers what KeyValueFormatter writes (including `true`, `false` and
+    `null` with `use_json_dumps`) and is much faster than `ast.literal_eval`. The non-finite JSON constants `NaN`,
+    `Infinity` and `-Infinity` are rejected, as they are not Python literals either. Python literals that only differ from JSON in their quotes, constants and trailing commas
+    (e.g. `['a', True, None,]`) are translated to JSON and decoded the same way. Other Python literals (tuples,
+    sets, non-string keys, ...) fall back to `ast.literal_eval`.
+
+    The size and depth limits are checked before parsing, so that an adversarial output fails fast instead of
+    exhausting time or the recursion limit.
+
+    Args:
+        max_size: The maximum length of the text, in characters. Defaults to 10,000,000.
+        max_depth: The maximum nesting depth of lists, dicts, tuples and sets. Defaults to 100.
+    """
+
+    max_size: int
+    max_depth: int
+
+    def __init__(self, max_size: int = 10_000_000, max_depth: int = 100):
+        if max_size < 1:
+            raise ValueError(f"max_size must be >= 1, got {max_size}")
+        if max_depth < 1:
+            raise ValueError(f"max_depth must be >= 1, got {max_depth}")
+        self.max_size = max_size
+        self.max_depth = max_depth
+
+    def parse(self, s: str) -> Any:
+        """Parse the text.
+
+        Args:
+            s: The text to parse.
+
+        Returns:
+            The parsed value.
+
+        Raises:
+            LiteralParseError: If the text is not a literal, or exceeds the limits.
+        """
+        s = s.strip()
+        if len(s) > self.max_size:
+            raise LiteralParseError(f"The literal has {len(s)} characters, more than the maximum of {self.max_size}.")
+        self._check_depth(s)
+
+        try:
+            try:
+                return json.loads(s, parse_constant=_reject_constant)
+            except ValueError:
+                pass
+            translated = _python_to_json(s)
+            if translated is not None:
+                try:
+                    return json.loads(translated, parse_constant=_reject_constant)
+                except ValueError:
+                    pass
+            return literal_eval(s)
+        except (ValueError, SyntaxError, TypeError, RecursionError) as e:
+            raise LiteralParseError(f"Invalid literal: {_truncate(s)}") from e
+
+    def _check_depth(self, s: str) -> None:
+        # counting the brackets is enough for most values; measure the depth only if they could be nested too deeply
+        if s.count("[") + s.count("{") + s.count("(") <= self.max_depth:
+            return
+        brackets = _NOT_BRACKET.sub("", _STRING.sub("", s))
+        if max(accumulate(map(_BRACKET_DELTA.__getitem__, brackets)), default=0) > self.max_depth:
+            raise LiteralParseError(f"The literal is nested more than {self.max_depth} levels deep.")
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, LiteralParser) and self.max_size == other.max_size and self.max_depth == other.max_depth
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.max_size, self.max_depth))
+
+    def __repr__(self) -> str:
+        return f"LiteralParser(max_size={self.max_size}, max_depth={self.max_depth})"
+
+
+_default_literal_parser = LiteralParser()
+
+
+def parse_literal(s: str) -> Any:
+    """Parse a JSON or Python literal with the default LiteralParser.
+
+    Raises:
+        LiteralParseError: If the text is not a literal, or exceeds the limits.
+    """
+    return _default_literal_parser.parse(s)
+
+
+# strings are removed before the brackets are counted, as they may contain brackets
+_STRING = re.compile(r"\"[^\"\\]*(?:\\.[^\"\\]*)*\"|'[^'\\]*(?:\\.[^'\\]*)*'", re.DOTALL)
+_NOT_BRACKET = re.compile(r"[^\[\]{}()]+")
+_BRACKET_DELTA = {"[": 1, "{": 1, "(": 1, "]": -1, "}": -1, ")": -1}
+
+# the tokens of Python literals that have a JSON equivalent; anything else is copied as is
+_PYTHON_TOKEN = re.compile(
+    r"(?P<dq>\"[^\"\\\n]*(?:\\.[^\"\\\n]*)*\")"
+    r"|(?P<sq>'[^'\\\n]*(?:\\.[^'\\\n]*)*')"
+    r"|(?P<const>\b(?:True|False|None)\b)"
+    r"|(?P<comma>,\s*(?=[\]}]))"
+    r"|(?P<unsupported>[()]|'''|\"\"\")"
+)
+_JSON_CONSTANTS = {"True": "true", "False": "false", "None": "null"}
+_SINGLE_QUOTED_ESCAPE = re.compile(r"\\.|\"")
+
+
+def _python_to_json(s: str) -> Optional[str]:
+    """Translate a Python literal to JSON, or return None if it uses syntax that JSON does not have."""
+    unsupported = False
+
+    def replace(m: Match[str]) -> str:
+        nonlocal unsupported
+        kind = m.lastgroup
+        token = m.group()
+        if kind == "dq":
+            return token
+        if kind == "sq":
+            content = token[1:-1]
+            if "\\" in content or '"' in content:
+                content = _SINGLE_QUOTED_ESCAPE.sub(_escape_for_double_quotes, content)
+            return f'"{content}"'
+        if kind == "const":
+            return _JSON_CONSTANTS[token]
+        if kind == "comma":
+            return token[1:]
+        unsupported = True
+        return token
+
+    translated = _PYTHON_TOKEN.sub(replace, s)
+    return None if unsupported else translated
+
+
+def _escape_for_double_quotes(m: Match[str]) -> str:
+    token = m.group()
+    if token == '"':
+        return '\\"'
+    if token == "\\'":
+        return "'"
+    return token
+
+
+def _reject_constant(token: str) -> Any:
+    raise ValueError(f"Unsupported constant: {token}")
+
+
+def _truncate(s: str, n: int = 50) -> str:
+    return repr(s) if len(s) <= n else repr(s[:n]) + "..."
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import re
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 from pydantic import BaseModel
 
 from promptogen.model.dataclass import DataClass
+from promptogen.model.lru_cache import CacheInfo, LRUCache
+from promptogen.model.output_schema import OutputSchema, compile_output_schema
 from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
-from promptogen.model.value_formatter import Value, ValueFormatter
+from promptogen.model.token_counter import (
+    FunctionBasedTokenCounter,
+    HeuristicTokenCounter,
+    PromptTokenCounts,
+    TokenCounter,
+)
+from promptogen.model.value_formatter import IncrementalValueParser, OutputFormatError, Value, ValueFormatter
 
 
 class PromptFormatterInterface(ABC):
@@ -33,11 +42,15 @@ class PromptFormatterConfig(DataClass):
         show_formatter_description (bool): Whether to show the description of the formatter.
         show_parameter_info (bool): Whether to show the parameter info of the prompt.
         show_template (bool): Whether to show the template of the prompt.
+        example_token_budget (int, optional): The maximum number of tokens of the examples to show, counting their
+            "Example i:" headings and separators. Examples are taken in the order of `prompt.examples`, and an example
+            that does not fit in the remaining budget is skipped. Defaults to None, which shows every example.
     """
 
     show_formatter_description: bool = True
     show_parameter_info: bool = True
     show_template: bool = True
+    example_token_budget: Optional[int] = None
 
 
 class PromptFormatter(PromptFormatterInterface):
@@ -47,6 +60,15 @@ class PromptFormatter(PromptFormatterInterface):
         input_formatter (ValueFormatter): Formatter for input.
         output_formatter (ValueFormatter): Formatter for output.
         config (PromptFormatterConfig, optional): Configuration for formatting. Defaults to PromptFormatterConfig().
+        prefix_cache_size (int, optional): Maximum number of rendered prompt prefixes to cache, keyed on the
+            fingerprint of the prompt. Set it to 0 to disable the cache. Defaults to 128.
+        token_counter (TokenCounter | Callable[[str], int], optional): Counter of the tokens of a text, used to fit
+            the examples in `config.example_token_budget` and by `count_prompt_tokens`. A function is wrapped in a
+            FunctionBasedTokenCounter. Defaults to HeuristicTokenCounter().
+        example_token_cache_size (int, optional): Maximum number of example token counts to cache. Defaults to 1024.
+        validate_output (bool, optional): Whether to check parsed outputs against the types of the template of the
+            prompt, converting values where possible (see OutputSchema). Defaults to False, which returns the values
+            as the output formatter parsed them.
 
     Raises:
         TypeError: If input_formatter or output_formatter is not an instance of ValueFormatter.
@@ -55,6 +77,11 @@ class PromptFormatter(PromptFormatterInterface):
     input_formatter: ValueFormatter
     output_formatter: ValueFormatter
     config: PromptFormatterConfig
+    prefix_cache: LRUCache[str]
+    token_counter: TokenCounter
+    example_token_cache: LRUCache[int]
+    prefix_token_cache: LRUCache[PromptTokenCounts]
+    validate_output: bool
 
     def __init__(
         self,
@@ -62,6 +89,10 @@ class PromptFormatter(PromptFormatterInterface):
         input_formatter: ValueFormatter,
         output_formatter: ValueFormatter,
         config: PromptFormatterConfig = PromptFormatterConfig(),
+        prefix_cache_size: int = 128,
+        token_counter: Union[TokenCounter, Callable[[str], int], None] = None,
+        example_token_cache_size: int = 1024,
+        validate_output: bool = False,
     ):
         if not isinstance(input_formatter, ValueFormatter):
             raise TypeError(
@@ -75,13 +106,24 @@ class PromptFormatter(PromptFormatterInterface):
         self.input_formatter = input_formatter
         self.output_formatter = output_formatter
         self.config = config
-
-    def format_prompt(self, prompt: Prompt, input_value: Value) -> str:
+        self.prefix_cache = LRUCache(maxsize=prefix_cache_size)
+        if token_counter is None:
+            token_counter = HeuristicTokenCounter()
+        elif not isinstance(token_counter, TokenCounter):
+            token_counter = FunctionBasedTokenCounter(token_counter)
+        self.token_counter = token_counter
+        self.example_token_cache = LRUCache(maxsize=example_token_cache_size)
+        self.prefix_token_cache = LRUCache(maxsize=prefix_cache_size)
+        self.validate_output = validate_output
+
+    def format_prompt(self, prompt: Prompt, input_value: Value, *, prefix: Optional[str] = None) -> str:
         """Format a prompt with the given input value.
 
         Args:
             prompt (Prompt): Prompt to format.
             input_value (Value): Input value to format.
+            prefix (str, optional): The prompt rendered without input by `format_prompt_prefix`. Pass it to reuse one
+                rendering for many inputs. Defaults to None, which looks the prefix up in the prefix cache.
 
         Returns:
             str: Formatted prompt.
@@ -90,10 +132,69 @@ class PromptFormatter(PromptFormatterInterface):
             TypeError: If input_value is not an instance of dict.
             TypeError: If prompt is not an instance of Prompt.
         """
-        if not isinstance(input_value, dict):
-            raise TypeError(f"Expected input_value to be an instance of dict, got {type(input_value).__name__}.")
         if not isinstance(prompt, Prompt):
             raise TypeError(f"Expected prompt to be an instance of Prompt, got {type(prompt).__name__}.")
+        input_value = self._ordered_input_value(prompt, input_value)
+
+        if prefix is None:
+            prefix = self.format_prompt_prefix(prompt)
+
+        return prefix + self._format_input_section(input_value)
+
+    def _format_input_section(self, input_value: Value) -> str:
+        return f"""
+--------
+
+Input:
+{self.input_formatter.format(input_value)}
+Output:"""
+
+    def format_packed_prompt(
+        self, prompt: Prompt, input_values: Sequence[Value], *, prefix: Optional[str] = None
+    ) -> str:
+        """Format a prompt with several input values, asking for one numbered output per input.
+
+        The prompt prefix is rendered once for all inputs. Parse the output with `parse_packed`.
+
+        Args:
+            prompt (Prompt): Prompt to format.
+            input_values (Sequence[Value]): Input values to format.
+            prefix (str, optional): The prompt rendered without input by `format_prompt_prefix`. Defaults to None,
+                which looks the prefix up in the prefix cache.
+
+        Returns:
+            str: Formatted prompt.
+
+        Raises:
+            TypeError: If an input value is not an instance of dict.
+            TypeError: If prompt is not an instance of Prompt.
+        """
+        if not isinstance(prompt, Prompt):
+            raise TypeError(f"Expected prompt to be an instance of Prompt, got {type(prompt).__name__}.")
+        if len(input_values) == 0:
+            raise ValueError("Expected input_values to have at least one input value.")
+        formatted_inputs = [
+            f"Input {i + 1}:\n{self.input_formatter.format(self._ordered_input_value(prompt, input_value))}"
+            for i, input_value in enumerate(input_values)
+        ]
+
+        if prefix is None:
+            prefix = self.format_prompt_prefix(prompt)
+
+        n = len(input_values)
+        inputs = "\n\n".join(formatted_inputs)
+        return f"""{prefix}
+--------
+
+There are {n} inputs below. Answer each of them independently, and write the output of input i after "Output i:", from Output 1 to Output {n}.
+
+{inputs}
+
+Output 1:"""
+
+    def _ordered_input_value(self, prompt: Prompt, input_value: Value) -> Value:
+        if not isinstance(input_value, dict):
+            raise TypeError(f"Expected input_value to be an instance of dict, got {type(input_value).__name__}.")
 
         input_parameter_keys = {p.name for p in prompt.input_parameters}
         if input_parameter_keys != input_value.keys():
@@ -101,13 +202,49 @@ class PromptFormatter(PromptFormatterInterface):
                 f"Expected input_value to have the same keys as prompt.input_parameters, got {input_value.keys()}; wanted {input_parameter_keys}."
             )
 
-        input_value = {p.name: input_value[p.name] for p in prompt.input_parameters}
-        return f"""{self.format_prompt_without_input(prompt)}
---------
+        return {p.name: input_value[p.name] for p in prompt.input_parameters}
 
-Input:
-{self.input_formatter.format(input_value)}
-Output:"""
+    def format_prompt_prefix(self, prompt: Prompt) -> str:
+        """Format a prompt without input, reusing the cached result if a prompt with the same content was formatted
+        before.
+
+        The cache is keyed on the fingerprint of the prompt and the formatter config, so it is safe to pass different
+        prompts to the same formatter, or to change a prompt in place. The fingerprint of a Prompt is computed on every
+        call, which costs a fraction of formatting it; the one of a FrozenPrompt is memoized, so a cache hit costs the
+        same whatever the size of the prompt.
+
+        Args:
+            prompt (Prompt): Prompt to format.
+
+        Returns:
+            str: Formatted prompt.
+        """
+        key = self._prompt_cache_key(prompt)
+        if key is None:
+            return self.format_prompt_without_input(prompt)
+        prefix = self.prefix_cache.get(key)
+        if prefix is None:
+            prefix = self.format_prompt_without_input(prompt)
+            self.prefix_cache.put(key, prefix)
+        return prefix
+
+    def prefix_cache_info(self) -> CacheInfo:
+        """Return the hit/miss statistics of the prompt prefix cache."""
+        return self.prefix_cache.cache_info()
+
+    def _prompt_cache_key(self, prompt: Prompt) -> Optional[Tuple[str, Tuple[Optional[Union[bool, int]], ...]]]:
+        if self.prefix_cache.maxsize == 0:
+            return None
+        # the fingerprint of a mutable prompt is a hash of its dump, which is cheaper than formatting it
+        return (prompt.fingerprint(), self._config_key())
+
+    def _config_key(self) -> Tuple[Optional[Union[bool, int]], ...]:
+        return (
+            self.config.show_formatter_description,
+            self.config.show_parameter_info,
+            self.config.show_template,
+            self.config.example_token_budget,
+        )
 
     def format_prompt_without_input(self, prompt: Prompt) -> str:
         """Format a prompt without input.
@@ -121,6 +258,10 @@ Output:"""
         Raises:
             TypeError: If prompt is not an instance of Prompt.
         """
+        description, template, examples = self._format_sections(prompt)
+        return _join_sections([description, template, self._format_examples(examples)])
+
+    def _format_sections(self, prompt: Prompt) -> Tuple[str, str, List[IOExample]]:
         # use config to determine what to show
 
         ss = [prompt.description]
@@ -131,15 +272,103 @@ Output:"""
             ss.append(f"""Input Parameters:\n{self._format_parameter_infos(prompt.input_parameters)}""")
             ss.append(f"""Output Parameters:\n{self._format_parameter_infos(prompt.output_parameters)}""")
 
+        template = ""
         if self.config.show_template:
-            ss.append(f"Template:\n{self._format_example(prompt.template)}")
+            template = f"Template:\n{self._format_example(prompt.template)}"
 
-        ss.append(self._format_examples(prompt.examples))
+        return _join_sections(ss), template, self.select_examples(prompt.examples)
 
-        return "\n\n".join(s for s in ss if s)
+    def count_prompt_tokens(
+        self, prompt: Prompt, input_value: Optional[Value] = None, *, prefix: Optional[str] = None
+    ) -> PromptTokenCounts:
+        """Count the tokens of each section of the prompt formatted with the given input value.
+
+        The counts of the prompt without input are cached like its rendering, and the count of each example is
+        cached by the fingerprint of the example, so only the input is counted on every call.
+
+        Args:
+            prompt (Prompt): Prompt to count.
+            input_value (Value, optional): Input value to count. Defaults to None, which counts the prompt formatted
+                by `format_prompt_without_input`.
+            prefix (str, optional): The prompt rendered without input by `format_prompt_prefix`. Defaults to None,
+                which looks the prefix up in the prefix cache.
+
+        Returns:
+            PromptTokenCounts: The number of tokens of each section and of the whole prompt.
+        """
+        key = self._prompt_cache_key(prompt)
+        counts = self.prefix_token_cache.get(key) if key is not None else None
+        if counts is None:
+            description, template, examples = self._format_sections(prompt)
+            counts = PromptTokenCounts(
+                description=self.token_counter.count(description),
+                template=self.token_counter.count(template) if template else 0,
+                examples=[self.example_token_count(example) for example in examples],
+                input=0,
+                total=self.token_counter.count(prefix if prefix is not None else self.format_prompt_prefix(prompt)),
+            )
+            if key is not None:
+                self.prefix_token_cache.put(key, counts)
+
+        if input_value is None:
+            return counts
+        input_tokens = self.token_counter.count(
+            self._format_input_section(self._ordered_input_value(prompt, input_value))
+        )
+        return counts.replace(input=input_tokens, total=counts.total + input_tokens)
+
+    def select_examples(self, examples: List[IOExample]) -> List[IOExample]:
+        """Select the examples that fit in `config.example_token_budget`, in priority order.
+
+        Examples are taken in the given order, so put the most useful ones first. An example that does not fit in
+        the remaining budget is skipped, and the following, smaller ones may still be selected. Each example costs
+        its cached token count plus the tokens of its heading and separators; as token counts are not always
+        additive, the rendered examples are counted once at the end, and the last ones are dropped until they fit.
+
+        Args:
+            examples (List[IOExample]): Examples to select from.
+
+        Returns:
+            List[IOExample]: The selected examples, in the given order.
+        """
+        budget = self.config.example_token_budget
+        if budget is None:
+            return examples
+
+        selected: List[IOExample] = []
+        used = 0
+        for example in examples:
+            tokens = self.example_token_count(example) + self.token_counter.count(
+                _format_numbered_example(len(selected) + 1, "") + "\n"
+            )
+            if used + tokens <= budget:
+                selected.append(example)
+                used += tokens
+        while selected and self.token_counter.count(self._format_examples(selected)) > budget:
+            selected.pop()
+        return selected
+
+    def example_token_count(self, example: IOExample) -> int:
+        """Return the number of tokens of the rendered example, computing it on first use.
+
+        Counts are cached by the fingerprint of the example, so an example shared by several prompts, or by versions
+        of a prompt, is rendered and counted only once.
+
+        Args:
+            example (IOExample): Example to count.
+
+        Returns:
+            int: The number of tokens of the example, without its "Example i:" heading.
+        """
+        key = example.fingerprint()
+        tokens = self.example_token_cache.get(key)
+        if tokens is None:
+            tokens = self.token_counter.count(self._format_example(example))
+            self.example_token_cache.put(key, tokens)
+        return tokens
 
     def _format_examples(self, examples: List[IOExample]) -> str:
-        return "\n".join(f"Example {i+1}:\n{self._format_example(e)}\n" for i, e in enumerate(examples))
+        return "\n".join(_format_numbered_example(i + 1, self._format_example(e)) for i, e in enumerate(examples))
 
     def _format_example(self, example: IOExample) -> str:
         formatted_input = self.input_formatter.format(example.input)
@@ -158,9 +387,105 @@ Output:"""
 
         Returns:
             Value: Parsed output.
+
+        Raises:
+            ValueError: If the output cannot be parsed.
+            OutputSchemaError: If validate_output is True and the output does not match the types of the template.
         """
-        output_keys = [(param.name, type(prompt.template.output[param.name])) for param in prompt.output_parameters]
-        return self.output_formatter.parse(output_keys, s)
+        if not self.validate_output:
+            return self.output_formatter.parse(_output_keys(prompt), s)
+        schema = self.output_schema(prompt)
+        return schema.validate(self.output_formatter.parse(schema.keys, s))
+
+    def output_schema(self, prompt: Prompt) -> OutputSchema:
+        """Return the compiled output schema of the prompt, cached by the fingerprint of the prompt if it is frozen.
+
+        Args:
+            prompt (Prompt): Prompt whose template defines the schema.
+
+        Returns:
+            OutputSchema: The output schema.
+        """
+        return compile_output_schema(prompt)
+
+    def parse_packed(self, prompt: Prompt, s: str, n: int) -> List[Union[Value, Exception]]:
+        """Parse the output of a prompt formatted by `format_packed_prompt`.
+
+        Args:
+            prompt (Prompt): Prompt to parse.
+            s (str): Output of the prompt, which may or may not repeat the leading "Output 1:".
+            n (int): The number of inputs of the prompt.
+
+        Returns:
+            List[Union[Value, Exception]]: The parsed output of each input, in order. The output of an input that is
+                missing or cannot be parsed is replaced by the exception explaining why.
+        """
+        if not _PACKED_OUTPUT_MARKER.match(s.lstrip()):
+            s = "Output 1:\n" + s
+
+        sections: Dict[int, str] = {}
+        matches = list(_PACKED_OUTPUT_MARKER.finditer(s))
+        for i, match in enumerate(matches):
+            index = int(match.group(1))
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(s)
+            if 1 <= index <= n and index not in sections:
+                sections[index] = s[match.end() : end].strip()
+
+        results: List[Union[Value, Exception]] = []
+        for index in range(1, n + 1):
+            section = sections.get(index)
+            if section is None:
+                results.append(OutputFormatError(f"Expected the output to have Output {index}."))
+                continue
+            try:
+                results.append(self.parse(prompt, section))
+            except (ValueError, SyntaxError) as e:
+                results.append(e)
+        return results
+
+    def incremental_parser(self, prompt: Prompt) -> IncrementalValueParser:
+        """Return a parser that consumes the output of the prompt chunk by chunk.
+
+        Args:
+            prompt (Prompt): Prompt to parse.
+
+        Returns:
+            IncrementalValueParser: Parser of the output formatter. If validate_output is True, each value is
+                validated as soon as it is complete.
+        """
+        if not self.validate_output:
+            return self.output_formatter.incremental_parser(_output_keys(prompt))
+        schema = self.output_schema(prompt)
+        return _ValidatingParser(self.output_formatter.incremental_parser(schema.keys), schema)
+
+
+def _output_keys(prompt: Prompt) -> List[Tuple[str, type]]:
+    return [(p.name, type(prompt.template.output[p.name])) for p in prompt.output_parameters]
+
+
+class _ValidatingParser(IncrementalValueParser):
+    """Validate the values completed by an incremental parser against an output schema."""
+
+    def __init__(self, parser: IncrementalValueParser, schema: OutputSchema):
+        self.parser = parser
+        self.schema = schema
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        return [(key, self.schema.validate_key(key, value)) for key, value in self.parser.feed(chunk)]
+
+    def close(self) -> Value:
+        return self.schema.validate(self.parser.close())
+
+
+def _format_numbered_example(i: int, formatted_example: str) -> str:
+    return f"Example {i}:\n{formatted_example}\n"
+
+
+def _join_sections(sections: List[str]) -> str:
+    return "\n\n".join(s for s in sections if s)
+
+
+_PACKED_OUTPUT_MARKER = re.compile(r"^[ \t]*Output (\d+):", re.MULTILINE)
 
 
 def convert_dataclass_to_dict(value: Value) -> Value:
@@ -1,3 +1,5 @@
+import copy
+
 from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
 from promptogen.model.prompt_transformer import PromptTransformer
 from promptogen.model.reasoning_extractor import ReasoningExtractor
@@ -22,22 +24,25 @@ class PromptWithReasoningTransformer(PromptTransformer):
         Args:
             prompt (Prompt): The prompt to transform.
         """
+        # the new prompt is built from copies of the nested values of the given prompt, so that changing one of
+        # them in place does not change the other; each value is copied once, unlike with `update`
         new_examples = []
         for example in prompt.examples:
             reasoning = self.reasoning_extractor.generate_reasoning(prompt, example)
-            reasoned_output = {"reasoning": reasoning.reasoning, **example.output}
-            new_examples.append(example.update(output=reasoned_output))
+            reasoned_output = {"reasoning": reasoning.reasoning, **copy.deepcopy(example.output)}
+            new_examples.append(IOExample.model_construct(input=copy.deepcopy(example.input), output=reasoned_output))
 
-        return prompt.update(
+        return prompt.replace(
+            input_parameters=[parameter.model_copy() for parameter in prompt.input_parameters],
             output_parameters=[
                 ParameterInfo(name="reasoning", description="Reasoning for the output"),
-                *prompt.output_parameters,
+                *(parameter.model_copy() for parameter in prompt.output_parameters),
             ],
-            template=IOExample(
-                input=prompt.template.input,
+            template=IOExample.model_construct(
+                input=copy.deepcopy(prompt.template.input),
                 output={
                     "reasoning": self.reasoning_extractor.get_reasoning_template(),
-                    **prompt.template.output,
+                    **copy.deepcopy(prompt.template.output),
                 },
             ),
             examples=new_examples,
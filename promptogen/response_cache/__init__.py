@@ -0,0 +1,7 @@
+from .memory_cache import InMemoryResponseCache
+from .sqlite_cache import SQLiteResponseCache
+
+__all__ = [
+    "InMemoryResponseCache",
+    "SQLiteResponseCache",
+]
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from promptogen.model.lru_cache import CacheInfo
+from promptogen.model.response_cache import CachedResponse, ResponseCache
+
+
+class InMemoryResponseCache(ResponseCache):
+    """An in-process response cache with least-recently-used eviction.
+
+    Args:
+        maxsize: The maximum number of responses to keep. Defaults to 1024.
+        ttl: The number of seconds a response stays valid. Defaults to None (no expiry).
+    """
+
+    maxsize: int
+    ttl: Optional[float]
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be > 0, got {ttl}.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, Tuple[float, CachedResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (self.ttl is not None and item[0] + self.ttl <= time.monotonic()):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            # return a copy so that callers cannot modify the cached value
+            return item[1].copy_me()
+
+    def set(self, key: str, response: CachedResponse) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), response.copy_me())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=len(self._data))
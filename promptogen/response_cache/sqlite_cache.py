@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from promptogen.model.lru_cache import CacheInfo
+from promptogen.model.response_cache import CachedResponse, ResponseCache
+
+
+class SQLiteResponseCache(ResponseCache):
+    """A response cache persisted in a SQLite database, so it survives process restarts.
+
+    When the cache is full, the least recently accessed responses are evicted. The database file can be shared by
+    several processes: the size limit is enforced on the rows of the database, not on a count kept by the process.
+    Parsed values are stored as JSON, and only if they read back unchanged (e.g. without tuples or non-string keys);
+    other values are parsed again from the raw response on a hit.
+
+    Args:
+        path: The path of the database file. Use ":memory:" for a non-persistent database.
+        maxsize: The maximum number of responses to keep. Defaults to 100000.
+        ttl: The number of seconds a response stays valid. Defaults to None (no expiry).
+    """
+
+    path: str
+    maxsize: int
+    ttl: Optional[float]
+
+    def __init__(self, path: str, maxsize: int = 100000, ttl: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be > 0, got {ttl}.")
+        self.path = path
+        self.persistent = path != ":memory:"
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, raw_response TEXT NOT NULL, value TEXT, created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT raw_response, value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            raw_response, value, created_at = row
+            if self.ttl is not None and created_at + self.ttl <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        return CachedResponse(raw_response=raw_response, value=None if value is None else json.loads(value))
+
+    def set(self, key: str, response: CachedResponse) -> None:
+        value = None
+        if response.value is not None:
+            try:
+                value = json.dumps(response.value, ensure_ascii=False)
+            except (TypeError, ValueError):
+                # the parsed value is not JSON-serializable; only the raw response is cached
+                value = None
+            if value is not None and json.loads(value) != response.value:
+                # e.g. a tuple would come back as a list; only the raw response is cached
+                value = None
+
+        now = time.time()
+        with self._lock, self._conn:
+            # the insert starts the write transaction, so the count below includes the rows of other processes
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, raw_response, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response.raw_response, value, now, now),
+            )
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if size > self.maxsize:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (size - self.maxsize,),
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return CacheInfo(hits=self.hits, misses=self.misses, maxsize=self.maxsize, currsize=size)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,22 @@
+from .rate_limited_llm import RateLimitedTextLLM
+from .rate_limiter import (
+    ConcurrencyLimiter,
+    RateLimiter,
+    RateLimiterStats,
+    TokenBucket,
+    estimate_tokens,
+    shared_rate_limiter,
+)
+from .single_flight import SingleFlightStats, SingleFlightTextLLM
+
+__all__ = [
+    "RateLimitedTextLLM",
+    "RateLimiter",
+    "RateLimiterStats",
+    "TokenBucket",
+    "ConcurrencyLimiter",
+    "estimate_tokens",
+    "shared_rate_limiter",
+    "SingleFlightTextLLM",
+    "SingleFlightStats",
+]
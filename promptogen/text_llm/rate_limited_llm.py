@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Iterator, Union
+
+from promptogen.model.llm import AsyncTextLLM, AsyncTextLLMAdapter, StreamingTextLLM, TextLLM
+
+from .rate_limiter import RateLimiter
+
+
+class RateLimitedTextLLM(StreamingTextLLM, AsyncTextLLM):
+    """Wrap an LLM so that its calls respect a RateLimiter.
+
+    The wrapper can be used with both sync and async prompt runners. Sharing the same RateLimiter between several
+    wrappers makes them share one budget.
+
+    Args:
+        llm: The LLM to wrap. Async calls await it directly if it is an AsyncTextLLM and run it on a thread pool
+            otherwise. Sync calls require a TextLLM.
+        rate_limiter: The rate limiter to respect.
+    """
+
+    llm: Union[TextLLM, AsyncTextLLM]
+    rate_limiter: RateLimiter
+
+    def __init__(self, llm: Union[TextLLM, AsyncTextLLM], rate_limiter: RateLimiter):
+        if not isinstance(llm, (TextLLM, AsyncTextLLM)):
+            raise TypeError(f"llm must be an instance of TextLLM or AsyncTextLLM, got {type(llm).__name__}")
+        self.llm = llm
+        self.rate_limiter = rate_limiter
+        self._async_llm = llm if isinstance(llm, AsyncTextLLM) else AsyncTextLLMAdapter(llm)
+
+    def generate(self, input_text: str) -> str:
+        with self.rate_limiter.limit(input_text):
+            output = self._text_llm().generate(input_text)
+        self.rate_limiter.record_output(output)
+        return output
+
+    def generate_stream(self, input_text: str) -> Iterator[str]:
+        llm = self._text_llm()
+        if not isinstance(llm, StreamingTextLLM):
+            yield self.generate(input_text)
+            return
+
+        chunks = []
+        with self.rate_limiter.limit(input_text):
+            try:
+                for chunk in llm.generate_stream(input_text):
+                    chunks.append(chunk)
+                    yield chunk
+            finally:
+                self.rate_limiter.record_output("".join(chunks))
+
+    async def agenerate(self, input_text: str) -> str:
+        async with self.rate_limiter.alimit(input_text):
+            output = await self._async_llm.agenerate(input_text)
+        self.rate_limiter.record_output(output)
+        return output
+
+    def identity(self) -> str:
+        """Return the identity of the wrapped LLM, as rate limiting does not change its outputs."""
+        return self.llm.identity()
+
+    def has_stable_identity(self) -> bool:
+        return self.llm.has_stable_identity()
+
+    def _text_llm(self) -> TextLLM:
+        if not isinstance(self.llm, TextLLM):
+            raise TypeError(f"{type(self.llm).__name__} is not a TextLLM and can only be called asynchronously")
+        return self.llm
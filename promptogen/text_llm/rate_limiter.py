@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from promptogen.model.dataclass import DataClass
+from promptogen.model.token_counter import estimate_tokens
+
+
+class TokenBucket:
+    """A thread-safe token bucket that lends tokens ahead of time.
+
+    Taking tokens never blocks: the bucket goes into debt and tells the caller how long to wait until the debt is
+    repaid by the refill. Callers are therefore served in the order they reserve, and the lock is held only for
+    the bookkeeping, so the same bucket can be used from threads and event loops.
+
+    Args:
+        rate: The number of tokens added per second.
+        capacity: The maximum number of tokens the bucket holds. The bucket starts full.
+    """
+
+    rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError(f"rate must be > 0, got {rate}.")
+        if capacity <= 0:
+            raise ValueError(f"capacity must be > 0, got {capacity}.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take tokens from the bucket.
+
+        Args:
+            amount: The number of tokens to take.
+
+        Returns:
+            The number of seconds to wait before the tokens are actually available.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Take (positive amount) or give back (negative amount) tokens without waiting.
+
+        Use it to correct a reservation once the actual cost is known.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+    def available(self) -> float:
+        """Return the number of tokens currently in the bucket, negative if it is in debt."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ConcurrencyLimiter:
+    """A first-in first-out semaphore that can be acquired both from threads and from event loops.
+
+    Args:
+        limit: The maximum number of holders at the same time.
+    """
+
+    limit: int
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError(f"limit must be >= 1, got {limit}.")
+        self.limit = limit
+        self._in_use = 0
+        self._waiters: Deque[Callable[[], None]] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block the current thread until a slot is free."""
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return
+            event = threading.Event()
+            wake = event.set
+            self._waiters.append(wake)
+        # the slot is handed over by release() without decrementing _in_use
+        try:
+            event.wait()
+        except BaseException:
+            with self._lock:
+                try:
+                    self._waiters.remove(wake)
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            if handed_over:
+                self.release()
+            raise
+
+    async def aacquire(self) -> None:
+        """Wait without blocking the event loop until a slot is free."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_use < self.limit and not self._waiters:
+                self._in_use += 1
+                return
+            future = loop.create_future()
+
+            def wake() -> None:
+                loop.call_soon_threadsafe(self._wake_future, future)
+
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(wake)
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            # If the future is still pending, it is cancelled with the task and _wake_future gives the slot back.
+            # If the slot was already handed over to it, nobody else will.
+            if handed_over and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _wake_future(self, future: asyncio.Future) -> None:
+        if future.done():
+            # the waiter was cancelled after the slot was handed over to it
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self) -> None:
+        """Free a slot, handing it over to the longest waiting caller if any."""
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft()()
+            else:
+                self._in_use -= 1
+
+    def in_use(self) -> int:
+        """Return the number of slots currently held."""
+        return self._in_use
+
+    def waiting(self) -> int:
+        """Return the number of callers waiting for a slot."""
+        return len(self._waiters)
+
+
+class RateLimiterStats(DataClass):
+    """Statistics of a rate limiter.
+
+    Attributes:
+        requests: The number of requests admitted.
+        tokens: The number of tokens accounted for, estimated.
+        in_flight: The number of requests currently running.
+        queue_depth: The number of requests currently waiting to be admitted.
+        total_wait: The total time requests waited to be admitted, in seconds.
+        max_wait: The longest time a request waited to be admitted, in seconds.
+        mean_wait: The mean time requests waited to be admitted, in seconds.
+    """
+
+    requests: int
+    tokens: int
+    in_flight: int
+    queue_depth: int
+    total_wait: float
+    max_wait: float
+    mean_wait: float
+
+
+class RateLimiter:
+    """Limit the requests and tokens per minute, and the number of concurrent requests, sent to an LLM.
+
+    The tokens of a request are estimated from its input text, plus `expected_output_tokens`, when it is admitted.
+    Once the output is known, `record_output` corrects the token budget. A RateLimiter is thread-safe and can be used
+    from sync and async code at the same time, so one instance can be shared by every runner of a process (see
+    `shared_rate_limiter`).
+
+    Args:
+        requests_per_minute: The maximum number of requests per minute. Defaults to None (no limit).
+        tokens_per_minute: The maximum number of tokens per minute. Defaults to None (no limit).
+        max_concurrency: The maximum number of requests running at the same time. Defaults to None (no limit).
+        estimate_tokens: (text: str) -> int. Estimates the number of tokens of a text. A TokenCounter can be
+            passed for exact counts. Defaults to `estimate_tokens`.
+        expected_output_tokens: The number of output tokens reserved for each request before it runs. Defaults to 0.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        *,
+        estimate_tokens: Callable[[str], int] = estimate_tokens,
+        expected_output_tokens: int = 0,
+    ):
+        self.request_bucket = (
+            TokenBucket(requests_per_minute / 60, requests_per_minute) if requests_per_minute is not None else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute is not None else None
+        )
+        self.concurrency = ConcurrencyLimiter(max_concurrency) if max_concurrency is not None else None
+        self.estimate_tokens = estimate_tokens
+        self.expected_output_tokens = expected_output_tokens
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._tokens = 0
+        self._in_flight = 0
+        self._queue_depth = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @contextmanager
+    def limit(self, input_text: str) -> Iterator[None]:
+        """Wait until a request with the given input can be sent, and hold a concurrency slot while it runs.
+
+        Args:
+            input_text: The input text of the request.
+        """
+        start = time.monotonic()
+        self._enter_queue()
+        tokens: Optional[int] = None
+        try:
+            tokens, delay = self._reserve(input_text)
+            if delay > 0:
+                time.sleep(delay)
+            if self.concurrency is not None:
+                self.concurrency.acquire()
+        except BaseException:
+            # e.g. cancelled while waiting: the request is never sent, so it gives back what it reserved
+            self._abandon(tokens)
+            raise
+        self._admit(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def alimit(self, input_text: str) -> AsyncIterator[None]:
+        """Wait without blocking the event loop until a request with the given input can be sent, and hold a
+        concurrency slot while it runs.
+
+        Args:
+            input_text: The input text of the request.
+        """
+        start = time.monotonic()
+        self._enter_queue()
+        tokens: Optional[int] = None
+        try:
+            tokens, delay = self._reserve(input_text)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.concurrency is not None:
+                await self.concurrency.aacquire()
+        except BaseException:
+            # e.g. cancelled while waiting: the request is never sent, so it gives back what it reserved
+            self._abandon(tokens)
+            raise
+        self._admit(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def record_output(self, output_text: str) -> None:
+        """Correct the token budget with the actual output of a request.
+
+        Args:
+            output_text: The output text of the request.
+        """
+        tokens = self.estimate_tokens(output_text) - self.expected_output_tokens
+        with self._lock:
+            self._tokens += tokens
+        if self.token_bucket is not None:
+            self.token_bucket.adjust(tokens)
+
+    def stats(self) -> RateLimiterStats:
+        """Return the statistics of the rate limiter."""
+        with self._lock:
+            return RateLimiterStats(
+                requests=self._requests,
+                tokens=self._tokens,
+                in_flight=self._in_flight,
+                queue_depth=self._queue_depth,
+                total_wait=self._total_wait,
+                max_wait=self._max_wait,
+                mean_wait=self._total_wait / self._requests if self._requests else 0.0,
+            )
+
+    def _reserve(self, input_text: str) -> Tuple[int, float]:
+        tokens = self.estimate_tokens(input_text) + self.expected_output_tokens
+        with self._lock:
+            self._tokens += tokens
+        delay = 0.0
+        if self.request_bucket is not None:
+            delay = self.request_bucket.reserve(1)
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        return tokens, delay
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            self._queue_depth += 1
+
+    def _admit(self, wait: float) -> None:
+        with self._lock:
+            self._queue_depth -= 1
+            self._requests += 1
+            self._in_flight += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+    def _abandon(self, tokens: Optional[int]) -> None:
+        with self._lock:
+            self._queue_depth -= 1
+            if tokens is not None:
+                self._tokens -= tokens
+        if tokens is None:
+            return
+        if self.request_bucket is not None:
+            self.request_bucket.adjust(-1)
+        if self.token_bucket is not None:
+            self.token_bucket.adjust(-tokens)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        if self.concurrency is not None:
+            self.concurrency.release()
+
+
+_shared_rate_limiters: Dict[str, RateLimiter] = {}
+_shared_rate_limiters_lock = threading.Lock()
+
+
+def shared_rate_limiter(
+    name: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    **kwargs,
+) -> RateLimiter:
+    """Return the rate limiter of the process registered under the given name, creating it on first use.
+
+    The limits are only used when the rate limiter is created, so every runner that sends requests to the same
+    provider account can get the same budget by name.
+
+    Args:
+        name: The name of the rate limiter, e.g. "openai".
+        requests_per_minute: See RateLimiter.
+        tokens_per_minute: See RateLimiter.
+        max_concurrency: See RateLimiter.
+        **kwargs: Other arguments of RateLimiter.
+    """
+    with _shared_rate_limiters_lock:
+        limiter = _shared_rate_limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute, max_concurrency, **kwargs)
+            _shared_rate_limiters[name] = limiter
+        return limiter
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from promptogen.model.dataclass import DataClass
+from promptogen.model.llm import AsyncTextLLM, AsyncTextLLMAdapter, TextLLM
+from promptogen.model.response_cache import response_cache_key
+
+
+class SingleFlightStats(DataClass):
+    """Statistics of a SingleFlightTextLLM.
+
+    Attributes:
+        calls: The number of calls made to the wrapped LLM.
+        coalesced: The number of requests served by the call of an identical request already in flight.
+        in_flight: The number of calls currently in flight.
+    """
+
+    calls: int
+    coalesced: int
+    in_flight: int
+
+
+class _Flight:
+    """A call in flight, and the callers waiting for its result."""
+
+    def __init__(self) -> None:
+        self.done = False
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.waiters: List[Callable[[], None]] = []
+
+    def get(self) -> str:
+        if self.error is not None:
+            raise self.error
+        assert self.result is not None
+        return self.result
+
+
+class SingleFlightTextLLM(TextLLM, AsyncTextLLM):
+    """Wrap an LLM so that identical requests in flight at the same time share a single call.
+
+    The first caller of a request (the leader) calls the wrapped LLM. Callers of the same request that arrive before
+    the call completes (the followers) wait for it and receive the same response, or the same exception. Requests
+    are identified by the hash of the wrapped LLM's identity and the rendered request text. Threads and coroutines
+    share the same calls.
+
+    Args:
+        llm: The LLM to wrap. Async calls await it directly if it is an AsyncTextLLM and run it on a thread pool
+            otherwise. Sync calls require a TextLLM.
+    """
+
+    llm: Union[TextLLM, AsyncTextLLM]
+
+    def __init__(self, llm: Union[TextLLM, AsyncTextLLM]):
+        if not isinstance(llm, (TextLLM, AsyncTextLLM)):
+            raise TypeError(f"llm must be an instance of TextLLM or AsyncTextLLM, got {type(llm).__name__}")
+        self.llm = llm
+        self._async_llm = llm if isinstance(llm, AsyncTextLLM) else AsyncTextLLMAdapter(llm)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._coalesced = 0
+
+    def generate(self, input_text: str) -> str:
+        llm = self.llm
+        if not isinstance(llm, TextLLM):
+            raise TypeError(f"{type(llm).__name__} is not a TextLLM and can only be called asynchronously")
+
+        key = response_cache_key(llm, input_text)
+        flight, leader = self._join(key)
+        if leader:
+            self._run(key, flight, lambda: llm.generate(input_text))
+            return flight.get()
+
+        event = threading.Event()
+        if self._add_waiter(flight, event.set):
+            event.wait()
+        return flight.get()
+
+    async def agenerate(self, input_text: str) -> str:
+        key = response_cache_key(self.llm, input_text)
+        flight, leader = self._join(key)
+        if leader:
+            # shielded, so that cancelling the leader does not fail its followers
+            await asyncio.shield(self._arun(key, flight, input_text))
+            return flight.get()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(_set_result_if_pending, future)
+
+        if self._add_waiter(flight, wake):
+            await future
+        return flight.get()
+
+    def identity(self) -> str:
+        """Return the identity of the wrapped LLM, as coalescing does not change its outputs."""
+        return self.llm.identity()
+
+    def has_stable_identity(self) -> bool:
+        return self.llm.has_stable_identity()
+
+    def stats(self) -> SingleFlightStats:
+        """Return the statistics of the wrapper."""
+        with self._lock:
+            return SingleFlightStats(calls=self._calls, coalesced=self._coalesced, in_flight=len(self._flights))
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._coalesced += 1
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            self._calls += 1
+            return flight, True
+
+    def _add_waiter(self, flight: _Flight, wake: Callable[[], None]) -> bool:
+        """Register a waiter, and return False if the flight already completed."""
+        with self._lock:
+            if flight.done:
+                return False
+            flight.waiters.append(wake)
+            return True
+
+    def _run(self, key: str, flight: _Flight, call: Callable[[], str]) -> None:
+        try:
+            flight.result = call()
+        except BaseException as e:
+            flight.error = e
+        self._land(key, flight)
+
+    async def _arun(self, key: str, flight: _Flight, input_text: str) -> None:
+        try:
+            flight.result = await self._async_llm.agenerate(input_text)
+        except BaseException as e:
+            flight.error = e
+        self._land(key, flight)
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        with self._lock:
+            flight.done = True
+            del self._flights[key]
+            waiters, flight.waiters = flight.waiters, []
+        for wake in waiters:
+            wake()
+
+
+def _set_result_if_pending(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
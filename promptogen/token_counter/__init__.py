@@ -0,0 +1,5 @@
+from .tiktoken_counter import TiktokenTokenCounter
+
+__all__ = [
+    "TiktokenTokenCounter",
+]
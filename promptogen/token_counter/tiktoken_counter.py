@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from promptogen.model.token_counter import TokenCounter
+
+
+class TiktokenTokenCounter(TokenCounter):
+    """Count the exact number of tokens of a text with a tiktoken encoding, as used by OpenAI models.
+
+    It requires the optional `tiktoken` package (`pip install promptogen[tiktoken]`).
+
+    Args:
+        encoding_name: The name of the encoding to use. Defaults to "cl100k_base".
+        model: The name of a model whose encoding to use, e.g. "gpt-4". It takes precedence over encoding_name.
+            Defaults to None.
+
+    Raises:
+        ImportError: If tiktoken is not installed.
+    """
+
+    encoding: Any
+
+    def __init__(self, encoding_name: str = "cl100k_base", *, model: Optional[str] = None):
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError(
+                "TiktokenTokenCounter requires tiktoken. Install it with `pip install promptogen[tiktoken]`."
+            ) from e
+
+        self.encoding = (
+            tiktoken.encoding_for_model(model) if model is not None else tiktoken.get_encoding(encoding_name)
+        )
+
+    def count(self, text: str) -> int:
+        # special tokens in prompts are counted as plain text, as APIs do not interpret them either
+        return len(self.encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+
+set -eu
+
+cd "$(dirname "$0")/.."
+
+poetry run python -m benchmarks "$@"
@@ -0,0 +1,50 @@
+from benchmarks import cases  # noqa: F401
+from benchmarks.suite import (
+    BenchmarkReport,
+    BenchmarkResult,
+    compare_reports,
+    registered_benchmarks,
+    run_benchmarks,
+    time_callable,
+)
+
+
+def test_registered_benchmarks_run():
+    for bench in registered_benchmarks():
+        params = next(bench.cases())
+        bench.setup(**params)()
+
+
+def test_time_callable():
+    calls = []
+    number, timings = time_callable(lambda: calls.append(1), rounds=3, min_time=0.001)
+
+    assert len(timings) == 3
+    assert number >= 1
+    assert len(calls) >= 1 + 3 * number
+
+
+def test_run_benchmarks_filter():
+    report = run_benchmarks(registered_benchmarks(), pattern=r"^prompt_copy_me\[examples=0\]$", rounds=2, min_time=0)
+
+    assert [result.key() for result in report.results] == ["prompt_copy_me[examples=0]"]
+    assert report.results[0].rounds == 2
+    assert BenchmarkReport.from_json_string(report.model_dump_json()) == report
+
+
+def _result(name: str, median: float) -> BenchmarkResult:
+    return BenchmarkResult(
+        name=name, params={"n": 1}, number=1, rounds=1, min=median, median=median, mean=median, stdev=0
+    )
+
+
+def test_compare_reports():
+    baseline = BenchmarkReport(created_at="", python="", platform="", results=[_result("a", 1.0), _result("b", 1.0)])
+    current = BenchmarkReport(
+        created_at="", python="", platform="", results=[_result("a", 1.5), _result("b", 0.5), _result("c", 1.0)]
+    )
+
+    comparisons = compare_reports(baseline, current)
+
+    assert [(c.key, c.ratio) for c in comparisons] == [("a[n=1]", 1.5), ("b[n=1]", 0.5)]
+    assert [c.is_regression(0.1) for c in comparisons] == [True, False]
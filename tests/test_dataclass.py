@@ -53,3 +53,22 @@ def test_dataclass_from_json_string():
         name="test name",
         description="test description",
     )
+
+
+def test_dataclass_replace():
+    class Nested(DataClass):
+        values: list
+
+    class Parent(DataClass):
+        name: str
+        nested: Nested
+
+    parent = Parent(name="name", nested=Nested(values=[1]))
+    got = parent.replace(name="new name")
+
+    assert got == Parent(name="new name", nested=Nested(values=[1]))
+    assert got.nested is parent.nested
+    assert parent.name == "name"
+
+    with pytest.raises(ValueError):
+        parent.replace(invalid_key="invalid value")
@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+from promptogen.evaluation import Evaluator, StubTextLLM, exact_match, key_match
+from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
+from promptogen.model.prompt_runner import TextLLMPromptRunner
+from promptogen.model.retry_policy import RetryPolicy
+from promptogen.model.token_counter import PromptTooLargeError
+from promptogen.prompt_formatter.key_value_formatter import KeyValuePromptFormatter
+from promptogen.text_llm import RateLimiter
+
+
+@pytest.fixture
+def prompt() -> Prompt:
+    return Prompt(
+        name='sentiment',
+        description='Classify the sentiment of the text.',
+        input_parameters=[ParameterInfo(name='text', description='text')],
+        output_parameters=[ParameterInfo(name='sentiment', description='positive or negative')],
+        template=IOExample(input={'text': 'text'}, output={'sentiment': 'positive'}),
+        examples=[],
+    )
+
+
+@pytest.fixture
+def examples():
+    return [
+        IOExample(input={'text': f'{word} {i}'}, output={'sentiment': 'positive' if word == 'good' else 'negative'})
+        for i, word in enumerate(['good', 'bad', 'good', 'awful', 'good', 'bad'])
+    ]
+
+
+def respond(raw_req: str) -> str:
+    # the stub always answers "positive" for "good" and "negative" otherwise, except that "awful" is answered wrongly
+    text = raw_req.strip().splitlines()[-2]
+    if 'good' in text or 'awful' in text:
+        return 'sentiment: "positive"'
+    return 'sentiment: "negative"'
+
+
+def test_evaluator_evaluate(prompt, examples):
+    runner = TextLLMPromptRunner(llm=StubTextLLM(respond), formatter=KeyValuePromptFormatter())
+    evaluator = Evaluator(runner, {'exact_match': exact_match, 'sentiment': key_match('sentiment')})
+
+    report = evaluator.evaluate(prompt, examples)
+
+    assert [r.index for r in report.results] == list(range(6))
+    assert [r.scores['exact_match'] for r in report.results] == [1.0, 1.0, 1.0, 0.0, 1.0, 1.0]
+    assert report.results[3].output == {'sentiment': 'positive'}
+    assert report.stats.total == 6
+    assert report.stats.completed == 6
+    assert report.stats.errors == 0
+    assert report.stats.scores == {'exact_match': 5 / 6, 'sentiment': 5 / 6}
+
+
+def test_evaluator_streams_stats(prompt, examples):
+    runner = TextLLMPromptRunner(llm=StubTextLLM(respond), formatter=KeyValuePromptFormatter())
+    evaluator = Evaluator(runner, max_concurrency=2)
+
+    updates = list(evaluator.evaluate_iter(prompt, examples))
+
+    assert [stats.completed for _, stats in updates] == [1, 2, 3, 4, 5, 6]
+    assert sorted(result.index for result, _ in updates) == list(range(6))
+    assert updates[-1][1].latency_p50 <= updates[-1][1].latency_p95
+
+
+def test_evaluator_bounded_concurrency(prompt, examples):
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def slow_respond(raw_req: str) -> str:
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return respond(raw_req)
+
+    runner = TextLLMPromptRunner(llm=StubTextLLM(slow_respond), formatter=KeyValuePromptFormatter())
+
+    report = Evaluator(runner, max_concurrency=3).evaluate(prompt, examples * 3)
+
+    assert report.stats.completed == 18
+    assert 1 < max_running[0] <= 3
+
+
+def test_evaluator_retries(prompt, examples):
+    failures = {'good 0': 1, 'bad 1': 5}
+    lock = threading.Lock()
+
+    def flaky_respond(raw_req: str) -> str:
+        text = raw_req.strip().splitlines()[-2]
+        with lock:
+            for key in failures:
+                if key in text and failures[key] > 0:
+                    failures[key] -= 1
+                    raise ConnectionError('unavailable')
+        return respond(raw_req)
+
+    llm = StubTextLLM(flaky_respond)
+    runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter())
+
+    report = Evaluator(runner, retry_policy=RetryPolicy(max_attempts=3, initial_backoff=0)).evaluate(prompt, examples)
+
+    assert report.results[0].attempts == 2
+    assert report.results[0].error is None
+    assert report.results[1].attempts == 3
+    assert report.results[1].error == 'ConnectionError: unavailable'
+    assert report.results[1].output is None
+    assert report.results[1].scores == {'exact_match': 0.0}
+    assert report.stats.errors == 1
+    assert llm.calls == 6 + 1 + 2
+
+
+def test_evaluator_retries_only_transient_errors(prompt, examples):
+    errors = [TypeError('bad argument'), PromptTooLargeError(10, 1), ValueError('unparsable'), TimeoutError('slow')]
+    attempts = {}
+    lock = threading.Lock()
+
+    def failing_respond(raw_req: str) -> str:
+        text = raw_req.strip().splitlines()[-2]
+        with lock:
+            for i, error in enumerate(errors):
+                if f' {i}"' in text:
+                    attempts[i] = attempts.get(i, 0) + 1
+                    raise error
+        return respond(raw_req)
+
+    runner = TextLLMPromptRunner(llm=StubTextLLM(failing_respond), formatter=KeyValuePromptFormatter())
+
+    report = Evaluator(runner, retry_policy=RetryPolicy(initial_backoff=0)).evaluate(prompt, examples[:4])
+
+    # the policy retries parse errors and timeouts, but never TypeError and PromptTooLargeError
+    assert attempts == {0: 1, 1: 1, 2: 3, 3: 3}
+
+    attempts.clear()
+    Evaluator(runner).evaluate(prompt, examples[:4])
+
+    # the default policy only retries connection errors and timeouts
+    assert attempts == {0: 1, 1: 1, 2: 1, 3: 3}
+    assert [r.error is not None for r in report.results] == [True] * 4
+
+
+def test_evaluator_rate_limit(prompt, examples):
+    runner = TextLLMPromptRunner(llm=StubTextLLM(respond), formatter=KeyValuePromptFormatter())
+    # 10 tokens per second, and 100 tokens per request
+    limiter = RateLimiter(tokens_per_minute=600, max_concurrency=2, estimate_tokens=lambda _: 100)
+    evaluator = Evaluator(runner, max_concurrency=6, rate_limiter=limiter)
+
+    start = time.perf_counter()
+    evaluator.evaluate(prompt, examples + examples[:1])
+
+    # the 7th request waits for the bucket to refill
+    assert time.perf_counter() - start >= 0.1
+    assert limiter.stats().requests == 7
+    assert limiter.stats().in_flight == 0
+
+
+def test_evaluator_on_result(prompt, examples):
+    runner = TextLLMPromptRunner(llm=StubTextLLM(respond), formatter=KeyValuePromptFormatter())
+    seen = []
+
+    Evaluator(runner).evaluate(prompt, examples, on_result=lambda result, stats: seen.append(stats.completed))
+
+    assert seen == [1, 2, 3, 4, 5, 6]
+
+
+def test_evaluator_invalid_args(prompt):
+    runner = TextLLMPromptRunner(llm=StubTextLLM(respond), formatter=KeyValuePromptFormatter())
+
+    with pytest.raises(ValueError):
+        Evaluator(runner, max_concurrency=0)
+
+
+def test_key_match_normalize():
+    assert key_match('a')({'a': 'Yes'}, {'a': ' yes '}) == 0.0
+    assert key_match('a', normalize=True)({'a': 'Yes'}, {'a': ' yes '}) == 1.0
+    assert key_match('a')({'a': 'Yes'}, {}) == 0.0
@@ -0,0 +1,61 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import promptogen
+
+
+def _modules_after_import(statement: str) -> list:
+    code = f"import sys; {statement}; import json; print(json.dumps(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(out)
+
+
+def test_import_promptogen_is_lazy():
+    modules = _modules_after_import("import promptogen")
+
+    assert "pydantic" not in modules
+    assert "promptogen.model" not in modules
+    assert "promptogen.prompt_formatter" not in modules
+
+
+def test_import_prompt_collection_does_not_build_predefined_prompts():
+    modules = _modules_after_import("import promptogen.prompt_collection")
+
+    assert [m for m in modules if m.startswith("promptogen.prompt_collection.prompts.")] == []
+
+
+def test_import_prompt_collection_class_does_not_build_predefined_prompts():
+    modules = _modules_after_import("from promptogen.prompt_collection import PromptCollection")
+
+    assert [m for m in modules if m.startswith("promptogen.prompt_collection.prompts.")] == []
+
+
+def test_lazy_attributes():
+    assert promptogen.Prompt.__name__ == "Prompt"
+    assert "Prompt" in dir(promptogen)
+    assert set(promptogen.__all__) <= set(dir(promptogen))
+    assert "model" in dir(promptogen)
+    assert not {"Any", "TYPE_CHECKING", "annotations", "importlib", "lazy_attributes"} & set(dir(promptogen))
+    assert isinstance(promptogen.__version__, str)
+
+    from promptogen.prompt_collection import TextCategorizerPrompt
+
+    assert TextCategorizerPrompt().name == "TextCategorizer"
+
+
+def test_lazy_attributes_subpackages():
+    code = "import promptogen as pg; print(pg.model.Prompt.__name__, pg.prompt_collection.prompts.__name__)"
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+
+    assert out.split() == ["Prompt", "promptogen.prompt_collection.prompts"]
+
+
+def test_lazy_attributes_unknown():
+    with pytest.raises(AttributeError):
+        promptogen.Unknown  # type: ignore
+
+    with pytest.raises(ImportError):
+        from promptogen.prompt_collection import Unknown  # type: ignore  # noqa: F401
@@ -0,0 +1,123 @@
+import sys
+
+from pydantic import BaseModel
+import pytest
+
+from promptogen.model.dataclass import DataClass
+from promptogen.prompt_formatter import JsonPromptFormatter, JsonValueFormatter
+from promptogen.prompt_formatter.json_codec import (
+    OrjsonJsonCodec,
+    StdlibJsonCodec,
+    UjsonJsonCodec,
+    encode_model,
+    get_json_codec,
+)
+
+
+class Point(DataClass):
+    x: int
+    y: int
+
+
+class Label(BaseModel):
+    name: str
+
+
+_value = {
+    'point': Point(x=1, y=2),
+    'labels': [Label(name='ラベル'), {'nested': Point(x=3, y=4)}],
+    'text': 'こんにちは',
+}
+
+_plain_value = {
+    'point': {'x': 1, 'y': 2},
+    'labels': [{'name': 'ラベル'}, {'nested': {'x': 3, 'y': 4}}],
+    'text': 'こんにちは',
+}
+
+
+def _codec(name: str):
+    pytest.importorskip(name)
+    return get_json_codec(name)
+
+
+@pytest.mark.parametrize('name', ['stdlib', 'orjson', 'ujson'])
+def test_json_codec_roundtrip(name: str):
+    codec = _codec(name) if name != 'stdlib' else get_json_codec(name)
+
+    for indent, compact in [(None, False), (None, True), (1, False)]:
+        s = codec.dumps(_value, indent=indent, compact=compact)
+        assert 'こんにちは' in s
+        assert codec.loads(s) == _plain_value
+
+    with pytest.raises(ValueError):
+        codec.loads('{"a": ')
+
+
+def test_stdlib_json_codec_formatting():
+    codec = StdlibJsonCodec()
+
+    assert codec.dumps({'a': [1, 2]}) == '{"a": [1, 2]}'
+    assert codec.dumps({'a': [1, 2]}, compact=True) == '{"a":[1,2]}'
+    assert codec.dumps({'a': 1}, indent=1) == '{\n "a": 1\n}'
+    with pytest.raises(TypeError):
+        codec.dumps({'a': object()})
+
+
+def test_get_json_codec():
+    assert isinstance(get_json_codec(), StdlibJsonCodec)
+    assert get_json_codec('stdlib') is get_json_codec('stdlib')
+    assert get_json_codec('fastest').name in {'orjson', 'ujson', 'stdlib'}
+
+    with pytest.raises(ValueError):
+        get_json_codec('unknown')
+
+
+def test_get_json_codec_missing_library(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    monkeypatch.setitem(sys.modules, 'ujson', None)
+
+    with pytest.raises(ImportError):
+        OrjsonJsonCodec()
+    with pytest.raises(ImportError):
+        UjsonJsonCodec()
+
+
+def test_encode_model():
+    assert encode_model(Point(x=1, y=2)) == {'x': 1, 'y': 2}
+    assert encode_model(Label(name='a')) == {'name': 'a'}
+    with pytest.raises(TypeError):
+        encode_model(object())
+
+
+def test_json_value_formatter_encodes_models_in_place():
+    f = JsonValueFormatter()
+
+    assert f.parse([], f.format(_value)) == _plain_value
+
+
+def test_json_value_formatter_compact():
+    f = JsonValueFormatter(compact=True)
+
+    assert f.format({'a': [1, 2], 'b': 'x'}) == '```json\n{"a":[1,2],"b":"x"}```'
+    assert f.parse([('a', list)], f.format({'a': [1, 2]})) == {'a': [1, 2]}
+
+
+def test_json_value_formatter_codec():
+    codec = _codec('orjson')
+    f = JsonValueFormatter(codec='orjson')
+
+    assert f.codec is codec
+    assert f.parse([], f.format(_value)) == _plain_value
+
+    parser = f.incremental_parser([('a', int), ('b', list)])
+    assert parser.feed('```json\n{"a": 1, "b": [1') == [('a', 1)]
+    assert parser.feed(', 2]}\n```') == [('b', [1, 2])]
+
+
+def test_json_prompt_formatter_codec():
+    formatter = JsonPromptFormatter(compact=True, codec=StdlibJsonCodec())
+
+    assert formatter.input_formatter.compact
+    assert formatter.output_formatter.compact
+    assert isinstance(formatter.output_formatter.codec, StdlibJsonCodec)
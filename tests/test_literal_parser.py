@@ -0,0 +1,114 @@
+import pytest
+
+from promptogen.model.value_formatter import OutputFormatError
+from promptogen.prompt_formatter import KeyValueFormatter, LiteralParseError, LiteralParser, parse_literal
+from promptogen.prompt_formatter.key_value_formatter import compile_key_value_parser
+
+
+def test_parse_literal_json():
+    assert parse_literal('{"a": [1, 2.5, "x"], "b": true, "c": null}') == {'a': [1, 2.5, 'x'], 'b': True, 'c': None}
+    assert parse_literal('  42\n') == 42
+    assert parse_literal('"こんにちは"') == 'こんにちは'
+
+
+def test_parse_literal_python():
+    assert parse_literal("{'a': ['x', True, None], 'b': False}") == {'a': ['x', True, None], 'b': False}
+    assert parse_literal("[1, 2, 3,]") == [1, 2, 3]
+    assert parse_literal("{'a': 1,\n}") == {'a': 1}
+
+
+def test_parse_literal_python_escapes():
+    assert parse_literal(r"['it\'s', 'say \"hi\"', 'a \"b\"', '\n']") == ["it's", 'say "hi"', 'a "b"', '\n']
+    assert parse_literal('[\'He said "yes"\']') == ['He said "yes"']
+
+
+def test_parse_literal_keeps_constants_in_strings():
+    assert parse_literal("['True', 'None,]', \"False\"]") == ['True', 'None,]', 'False']
+
+
+def test_parse_literal_falls_back_to_literal_eval():
+    assert parse_literal('(1, 2)') == (1, 2)
+    assert parse_literal('{1, 2}') == {1, 2}
+    assert parse_literal("{1: 'a'}") == {1: 'a'}
+    assert parse_literal("'''multi\nline'''") == 'multi\nline'
+
+
+def test_parse_literal_invalid():
+    with pytest.raises(LiteralParseError):
+        parse_literal('')
+    with pytest.raises(LiteralParseError):
+        parse_literal('[1, 2')
+    with pytest.raises(LiteralParseError):
+        parse_literal('__import__("os")')
+
+
+@pytest.mark.parametrize('s', ['NaN', '[1, Infinity]', '{"a": -Infinity}', "[True, NaN]", '[NaN, (1, 2)]'])
+def test_parse_literal_rejects_non_finite_constants(s: str):
+    with pytest.raises(LiteralParseError):
+        parse_literal(s)
+
+
+def test_literal_parse_error_is_output_format_error():
+    with pytest.raises(OutputFormatError):
+        parse_literal('not a literal')
+    with pytest.raises(ValueError):
+        parse_literal('not a literal')
+
+
+def test_literal_parser_max_size():
+    parser = LiteralParser(max_size=10)
+
+    assert parser.parse('  [1, 2, 3]  ') == [1, 2, 3]
+    with pytest.raises(LiteralParseError, match='more than the maximum of 10'):
+        parser.parse('[1, 2, 3, 4]')
+
+
+def test_literal_parser_max_depth():
+    parser = LiteralParser(max_depth=3)
+
+    assert parser.parse('[[[1]], [[2]], [[3]]]') == [[[1]], [[2]], [[3]]]
+    assert parser.parse('["[[[[", "{{{{"]') == ['[[[[', '{{{{']
+    with pytest.raises(LiteralParseError, match='nested more than 3 levels'):
+        parser.parse('[[[[1]]]]')
+    with pytest.raises(LiteralParseError, match='nested more than 3 levels'):
+        parser.parse('({[(1,)]},)')
+
+
+def test_literal_parser_deeply_nested():
+    with pytest.raises(LiteralParseError):
+        parse_literal('[' * 100_000 + ']' * 100_000)
+
+
+def test_literal_parser_invalid_limits():
+    with pytest.raises(ValueError):
+        LiteralParser(max_size=0)
+    with pytest.raises(ValueError):
+        LiteralParser(max_depth=0)
+
+
+def test_literal_parser_eq():
+    assert LiteralParser() == LiteralParser()
+    assert hash(LiteralParser(max_depth=5)) == hash(LiteralParser(max_depth=5))
+    assert LiteralParser(max_depth=5) != LiteralParser()
+    assert repr(LiteralParser()) == 'LiteralParser(max_size=10000000, max_depth=100)'
+
+
+def test_key_value_formatter_parse_json_values():
+    f = KeyValueFormatter()
+
+    assert f.parse([('a', list), ('b', bool)], 'a: [1, null]\nb: true') == {'a': [1, None], 'b': True}
+
+
+def test_key_value_formatter_literal_parser():
+    f = KeyValueFormatter(literal_parser=LiteralParser(max_depth=2))
+
+    assert f.parse([('a', list)], 'a: [[1]]') == {'a': [[1]]}
+    with pytest.raises(LiteralParseError):
+        f.parse([('a', list)], 'a: [[[1]]]')
+
+
+def test_compile_key_value_parser_by_literal_parser():
+    keys = [('a', list)]
+
+    assert compile_key_value_parser(keys) is compile_key_value_parser(keys, LiteralParser())
+    assert compile_key_value_parser(keys) is not compile_key_value_parser(keys, LiteralParser(max_depth=2))
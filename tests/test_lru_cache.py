@@ -0,0 +1,42 @@
+import pytest
+
+from promptogen.model.lru_cache import LRUCache
+
+
+def test_lru_cache_get_put():
+    c: LRUCache[int] = LRUCache(maxsize=2)
+    c.put('a', 1)
+    c.put('b', 2)
+
+    assert c.get('a') == 1
+    assert c.get('c') is None
+    assert c.cache_info().hits == 1
+    assert c.cache_info().misses == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    c: LRUCache[int] = LRUCache(maxsize=2)
+    c.put('a', 1)
+    c.put('b', 2)
+    c.get('a')
+    c.put('c', 3)
+
+    assert 'a' in c
+    assert 'b' not in c
+    assert 'c' in c
+    assert len(c) == 2
+
+
+def test_lru_cache_clear():
+    c: LRUCache[int] = LRUCache(maxsize=2)
+    c.put('a', 1)
+    c.get('a')
+    c.clear()
+
+    assert len(c) == 0
+    assert c.cache_info().hits == 0
+
+
+def test_lru_cache_invalid_maxsize():
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=-1)
@@ -0,0 +1,138 @@
+import pytest
+
+from promptogen.model.output_schema import OutputSchema, OutputSchemaError, compile_output_schema
+from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
+from promptogen.model.value_formatter import OutputFormatError
+
+
+@pytest.fixture
+def schema() -> OutputSchema:
+    return OutputSchema({
+        'name': 'name',
+        'count': 1,
+        'score': 0.5,
+        'ok': True,
+        'tags': ['tag'],
+        'items': [{'id': 1, 'label': 'label'}],
+        'detail': {'level': 1},
+        'anything': None,
+    })
+
+
+def _valid_value():
+    return {
+        'name': 'a',
+        'count': 2,
+        'score': 1.5,
+        'ok': False,
+        'tags': ['x', 'y'],
+        'items': [{'id': 1, 'label': 'a'}, {'id': 2, 'label': 'b', 'extra': True}],
+        'detail': {'level': 3, 'note': 'kept'},
+        'anything': [1, 'x'],
+    }
+
+
+def test_output_schema_keys(schema: OutputSchema):
+    assert schema.keys[:4] == [('name', str), ('count', int), ('score', float), ('ok', bool)]
+
+
+def test_output_schema_validate(schema: OutputSchema):
+    value = _valid_value()
+
+    assert schema.validate(value) == value
+
+
+def test_output_schema_validate_converts(schema: OutputSchema):
+    value = {
+        **_valid_value(),
+        'name': 10,
+        'count': '3',
+        'score': 2,
+        'ok': 'true',
+        'tags': ('x',),
+        'items': [{'id': 4.0, 'label': 5}],
+        'detail': {'level': ' 7 '},
+    }
+
+    validated = schema.validate(value)
+
+    assert validated['name'] == '10'
+    assert validated['count'] == 3
+    assert validated['score'] == 2.0 and isinstance(validated['score'], float)
+    assert validated['ok'] is True
+    assert validated['tags'] == ['x']
+    assert validated['items'] == [{'id': 4, 'label': '5'}]
+    assert validated['detail'] == {'level': 7}
+    # the given value is not modified
+    assert value['count'] == '3'
+
+
+@pytest.mark.parametrize('update, path', [
+    ({'count': 1.5}, "['count']"),
+    ({'count': True}, "['count']"),
+    ({'score': 'nan'}, "['score']"),
+    ({'score': float('inf')}, "['score']"),
+    ({'score': float('nan')}, "['score']"),
+    ({'score': 10**400}, "['score']"),
+    ({'ok': 'yes'}, "['ok']"),
+    ({'name': None}, "['name']"),
+    ({'tags': 'x'}, "['tags']"),
+    ({'items': [{'id': 1}, {'id': 'x'}]}, "['items'][1]['id']"),
+    ({'detail': []}, "['detail']"),
+])
+def test_output_schema_validate_invalid(schema: OutputSchema, update, path: str):
+    with pytest.raises(OutputSchemaError) as e:
+        schema.validate({**_valid_value(), **update})
+
+    assert e.value.path == path
+    assert path in str(e.value)
+    assert isinstance(e.value, OutputFormatError)
+
+
+def test_output_schema_validate_missing_key(schema: OutputSchema):
+    value = _valid_value()
+    del value['count']
+
+    with pytest.raises(OutputSchemaError, match="missing key 'count'"):
+        schema.validate(value)
+
+    with pytest.raises(OutputSchemaError):
+        schema.validate([])  # type: ignore
+
+
+def test_output_schema_mixed_list_accepts_any_items():
+    schema = OutputSchema({'values': ['a', 1]})
+
+    assert schema.validate({'values': [1, 'b', None]}) == {'values': [1, 'b', None]}
+
+
+def test_output_schema_validate_key(schema: OutputSchema):
+    assert schema.validate_key('count', '5') == 5
+    assert schema.validate_key('unknown', object) is object
+
+    with pytest.raises(OutputSchemaError):
+        schema.validate_key('count', 'five')
+
+
+def test_compile_output_schema_is_cached():
+    prompt = Prompt(
+        name='name',
+        description='description',
+        input_parameters=[ParameterInfo(name='text', description='text')],
+        output_parameters=[
+            ParameterInfo(name='score', description='score'),
+            ParameterInfo(name='label', description='label'),
+        ],
+        template=IOExample(input={'text': 'text'}, output={'label': 'label', 'score': 1}),
+        examples=[],
+    )
+
+    frozen = prompt.freeze()
+    schema = compile_output_schema(frozen)
+
+    assert schema.keys == [('score', int), ('label', str)]
+    assert compile_output_schema(frozen.copy_me()) is schema
+    assert compile_output_schema(frozen.update(description='other')) is not schema
+    # prompts that may be changed in place are compiled on every call
+    assert compile_output_schema(prompt) is not compile_output_schema(prompt)
+    assert compile_output_schema(prompt).keys == schema.keys
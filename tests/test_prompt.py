@@ -3,7 +3,7 @@ import tempfile
 from pydantic import ValidationError
 import pytest
 
-from promptogen.model.prompt import IOExample, ParameterInfo, Prompt, load_prompt_from_json_string
+from promptogen.model.prompt import FrozenPrompt, IOExample, ParameterInfo, Prompt, load_prompt_from_json_string
 
 
 @pytest.fixture
@@ -215,6 +215,29 @@ def test_prompt_rename_input_parameter(prompt_dict: dict):
     assert got.input_parameters[0].description == 'test input parameter description'
 
 
+def test_prompt_rename_input_parameter_shares_unchanged_values(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+
+    got = prompt.rename_input_parameter('test input parameter name', 'test input parameter name 3')
+
+    assert got.template.input == {
+        'test input parameter name 2': 'test input parameter value 2',
+        'test input parameter name 3': 'test input parameter value',
+    }
+    assert [e.input.keys() for e in got.examples] == [
+        {'test input parameter name 2', 'test input parameter name 3'},
+        {'test input parameter name 2', 'test input parameter name 3'},
+    ]
+    assert got.input_parameters[1] is prompt.input_parameters[1]
+    assert got.output_parameters is prompt.output_parameters
+    assert got.template.output is prompt.template.output
+    assert got.examples[0].output is prompt.examples[0].output
+    assert prompt == Prompt.from_dict(prompt_dict)
+    assert got == Prompt.from_dict(prompt_dict).update(
+        input_parameters=got.input_parameters, template=got.template, examples=got.examples
+    )
+
+
 def test_prompt_rename_input_parameter_invalid(prompt_dict: dict):
     prompt = Prompt.from_dict(prompt_dict)
 
@@ -233,6 +256,22 @@ def test_prompt_rename_output_parameter(prompt_dict: dict):
     assert got.output_parameters[0].description == 'test output parameter description'
 
 
+def test_prompt_rename_output_parameter_shares_unchanged_values(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+
+    got = prompt.rename_output_parameter('test output parameter name', 'test output parameter name 3')
+
+    assert got.template.output == {
+        'test output parameter name 2': 'test output parameter value 2',
+        'test output parameter name 3': 'test output parameter value',
+    }
+    assert got.examples[1].output['test output parameter name 3'] == 'example test output parameter value 3'
+    assert got.input_parameters is prompt.input_parameters
+    assert got.template.input is prompt.template.input
+    assert got.examples[0].input is prompt.examples[0].input
+    assert prompt == Prompt.from_dict(prompt_dict)
+
+
 def test_prompt_validate_template_valid():
     Prompt.model_validate({
     'name': 'test name',
@@ -452,3 +491,96 @@ def test_load_prompt_from_json_string(prompt_dict: dict):
 
     assert prompt.model_dump() == prompt_dict
     assert type(prompt) == Prompt
+
+
+def test_prompt_fingerprint(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+
+    assert prompt.fingerprint() == Prompt.from_dict(prompt_dict).fingerprint()
+    assert prompt.fingerprint() == prompt.copy_me().fingerprint()
+    assert prompt.fingerprint() != prompt.update(description='other description').fingerprint()
+    assert prompt.fingerprint() != prompt.rename_input_parameter('test input parameter name', 'new name').fingerprint()
+
+
+def test_prompt_fingerprint_reset_on_assignment(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+    fingerprint = prompt.fingerprint()
+    prompt.description = 'other description'
+
+    assert prompt.fingerprint() != fingerprint
+
+
+def test_prompt_fingerprint_does_not_affect_equality(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+    prompt.fingerprint()
+
+    assert prompt == Prompt.from_dict(prompt_dict)
+
+
+def test_prompt_fingerprint_unserializable_value(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+    prompt.examples[0].input['test input parameter name'] = object()
+    prompt = prompt.update(examples=prompt.examples)
+
+    assert len(prompt.fingerprint()) == 64
+
+
+def test_frozen_prompt(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+    frozen = prompt.freeze()
+
+    assert isinstance(frozen, FrozenPrompt)
+    assert frozen.fingerprint() == prompt.fingerprint()
+    assert {frozen: 1}[Prompt.from_dict(prompt_dict).freeze()] == 1
+    assert frozen.update(description='other description').description == 'other description'
+
+    with pytest.raises(ValidationError):
+        frozen.description = 'other description'  # type: ignore
+
+    prompt.examples.append(prompt.examples[0])
+    assert len(frozen.examples) == 2
+
+
+def test_prompt_construct_trusted(prompt_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+
+    got = Prompt.construct_trusted(**dict(prompt))
+
+    assert got == prompt
+    assert got.fingerprint() == prompt.fingerprint()
+
+
+def test_prompt_add_examples(prompt_dict: dict, other_example_dict: dict):
+    prompt = Prompt.from_dict(prompt_dict)
+    other_example = IOExample.from_dict(other_example_dict)
+
+    got = prompt.add_examples([other_example])
+
+    assert len(got.examples) == 3
+    assert got.examples[2] is other_example
+    assert len(prompt.examples) == 2
+    assert got.fingerprint() != prompt.fingerprint()
+
+    with pytest.raises(ValueError):
+        prompt.add_examples([IOExample(input={'invalid': 'value'}, output=other_example.output)])
+
+    with pytest.raises(ValueError):
+        prompt.add_examples([IOExample(input=other_example.input, output={'invalid': 'value'})])
+
+
+def test_prompt_with_examples_validates_only_new_examples(prompt_dict: dict, other_example_dict: dict):
+    other_example = IOExample.from_dict(other_example_dict)
+    validated = []
+
+    class RecordingPrompt(Prompt):
+        def validate_examples(self, examples):
+            validated.extend(examples)
+            super().validate_examples(examples)
+
+    prompt = RecordingPrompt.from_dict(prompt_dict)
+    validated.clear()
+
+    got = prompt.with_examples([prompt.examples[1], other_example])
+
+    assert got.examples == [prompt.examples[1], other_example]
+    assert validated == [other_example]
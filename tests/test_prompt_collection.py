@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import pytest
 
+from promptogen.model.prompt import FrozenPrompt
+from promptogen.prompt_collection.lazy_prompt_collection import LazyPromptCollection, save_lazy_prompt_collection
 from promptogen.prompt_collection.prompt_collection import PromptCollection
 from promptogen.prompt_collection.prompts.text_categorizer import TextCategorizerPrompt
 from promptogen.prompt_collection.prompts.text_summarizer import TextSummarizerPrompt
@@ -48,3 +50,85 @@ Prompts Details
 
   TextCategorizer: {c.prompts['TextCategorizer'].description}
 """
+
+
+@pytest.fixture
+def lazy_collection_file(tmp_path):
+    c = PromptCollection(prompts={
+        'TextSummarizer': TextSummarizerPrompt(),
+        'TextCategorizer': TextCategorizerPrompt(),
+    })
+    filename = str(tmp_path / 'prompts.jsonl')
+    save_lazy_prompt_collection(filename, c)
+    return filename, c
+
+
+def test_lazy_prompt_collection_index_only(lazy_collection_file):
+    filename, c = lazy_collection_file
+    lazy = LazyPromptCollection(filename)
+
+    assert lazy.names() == ['TextSummarizer', 'TextCategorizer']
+    assert len(lazy) == 2
+    assert 'TextSummarizer' in lazy
+    assert list(lazy) == lazy.names()
+    assert str(lazy) == str(c)
+    assert lazy.details() == c.details()
+    assert repr(lazy) == "LazyPromptCollection(prompt_names=['TextSummarizer', 'TextCategorizer'])"
+    assert lazy.cache_info().currsize == 0
+    assert lazy.cache_info().misses == 0
+
+
+def test_lazy_prompt_collection_get(lazy_collection_file):
+    filename, c = lazy_collection_file
+    lazy = LazyPromptCollection(filename, cache_size=1)
+
+    prompt = lazy['TextCategorizer']
+    assert isinstance(prompt, FrozenPrompt)
+    assert prompt.to_dict() == c.prompts['TextCategorizer'].to_dict()
+    assert prompt.fingerprint() == c.prompts['TextCategorizer'].fingerprint()
+    assert lazy['TextCategorizer'] is prompt
+    assert lazy.get('Unknown') is None
+
+    with pytest.raises(KeyError):
+        lazy['Unknown']
+
+    lazy['TextSummarizer']
+    assert lazy.cache_info().currsize == 1
+    assert lazy.cache_info().hits == 1
+
+
+def test_lazy_prompt_collection_to_prompt_collection(lazy_collection_file):
+    filename, c = lazy_collection_file
+
+    got = LazyPromptCollection(filename).to_prompt_collection()
+
+    assert {name: p.to_dict() for name, p in got.prompts.items()} == {name: p.to_dict() for name, p in c.prompts.items()}
+
+
+def test_save_lazy_prompt_collection_from_prompts(tmp_path):
+    filename = str(tmp_path / 'prompts.jsonl')
+    save_lazy_prompt_collection(filename, [TextSummarizerPrompt(description='说明 with unicode')])
+
+    lazy = LazyPromptCollection(filename)
+    assert lazy['Summarization'].description == '说明 with unicode'
+
+
+def test_lazy_prompt_collection_rejects_stale_index(lazy_collection_file):
+    filename, _ = lazy_collection_file
+    with open(filename, 'rb') as f:
+        header, data = f.readline(), f.read()
+    fingerprint = TextCategorizerPrompt().fingerprint()
+    with open(filename, 'wb') as f:
+        f.write(header.replace(fingerprint.encode(), b'0' * len(fingerprint)) + data)
+
+    lazy = LazyPromptCollection(filename)
+    lazy['TextSummarizer']
+    with pytest.raises(ValueError, match='does not match'):
+        lazy['TextCategorizer']
+
+
+def test_save_lazy_prompt_collection_rejects_duplicate_names(tmp_path):
+    filename = str(tmp_path / 'prompts.jsonl')
+
+    with pytest.raises(ValueError, match='Duplicate prompt name'):
+        save_lazy_prompt_collection(filename, [TextSummarizerPrompt(), TextSummarizerPrompt()])
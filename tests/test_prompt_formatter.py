@@ -1,7 +1,11 @@
+import copy
+
 import pytest
 from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
+from promptogen.model.output_schema import OutputSchemaError
+from promptogen.model.token_counter import FunctionBasedTokenCounter
 
-from promptogen import JsonPromptFormatter, KeyValuePromptFormatter, PromptFormatter, PromptFormatterInterface
+from promptogen import JsonPromptFormatter, KeyValuePromptFormatter, PromptFormatter, PromptFormatterConfig, PromptFormatterInterface
 from promptogen.prompt_formatter import JsonValueFormatter, KeyValueFormatter
 
 
@@ -198,3 +202,317 @@ def test_key_value_prompt_formatter():
 
     assert type(f.input_formatter) == KeyValueFormatter
     assert type(f.output_formatter) == KeyValueFormatter
+
+
+def test_prompt_formatter_prefix_cache(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    input_value = {
+        'test input parameter name': 'sample value',
+        'test input parameter name 2': 'sample value 2'
+    }
+    frozen = prompt.freeze()
+    first = json_prompt_formatter.format_prompt(frozen, input_value)
+    second = json_prompt_formatter.format_prompt(frozen, {**input_value, 'test input parameter name': 'other value'})
+
+    assert first.startswith(json_prompt_formatter.format_prompt_without_input(prompt))
+    assert 'other value' in second
+    info = json_prompt_formatter.prefix_cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+    assert info.currsize == 1
+
+
+def test_prompt_formatter_prefix_cache_caches_mutable_prompts(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    before = json_prompt_formatter.format_prompt_prefix(prompt)
+    assert json_prompt_formatter.format_prompt_prefix(prompt) == before
+    prompt.description = 'changed description'
+    after = json_prompt_formatter.format_prompt_prefix(prompt)
+
+    assert before != after
+    assert after.startswith('changed description')
+    info = json_prompt_formatter.prefix_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+
+def test_prompt_formatter_prefix_cache_detects_changes(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    frozen = prompt.freeze()
+    before = json_prompt_formatter.format_prompt_prefix(frozen)
+    after = json_prompt_formatter.format_prompt_prefix(frozen.replace(description='changed description'))
+
+    assert before != after
+    assert after.startswith('changed description')
+
+    json_prompt_formatter.config = PromptFormatterConfig(show_template=False)
+    assert 'Template:' not in json_prompt_formatter.format_prompt_prefix(frozen)
+    assert json_prompt_formatter.prefix_cache_info().misses == 3
+
+
+def test_prompt_formatter_caches_detect_in_place_changes(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+
+    before = json_prompt_formatter.format_prompt_prefix(prompt)
+    assert json_prompt_formatter.output_schema(prompt).keys[0] == ('test output parameter name', str)
+
+    prompt.examples.append(prompt.template.update(output={
+        'test output parameter name': 'appended output value',
+        'test output parameter name 2': 'appended output value 2',
+    }))
+    prompt.template.output['test output parameter name'] = 1
+    after = json_prompt_formatter.format_prompt_prefix(prompt)
+
+    assert before != after
+    assert 'appended output value' in after
+    assert json_prompt_formatter.output_schema(prompt).keys[0] == ('test output parameter name', int)
+
+
+def test_prompt_formatter_caches_detect_changes_after_copy(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    trusted = Prompt.construct_trusted(**dict(prompt))
+    frozen = prompt.freeze()
+    json_prompt_formatter.format_prompt_prefix(trusted)
+    json_prompt_formatter.format_prompt_prefix(frozen)
+
+    for copied in [trusted.copy_me(), trusted.model_copy(deep=True), copy.deepcopy(trusted)]:
+        copied.examples.append(prompt.template.update(output={
+            'test output parameter name': 'appended output value',
+            'test output parameter name 2': 'appended output value 2',
+        }))
+        assert 'appended output value' in json_prompt_formatter.format_prompt_prefix(copied)
+        assert 'appended output value' in json_prompt_formatter.format_prompt_prefix(Prompt(**dict(copied)).freeze())
+
+    assert 'appended output value' not in json_prompt_formatter.format_prompt_prefix(frozen)
+    for copied_frozen in [frozen.copy_me(), frozen.model_copy(deep=True), copy.deepcopy(frozen)]:
+        assert copied_frozen.fingerprint() == frozen.fingerprint()
+
+
+def test_prompt_formatter_prefix_cache_disabled(prompt: Prompt):
+    f = PromptFormatter(input_formatter=KeyValueFormatter(), output_formatter=KeyValueFormatter(), prefix_cache_size=0)
+    f.format_prompt_prefix(prompt)
+    f.format_prompt_prefix(prompt)
+
+    assert f.prefix_cache_info().currsize == 0
+    assert f.prefix_cache_info().hits == 0
+
+
+@pytest.mark.parametrize('formatter_class', [JsonPromptFormatter, KeyValuePromptFormatter])
+def test_prompt_formatter_subclasses_prefix_cache_size(formatter_class, prompt: Prompt):
+    f = formatter_class(prefix_cache_size=0)
+    f.format_prompt_prefix(prompt)
+    f.format_prompt_prefix(prompt)
+
+    assert f.prefix_cache_info().maxsize == 0
+    assert f.prefix_cache_info().hits == 0
+    assert formatter_class(prefix_cache_size=2).prefix_cache_info().maxsize == 2
+
+
+def _packed_input(i: int):
+    return {
+        'test input parameter name': f'packed value {i}',
+        'test input parameter name 2': f'packed value {i} 2',
+    }
+
+
+def _packed_output(i: int):
+    return {
+        'test output parameter name': f'output {i}',
+        'test output parameter name 2': f'output {i} 2',
+    }
+
+
+def test_prompt_formatter_format_packed_prompt(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    raw_req = json_prompt_formatter.format_packed_prompt(prompt, [_packed_input(1), _packed_input(2)])
+
+    assert raw_req.startswith(json_prompt_formatter.format_prompt_prefix(prompt))
+    assert 'There are 2 inputs below.' in raw_req
+    assert raw_req.index('Input 1:') < raw_req.index('packed value 1') < raw_req.index('Input 2:')
+    assert raw_req.index('Input 2:') < raw_req.index('packed value 2') < raw_req.index('Output 1:')
+    assert raw_req.endswith('Output 1:')
+
+
+def test_prompt_formatter_format_packed_prompt_invalid(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    with pytest.raises(ValueError):
+        json_prompt_formatter.format_packed_prompt(prompt, [_packed_input(1), {'test input parameter name': 'x'}])
+
+
+@pytest.mark.parametrize('formatter', [JsonPromptFormatter(), KeyValuePromptFormatter()])
+def test_prompt_formatter_parse_packed(formatter: PromptFormatter, prompt: Prompt):
+    outputs = [formatter.output_formatter.format(_packed_output(i)) for i in range(1, 4)]
+    # the echoed "Output 1:" is optional, and outputs may come back in any order
+    raw_resp = f'{outputs[0]}\n\nOutput 3:\n{outputs[2]}\n\nOutput 2:\n{outputs[1]}\n'
+
+    assert formatter.parse_packed(prompt, raw_resp, 3) == [_packed_output(i) for i in range(1, 4)]
+    assert formatter.parse_packed(prompt, 'Output 1:\n' + raw_resp, 3) == [_packed_output(i) for i in range(1, 4)]
+
+
+def test_prompt_formatter_parse_packed_partial_failure(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    output = json_prompt_formatter.output_formatter.format(_packed_output(1))
+    raw_resp = f'Output 1:\n{output}\n\nOutput 2:\nnot json\n'
+
+    results = json_prompt_formatter.parse_packed(prompt, raw_resp, 3)
+
+    assert results[0] == _packed_output(1)
+    assert isinstance(results[1], ValueError)
+    assert isinstance(results[2], ValueError)
+
+
+def _count_calls(counter):
+    calls = []
+
+    def count(text: str) -> int:
+        calls.append(text)
+        return counter(text)
+
+    return count, calls
+
+
+def test_prompt_formatter_example_token_budget(prompt: Prompt):
+    formatter = PromptFormatter(
+        input_formatter=JsonValueFormatter(indent=None),
+        output_formatter=JsonValueFormatter(indent=None),
+        # an example costs one token for its body and one for its heading and separators
+        config=PromptFormatterConfig(example_token_budget=2),
+        token_counter=lambda _: 1,
+    )
+
+    assert formatter.select_examples(prompt.examples) == prompt.examples[:1]
+    formatted = formatter.format_prompt_without_input(prompt)
+    assert 'Example 1:' in formatted
+    assert 'Example 2:' not in formatted
+
+
+def test_prompt_formatter_example_token_budget_skips_examples_that_do_not_fit(prompt: Prompt):
+    long_example = IOExample(
+        input={'test input parameter name': 'x' * 1000, 'test input parameter name 2': 'y'},
+        output={'test output parameter name': 'z', 'test output parameter name 2': 'w'},
+    )
+    prompt = prompt.update(examples=[prompt.examples[0], long_example, prompt.examples[1]])
+    formatter = PromptFormatter(
+        input_formatter=JsonValueFormatter(indent=None),
+        output_formatter=JsonValueFormatter(indent=None),
+        config=PromptFormatterConfig(example_token_budget=4),
+        token_counter=lambda text: 1000 if 'x' * 1000 in text else 1,
+    )
+
+    assert formatter.select_examples(prompt.examples) == [prompt.examples[0], prompt.examples[2]]
+    assert 'x' * 1000 not in formatter.format_prompt_without_input(prompt)
+
+
+def test_prompt_formatter_example_token_counts_are_cached(prompt: Prompt):
+    count, calls = _count_calls(len)
+    formatter = PromptFormatter(
+        input_formatter=JsonValueFormatter(indent=None),
+        output_formatter=JsonValueFormatter(indent=None),
+        config=PromptFormatterConfig(example_token_budget=10000),
+        token_counter=count,
+    )
+
+    formatter.format_prompt_without_input(prompt)
+    formatter.format_prompt_without_input(prompt.update(name='other name'))
+
+    # the bodies of the examples are counted once; the headings and the rendered examples are counted every time
+    assert len([text for text in calls if text.startswith('Input:')]) == len(prompt.examples)
+    assert formatter.example_token_cache.cache_info().hits == len(prompt.examples)
+
+
+def test_prompt_formatter_example_token_budget_counts_headings(prompt: Prompt):
+    formatter = PromptFormatter(
+        input_formatter=JsonValueFormatter(indent=None),
+        output_formatter=JsonValueFormatter(indent=None),
+        token_counter=len,
+    )
+    # enough for the bodies of every example, but not for their headings and separators
+    formatter.config = PromptFormatterConfig(
+        example_token_budget=sum(formatter.example_token_count(e) for e in prompt.examples),
+    )
+
+    selected = formatter.select_examples(prompt.examples)
+
+    assert 0 < len(selected) < len(prompt.examples)
+    assert len(formatter._format_examples(selected)) <= formatter.config.example_token_budget
+
+
+def test_prompt_formatter_example_token_budget_is_part_of_prefix_cache_key(prompt: Prompt):
+    formatter = JsonPromptFormatter()
+    full = formatter.format_prompt_prefix(prompt)
+
+    formatter.config = PromptFormatterConfig(example_token_budget=0)
+
+    assert formatter.format_prompt_prefix(prompt) != full
+    assert 'Example 1:' not in formatter.format_prompt_prefix(prompt)
+
+
+def test_prompt_formatter_count_prompt_tokens(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    json_prompt_formatter.token_counter = FunctionBasedTokenCounter(len)
+    input_value = {
+        'test input parameter name': 'test input parameter value',
+        'test input parameter name 2': 'test input parameter value 2',
+    }
+
+    counts = json_prompt_formatter.count_prompt_tokens(prompt, input_value)
+
+    assert counts.total == len(json_prompt_formatter.format_prompt(prompt, input_value))
+    assert counts.description > len(prompt.description)
+    assert counts.template > 0
+    assert counts.examples == [json_prompt_formatter.example_token_count(e) for e in prompt.examples]
+    assert counts.input == counts.total - len(json_prompt_formatter.format_prompt_without_input(prompt))
+
+    without_input = json_prompt_formatter.count_prompt_tokens(prompt)
+    assert without_input.input == 0
+    assert without_input.total == len(json_prompt_formatter.format_prompt_without_input(prompt))
+
+
+def test_prompt_formatter_count_prompt_tokens_is_memoized(prompt: Prompt):
+    count, calls = _count_calls(len)
+    formatter = JsonPromptFormatter(token_counter=count)
+    input_value = {
+        'test input parameter name': 'test input parameter value',
+        'test input parameter name 2': 'test input parameter value 2',
+    }
+
+    frozen = prompt.freeze()
+    formatter.count_prompt_tokens(frozen, input_value)
+    n = len(calls)
+    formatter.count_prompt_tokens(frozen, input_value)
+
+    # only the input is counted again
+    assert len(calls) == n + 1
+    assert isinstance(formatter.token_counter, FunctionBasedTokenCounter)
+
+
+def test_prompt_formatter_count_prompt_tokens_follows_config(json_prompt_formatter: PromptFormatter, prompt: Prompt):
+    json_prompt_formatter.config = PromptFormatterConfig(show_template=False, example_token_budget=0)
+
+    counts = json_prompt_formatter.count_prompt_tokens(prompt)
+
+    assert counts.template == 0
+    assert counts.examples == []
+
+
+@pytest.fixture
+def typed_prompt(prompt: Prompt) -> Prompt:
+    return prompt.update(
+        output_parameters=[ParameterInfo(name='score', description='score'), ParameterInfo(name='tags', description='tags')],
+        template=prompt.template.update(output={'score': 1, 'tags': ['tag']}),
+        examples=[],
+    )
+
+
+def test_prompt_formatter_parse_validates_output(typed_prompt: Prompt):
+    formatter = JsonPromptFormatter(validate_output=True)
+
+    assert formatter.parse(typed_prompt, '```json\n{"score": "3", "tags": ["a"]}```') == {'score': 3, 'tags': ['a']}
+    with pytest.raises(OutputSchemaError):
+        formatter.parse(typed_prompt, '```json\n{"score": "high", "tags": ["a"]}```')
+
+
+def test_prompt_formatter_parse_does_not_validate_output_by_default(typed_prompt: Prompt):
+    formatter = JsonPromptFormatter()
+
+    assert formatter.parse(typed_prompt, '```json\n{"score": "high", "tags": [1]}```') == {'score': 'high', 'tags': [1]}
+    assert formatter.parse(typed_prompt, '```json\n{"score": true, "tags": []}```') == {'score': True, 'tags': []}
+    assert KeyValuePromptFormatter().parse(typed_prompt, 'score: "high"\ntags: [1]') == {'score': 'high', 'tags': [1]}
+
+
+def test_prompt_formatter_incremental_parser_validates_each_value(typed_prompt: Prompt):
+    parser = JsonPromptFormatter(validate_output=True).incremental_parser(typed_prompt)
+
+    assert parser.feed('```json\n{"score": 2.0,') == [('score', 2)]
+    with pytest.raises(OutputSchemaError):
+        parser.feed(' "tags": 1}')
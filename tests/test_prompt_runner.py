@@ -1,16 +1,31 @@
+import asyncio
+import re
+import threading
+import time
 from typing import List, Tuple
 from pydantic import BaseModel
 import pytest
-from promptogen.model.llm import FunctionBasedTextLLM
-from promptogen.model.prompt import Prompt
+from promptogen.evaluation import StubTextLLM
+from promptogen.model.llm import (
+    AsyncTextLLMAdapter,
+    FunctionBasedAsyncTextLLM,
+    FunctionBasedStreamingTextLLM,
+    FunctionBasedTextLLM,
+)
+from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
 from promptogen.model.prompt_interceptor import PromptInterceptor
-from promptogen.model.prompt_runner import TextLLMPromptRunner
-from promptogen.model.value_formatter import Value
+from promptogen.model.prompt_runner import AsyncTextLLMPromptRunner, TextLLMPromptRunner
+from promptogen.model.response_cache import CachedResponse, response_cache_key
+from promptogen.model.hedging_policy import HedgingPolicy, HedgingStats
+from promptogen.model.retry_policy import RetryPolicy, RetryStats
+from promptogen.model.token_counter import PromptTooLargeError
+from promptogen.model.value_formatter import OutputFormatError, Value
 from promptogen.prompt_collection.prompts.text_summarizer import TextSummarizerPrompt
 
-from promptogen.prompt_formatter import JsonValueFormatter, KeyValueFormatter
+from promptogen.prompt_formatter import JsonPromptFormatter, JsonValueFormatter, KeyValueFormatter
 from promptogen.prompt_formatter.key_value_formatter import KeyValuePromptFormatter
 from promptogen.prompt_interceptor.translation_interceptor import ValueTranslationInterceptor
+from promptogen.response_cache import InMemoryResponseCache
 
 
 @pytest.fixture
@@ -66,3 +81,922 @@ def test_llm_prompt_runner_run_prompt_interceptors():
     })
 
     assert resp['summary'] == 'translated text'
+
+
+def test_async_llm_prompt_runner_arun_prompt():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+
+    async def agenerate(_: str) -> str:
+        return 'summary: sample response returned by the LLM'
+
+    prompt_runner = AsyncTextLLMPromptRunner(llm=FunctionBasedAsyncTextLLM(agenerate), formatter=formatter)
+
+    resp = asyncio.run(prompt_runner.arun_prompt(prompt, {
+        'text': "This is a sample text to summarize.",
+    }))
+
+    assert resp['summary'] == 'sample response returned by the LLM'
+
+
+def test_async_llm_prompt_runner_wraps_sync_llm():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    llm = FunctionBasedTextLLM(lambda _: 'summary: sample response returned by the LLM')
+    prompt_runner = AsyncTextLLMPromptRunner(llm=llm, formatter=formatter)
+
+    assert isinstance(prompt_runner.async_text_llm, AsyncTextLLMAdapter)
+
+    async def run_many():
+        return await asyncio.gather(*[
+            prompt_runner.arun_prompt(prompt, {'text': f'text {i}'}) for i in range(10)
+        ])
+
+    resps = asyncio.run(run_many())
+
+    assert [resp['summary'] for resp in resps] == ['sample response returned by the LLM'] * 10
+
+
+def test_async_llm_prompt_runner_interceptors():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    llm = FunctionBasedTextLLM(lambda s: 'summary: ' + ('translated text' if 'translated text' in s else 'original text'))
+
+    class TestInterceptor(PromptInterceptor):
+        def before_run(self, _: Prompt, input_value: Value) -> Value:
+            raise AssertionError('sync hook must not be called')
+
+        def after_run(self, _: Prompt, output_value: Value) -> Value:
+            raise AssertionError('sync hook must not be called')
+
+        async def abefore_run(self, _: Prompt, input_value: Value) -> Value:
+            return {'text': 'translated text'}
+
+        async def aafter_run(self, _: Prompt, output_value: Value) -> Value:
+            return {'summary': output_value['summary'] + ' (after)'}
+
+    prompt_runner = AsyncTextLLMPromptRunner(llm=llm, formatter=formatter, interceptors=[TestInterceptor()])
+
+    resp = asyncio.run(prompt_runner.arun_prompt(prompt, {'text': 'original text'}))
+
+    assert resp['summary'] == 'translated text (after)'
+
+
+def test_async_text_llm_adapter_invalid():
+    with pytest.raises(TypeError):
+        AsyncTextLLMAdapter(object())  # type: ignore
+
+    with pytest.raises(ValueError):
+        AsyncTextLLMAdapter(FunctionBasedTextLLM(lambda s: s), max_workers=0)
+
+
+def _echo_llm_func(s: str) -> str:
+    text = s.split('Input:\n')[-1].split('\nOutput:')[0]
+    if 'fail' in text:
+        raise RuntimeError('LLM failed')
+    return f'summary: {text[len("text: "):]}'
+
+
+def test_llm_prompt_runner_run_prompt_batch():
+    prompt = TextSummarizerPrompt().freeze()
+    formatter = KeyValuePromptFormatter()
+    prompt_runner = TextLLMPromptRunner(llm=FunctionBasedTextLLM(_echo_llm_func), formatter=formatter)
+
+    resps = prompt_runner.run_prompt_batch(prompt, [{'text': f'text {i}'} for i in range(20)], max_concurrency=4)
+
+    assert resps == [{'summary': f'text {i}'} for i in range(20)]
+    assert formatter.prefix_cache_info().misses == 1
+
+
+def test_llm_prompt_runner_run_prompt_batch_exceptions():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    prompt_runner = TextLLMPromptRunner(llm=FunctionBasedTextLLM(_echo_llm_func), formatter=formatter)
+    input_values = [{'text': 'a'}, {'text': 'fail'}, {'text': 'c'}]
+
+    resps = prompt_runner.run_prompt_batch(prompt, input_values)
+
+    assert resps[0] == {'summary': 'a'}
+    assert isinstance(resps[1], RuntimeError)
+    assert resps[2] == {'summary': 'c'}
+
+    with pytest.raises(RuntimeError):
+        prompt_runner.run_prompt_batch(prompt, input_values, return_exceptions=False)
+
+    with pytest.raises(ValueError):
+        prompt_runner.run_prompt_batch(prompt, input_values, max_concurrency=0)
+
+
+def test_async_llm_prompt_runner_arun_prompt_batch():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    in_flight = 0
+    max_in_flight = 0
+
+    async def agenerate(s: str) -> str:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return _echo_llm_func(s)
+
+    prompt_runner = AsyncTextLLMPromptRunner(llm=FunctionBasedAsyncTextLLM(agenerate), formatter=formatter)
+    input_values = [{'text': f'text {i}'} for i in range(20)] + [{'text': 'fail'}]
+
+    resps = asyncio.run(prompt_runner.arun_prompt_batch(prompt, input_values, max_concurrency=3))
+
+    assert resps[:20] == [{'summary': f'text {i}'} for i in range(20)]
+    assert isinstance(resps[20], RuntimeError)
+    assert max_in_flight == 3
+
+
+def test_async_llm_prompt_runner_arun_prompt_batch_cancels_pending_on_error():
+    prompt = TextSummarizerPrompt()
+    started: List[str] = []
+    cancelled: List[str] = []
+
+    async def agenerate(s: str) -> str:
+        started.append(s)
+        if 'fail' in s:
+            raise RuntimeError('LLM failed')
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(s)
+            raise
+        return _echo_llm_func(s)
+
+    prompt_runner = AsyncTextLLMPromptRunner(llm=FunctionBasedAsyncTextLLM(agenerate), formatter=KeyValuePromptFormatter())
+    input_values = [{'text': 'text 0'}, {'text': 'fail'}] + [{'text': f'text {i}'} for i in range(2, 10)]
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await prompt_runner.arun_prompt_batch(prompt, input_values, max_concurrency=2, return_exceptions=False)
+        # no task is left running in the background
+        assert len(asyncio.all_tasks()) == 1
+
+    start = time.monotonic()
+    asyncio.run(main())
+
+    assert time.monotonic() - start < 0.5
+    # the inputs that got a slot before the failure was seen are cancelled, the others never start
+    assert len(started) <= 3
+    assert len(cancelled) == len(started) - 1
+
+
+def _packed_echo_llm_func(s: str) -> str:
+    if 'There are ' not in s:
+        return _echo_llm_func(s)
+    packed = s.split('--------\n')[-1]
+    outputs = []
+    for i, text in re.findall(r'^Input (\d+):\ntext: (.*)$', packed, re.MULTILINE):
+        if 'skip' not in text:
+            outputs.append(f'Output {i}:\nsummary: {text}')
+    return '\n\n'.join(outputs)
+
+
+def test_llm_prompt_runner_run_prompt_packed():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    requests: List[str] = []
+
+    def generate(s: str) -> str:
+        requests.append(s)
+        return _packed_echo_llm_func(s)
+
+    prompt_runner = TextLLMPromptRunner(llm=FunctionBasedTextLLM(generate), formatter=formatter)
+    input_values = [{'text': f'text {i}'} for i in range(25)]
+
+    resps = prompt_runner.run_prompt_packed(prompt, input_values, pack_size=10, max_concurrency=2)
+
+    assert resps == [{'summary': f'text {i}'} for i in range(25)]
+    assert len(requests) == 3
+    individual = [formatter.format_prompt(prompt, input_value) for input_value in input_values]
+    assert sum(map(len, requests)) < sum(map(len, individual)) / 3
+
+
+def test_llm_prompt_runner_run_prompt_packed_fallback():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    requests: List[str] = []
+
+    def generate(s: str) -> str:
+        requests.append(s)
+        if 'There are ' in s and 'pack fail' in s:
+            raise RuntimeError('LLM failed')
+        return _packed_echo_llm_func(s)
+
+    prompt_runner = TextLLMPromptRunner(llm=FunctionBasedTextLLM(generate), formatter=formatter)
+    input_values = [{'text': 'a'}, {'text': 'skip b'}, {'text': 'fail'}, {'text': 'pack fail'}, {'text': 'e'}]
+
+    resps = prompt_runner.run_prompt_packed(prompt, input_values, pack_size=3)
+
+    # the missing output falls back to an individual call, but the error of a failed pack is not retried per input
+    assert resps[0] == {'summary': 'a'}
+    assert resps[1] == {'summary': 'skip b'}
+    assert resps[2] == {'summary': 'fail'}
+    assert isinstance(resps[3], RuntimeError)
+    assert resps[4] is resps[3]
+    assert len(requests) == 2 + 1
+
+    with pytest.raises(RuntimeError):
+        prompt_runner.run_prompt_packed(prompt, input_values, pack_size=3, return_exceptions=False)
+
+    with pytest.raises(ValueError):
+        prompt_runner.run_prompt_packed(prompt, input_values, pack_size=0)
+
+
+class _RecordingInterceptor(PromptInterceptor):
+    def __init__(self):
+        self.inputs: List[str] = []
+
+    def before_run(self, _: Prompt, input_value: Value) -> Value:
+        self.inputs.append(input_value['text'])
+        return input_value
+
+    def after_run(self, _: Prompt, output_value: Value) -> Value:
+        return output_value
+
+
+def test_llm_prompt_runner_run_prompt_packed_retries_transport_errors():
+    prompt = TextSummarizerPrompt()
+    llm, requests = _flaky_llm([ConnectionError('reset'), ConnectionError('reset'), ConnectionError('reset')])
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm, formatter=KeyValuePromptFormatter(), retry_policy=RetryPolicy(max_attempts=2, initial_backoff=0)
+    )
+
+    resps = prompt_runner.run_prompt_packed(prompt, [{'text': 'a'}, {'text': 'b'}])
+
+    assert [type(resp) for resp in resps] == [ConnectionError, ConnectionError]
+    assert len(requests) == 2
+    assert prompt_runner.retry_stats() == RetryStats(attempts=2, transport_retries=1, failures=1)
+
+
+def test_llm_prompt_runner_run_prompt_packed_falls_back_when_too_large():
+    prompt = TextSummarizerPrompt()
+    requests: List[str] = []
+
+    def generate(s: str) -> str:
+        requests.append(s)
+        if 'There are ' in s:
+            raise PromptTooLargeError(1000, 100)
+        return _packed_echo_llm_func(s)
+
+    prompt_runner = TextLLMPromptRunner(llm=FunctionBasedTextLLM(generate), formatter=KeyValuePromptFormatter())
+
+    resps = prompt_runner.run_prompt_packed(prompt, [{'text': 'a'}, {'text': 'b'}])
+
+    assert resps == [{'summary': 'a'}, {'summary': 'b'}]
+    assert len(requests) == 1 + 2
+
+
+def test_llm_prompt_runner_run_prompt_packed_intercepts_once():
+    interceptor = _RecordingInterceptor()
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(_packed_echo_llm_func),
+        formatter=KeyValuePromptFormatter(),
+        interceptors=[interceptor],
+    )
+
+    resps = prompt_runner.run_prompt_packed(TextSummarizerPrompt(), [{'text': 'a'}, {'text': 'skip b'}])
+
+    assert resps == [{'summary': 'a'}, {'summary': 'skip b'}]
+    assert interceptor.inputs == ['a', 'skip b']
+
+    interceptor.inputs.clear()
+    asyncio.run(AsyncTextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(_packed_echo_llm_func),
+        formatter=KeyValuePromptFormatter(),
+        interceptors=[interceptor],
+    ).arun_prompt_packed(TextSummarizerPrompt(), [{'text': 'a'}, {'text': 'skip b'}]))
+
+    assert interceptor.inputs == ['a', 'skip b']
+
+
+def test_async_llm_prompt_runner_arun_prompt_packed():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    requests: List[str] = []
+
+    async def agenerate(s: str) -> str:
+        requests.append(s)
+        await asyncio.sleep(0.001)
+        return _packed_echo_llm_func(s)
+
+    prompt_runner = AsyncTextLLMPromptRunner(llm=FunctionBasedAsyncTextLLM(agenerate), formatter=formatter)
+    input_values = [{'text': f'text {i}'} for i in range(7)] + [{'text': 'skip'}, {'text': 'fail'}]
+
+    resps = asyncio.run(prompt_runner.arun_prompt_packed(prompt, input_values, pack_size=4))
+
+    assert resps[:8] == [{'summary': f'text {i}'} for i in range(7)] + [{'summary': 'skip'}]
+    assert isinstance(resps[8], RuntimeError)
+    # 3 packs, of which the last one has a single input, plus the fallback of the skipped input
+    assert len(requests) == 4
+
+    async def failing_agenerate(s: str) -> str:
+        requests.append(s)
+        raise RuntimeError('LLM failed')
+
+    requests.clear()
+    prompt_runner = AsyncTextLLMPromptRunner(llm=FunctionBasedAsyncTextLLM(failing_agenerate), formatter=formatter)
+    resps = asyncio.run(prompt_runner.arun_prompt_packed(prompt, input_values[:4], pack_size=4))
+
+    # the error of the pack is the result of each of its inputs, without individual calls
+    assert [type(resp) for resp in resps] == [RuntimeError] * 4
+    assert len(requests) == 1
+
+
+def test_llm_prompt_runner_max_prompt_tokens():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    llm = StubTextLLM(_echo_llm_func)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=formatter,
+        max_prompt_tokens=formatter.token_counter.count(formatter.format_prompt(prompt, {'text': 'short'})),
+    )
+
+    assert prompt_runner.run_prompt(prompt, {'text': 'short'}) == {'summary': 'short'}
+    with pytest.raises(PromptTooLargeError):
+        prompt_runner.run_prompt(prompt, {'text': 'long ' * 100})
+    with pytest.raises(PromptTooLargeError):
+        list(prompt_runner.run_prompt_stream(prompt, {'text': 'long ' * 100}))
+    assert llm.calls == 1
+
+
+def test_async_llm_prompt_runner_max_prompt_tokens():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    llm = StubTextLLM(_echo_llm_func)
+    prompt_runner = AsyncTextLLMPromptRunner(llm=llm, formatter=formatter, max_prompt_tokens=1)
+
+    with pytest.raises(PromptTooLargeError):
+        asyncio.run(prompt_runner.arun_prompt(prompt, {'text': 'short'}))
+    assert llm.calls == 0
+
+
+def test_llm_prompt_runner_run_prompt_packed_max_prompt_tokens():
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+    llm = StubTextLLM(_packed_echo_llm_func)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=formatter,
+        max_prompt_tokens=formatter.count_prompt_tokens(prompt, {'text': 'text 0'}).total,
+    )
+
+    resps = prompt_runner.run_prompt_packed(prompt, [{'text': f'text {i}'} for i in range(3)])
+
+    # the packed prompt is too large, so each input is run on its own
+    assert resps == [{'summary': f'text {i}'} for i in range(3)]
+    assert llm.calls == 3
+
+
+@pytest.mark.parametrize('cache_parsed_value', [False, True])
+def test_llm_prompt_runner_cache(cache_parsed_value: bool):
+    prompt = TextSummarizerPrompt()
+    calls = []
+
+    def generate(s: str) -> str:
+        calls.append(s)
+        return f'summary: response {len(calls)}'
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(generate),
+        formatter=KeyValuePromptFormatter(),
+        cache=InMemoryResponseCache(),
+        cache_parsed_value=cache_parsed_value,
+    )
+
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'response 1'}
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'response 1'}
+    assert prompt_runner.run_prompt(prompt, {'text': 'b'}) == {'summary': 'response 2'}
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}, bypass_cache=True) == {'summary': 'response 3'}
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'response 3'}
+    assert len(calls) == 3
+
+
+def test_llm_prompt_runner_cache_skips_unparseable_responses():
+    prompt = TextSummarizerPrompt()
+    responses = iter(['invalid response', 'summary: valid response'])
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(lambda _: next(responses)),
+        formatter=KeyValuePromptFormatter(),
+        cache=InMemoryResponseCache(),
+    )
+
+    with pytest.raises(ValueError):
+        prompt_runner.run_prompt(prompt, {'text': 'a'})
+
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'valid response'}
+
+
+def test_llm_prompt_runner_cache_replaces_unparseable_entry():
+    prompt = TextSummarizerPrompt()
+    llm = StubTextLLM(lambda _: 'summary: fresh response')
+    cache = InMemoryResponseCache()
+    prompt_runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter(), cache=cache)
+    key = response_cache_key(llm, prompt_runner.formatter.format_prompt(prompt, {'text': 'a'}))
+    cache.set(key, CachedResponse(raw_response='no longer parseable'))
+
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'fresh response'}
+    assert cache.get(key).raw_response == 'summary: fresh response'  # type: ignore
+    assert prompt_runner.run_prompt(prompt, {'text': 'a'}) == {'summary': 'fresh response'}
+    assert llm.calls == 1
+
+
+def test_llm_prompt_runner_run_prompt_stream():
+    prompt = TextSummarizerPrompt().update(
+        output_parameters=[
+            ParameterInfo(name='summary', description='summary'),
+            ParameterInfo(name='keywords', description='keywords'),
+        ],
+        template=IOExample(input={'text': 'text'}, output={'summary': 'summary', 'keywords': ['keyword']}),
+        examples=[],
+    )
+    output = """summary: 'a summary'
+keywords: ['a', 'b']"""
+    llm = FunctionBasedStreamingTextLLM(lambda _: [output[i:i + 5] for i in range(0, len(output), 5)])
+
+    class TestInterceptor(PromptInterceptor):
+        def before_run(self, _: Prompt, input_value: Value) -> Value:
+            return input_value
+
+        def after_run(self, _: Prompt, output_value: Value) -> Value:
+            return {**output_value, 'summary': output_value['summary'].upper()}
+
+    prompt_runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter(), interceptors=[TestInterceptor()])
+
+    resps = list(prompt_runner.run_prompt_stream(prompt, {'text': 'text'}))
+
+    assert resps == [
+        {'summary': 'a summary'},
+        {'summary': 'A SUMMARY', 'keywords': ['a', 'b']},
+    ]
+    assert llm.generate('') == output
+
+
+def test_llm_prompt_runner_run_prompt_stream_non_streaming_llm():
+    prompt = TextSummarizerPrompt()
+    llm = FunctionBasedTextLLM(lambda _: 'summary: sample response returned by the LLM')
+    prompt_runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter(), cache=InMemoryResponseCache())
+
+    assert list(prompt_runner.run_prompt_stream(prompt, {'text': 'text'})) == [
+        {'summary': 'sample response returned by the LLM'},
+    ]
+    assert list(prompt_runner.run_prompt_stream(prompt, {'text': 'text'})) == [
+        {'summary': 'sample response returned by the LLM'},
+    ]
+    assert prompt_runner.cache.cache_info().hits == 1  # type: ignore
+
+
+def test_llm_prompt_runner_run_prompt_stream_aborts_unparseable_output():
+    prompt = TextSummarizerPrompt()
+    produced = []
+    closed = False
+
+    def generate_stream(_: str):
+        nonlocal closed
+        try:
+            for chunk in ['Sure', '! Here', ' is the', ' summary', ' in JSON']:
+                produced.append(chunk)
+                yield chunk
+        finally:
+            closed = True
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedStreamingTextLLM(generate_stream),
+        formatter=JsonPromptFormatter(),
+    )
+
+    with pytest.raises(OutputFormatError):
+        list(prompt_runner.run_prompt_stream(prompt, {'text': 'text'}))
+
+    assert produced == ['Sure']
+    assert closed
+
+
+def _flaky_llm(responses):
+    """Return an LLM that raises or returns the given responses in order, and the list of requests it received."""
+    requests = []
+
+    def generate(raw_req: str) -> str:
+        requests.append(raw_req)
+        resp = responses[len(requests) - 1]
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    return FunctionBasedTextLLM(generate), requests
+
+
+def test_llm_prompt_runner_retry():
+    llm, requests = _flaky_llm([
+        ConnectionError('reset'),
+        'not a key-value output',
+        'summary: sample response returned by the LLM',
+    ])
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(max_attempts=3, initial_backoff=0),
+    )
+
+    resp = prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert resp == {'summary': 'sample response returned by the LLM'}
+    assert len(requests) == 3
+    assert len(set(requests)) == 1
+    assert prompt_runner.retry_stats() == RetryStats(attempts=3, transport_retries=1, parse_retries=1, failures=0)
+
+
+def test_llm_prompt_runner_retry_gives_up():
+    llm, requests = _flaky_llm([ConnectionError('reset')] * 5)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(max_attempts=2, initial_backoff=0),
+    )
+
+    with pytest.raises(ConnectionError):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert len(requests) == 2
+    assert prompt_runner.retry_stats() == RetryStats(attempts=2, transport_retries=1, parse_retries=0, failures=1)
+
+
+def test_llm_prompt_runner_retry_disabled_cause():
+    llm, requests = _flaky_llm(['not a key-value output'] * 3)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(retry_on_parse_error=False, initial_backoff=0),
+    )
+
+    with pytest.raises(ValueError):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert len(requests) == 1
+
+
+def test_llm_prompt_runner_retry_ignores_unlisted_errors():
+    llm, requests = _flaky_llm([KeyError('bug')] * 3)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(transport_errors=(ConnectionError,), initial_backoff=0),
+    )
+
+    with pytest.raises(KeyError):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert len(requests) == 1
+
+
+def test_llm_prompt_runner_retry_policy_only_retries_transient_errors_by_default():
+    llm, requests = _flaky_llm([RuntimeError('bug')] * 3)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(initial_backoff=0),
+    )
+
+    with pytest.raises(RuntimeError):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert len(requests) == 1
+
+
+@pytest.mark.parametrize('error', [TypeError('bad argument'), PromptTooLargeError(10, 1)])
+def test_llm_prompt_runner_never_retries_some_errors(error: Exception):
+    llm, requests = _flaky_llm([error] * 3)
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(initial_backoff=0, transport_errors=(Exception,)),
+    )
+
+    with pytest.raises(type(error)):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert len(requests) == 1
+
+
+def test_llm_prompt_runner_without_retry_policy():
+    llm, requests = _flaky_llm([ConnectionError('reset'), 'summary: ok'])
+    prompt_runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter())
+
+    with pytest.raises(ConnectionError):
+        prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+
+    assert prompt_runner.retry_stats() == RetryStats(attempts=1, failures=1)
+
+
+def test_async_llm_prompt_runner_retry():
+    responses = [TimeoutError(), 'summary: ok']
+    calls = []
+
+    async def agenerate(_: str) -> str:
+        calls.append(1)
+        resp = responses[len(calls) - 1]
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    prompt_runner = AsyncTextLLMPromptRunner(
+        llm=FunctionBasedAsyncTextLLM(agenerate),
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(initial_backoff=0),
+    )
+
+    resp = asyncio.run(prompt_runner.arun_prompt(TextSummarizerPrompt(), {'text': 'text'}))
+
+    assert resp == {'summary': 'ok'}
+    assert prompt_runner.retry_stats().transport_retries == 1
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(initial_backoff=1, backoff_multiplier=2, max_backoff=5, jitter=0)
+
+    assert [policy.backoff(n) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+
+    policy = RetryPolicy(initial_backoff=1, jitter=0.5)
+
+    assert all(0.5 <= policy.backoff(1) <= 1 for _ in range(100))
+
+
+def test_retry_policy_next_delay():
+    policy = RetryPolicy(max_attempts=3, initial_backoff=1, jitter=0, deadline=10)
+
+    assert policy.next_delay(1, 'transport', elapsed=0) == 1
+    assert policy.next_delay(2, 'parse', elapsed=0) == 2
+    assert policy.next_delay(3, 'parse', elapsed=0) is None
+    assert policy.next_delay(1, 'transport', elapsed=9.5) is None
+    assert RetryPolicy(retry_on_transport_error=False).next_delay(1, 'transport', elapsed=0) is None
+
+
+def test_llm_prompt_runner_hedging_fast_response_is_not_hedged():
+    llm, requests = _flaky_llm(['summary: ok'])
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=1),
+    )
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+    assert len(requests) == 1
+    assert prompt_runner.hedging_stats() == HedgingStats(requests=1)
+
+
+def test_llm_prompt_runner_hedging_alternate_llm_wins():
+    release = threading.Event()
+
+    def slow(_: str) -> str:
+        release.wait(timeout=5)
+        return 'summary: slow'
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(slow),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+        hedge_llm=FunctionBasedTextLLM(lambda _: 'summary: fast'),
+    )
+
+    resp = prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'})
+    release.set()
+    time.sleep(0.05)
+
+    assert resp == {'summary': 'fast'}
+    stats = prompt_runner.hedging_stats()
+    assert stats.requests == 1
+    assert stats.hedges == 1
+    assert stats.hedge_wins == 1
+    assert stats.extra_input_tokens > 0
+    # the losing call ran to completion, as the LLM does not stream
+    assert stats.extra_output_tokens > 0
+    assert stats.cancelled == 0
+
+
+def test_llm_prompt_runner_hedging_caches_win_under_hedge_llm():
+    release = threading.Event()
+    primary_calls = []
+
+    def slow(_: str) -> str:
+        primary_calls.append(1)
+        release.wait(timeout=5)
+        return 'summary: slow'
+
+    llm = FunctionBasedTextLLM(slow, identity='model-a')
+    hedge_llm = FunctionBasedTextLLM(lambda _: 'summary: fast', identity='model-b')
+    cache = InMemoryResponseCache()
+    prompt = TextSummarizerPrompt()
+    prompt_runner = TextLLMPromptRunner(
+        llm=llm,
+        formatter=KeyValuePromptFormatter(),
+        cache=cache,
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+        hedge_llm=hedge_llm,
+    )
+
+    assert prompt_runner.run_prompt(prompt, {'text': 'text'}) == {'summary': 'fast'}
+    release.set()
+    prompt_runner.close()
+
+    raw_req = prompt_runner.formatter.format_prompt(prompt, {'text': 'text'})
+    assert cache.get(response_cache_key(llm, raw_req)) is None
+    assert cache.get(response_cache_key(hedge_llm, raw_req)).raw_response == 'summary: fast'  # type: ignore
+
+    # the answer of the hedge LLM is never served as an answer of the primary LLM
+    unhedged_runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter(), cache=cache)
+    assert unhedged_runner.run_prompt(prompt, {'text': 'text'}) == {'summary': 'slow'}
+    assert len(primary_calls) == 2
+
+
+def test_llm_prompt_runner_hedging_delay_excludes_queueing():
+    def llm(_: str) -> str:
+        time.sleep(0.05)
+        return 'summary: ok'
+
+    with TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(llm),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.2),
+        max_concurrency=1,
+    ) as prompt_runner:
+        # a saturated pool: most primary calls wait longer than the hedge delay before they start
+        resps = prompt_runner.run_prompt_batch(TextSummarizerPrompt(), [{'text': 'text'}] * 16, max_concurrency=16)
+
+    assert resps == [{'summary': 'ok'}] * 16
+    assert prompt_runner.hedging_stats() == HedgingStats(requests=16)
+
+
+def test_llm_prompt_runner_hedging_saturated_pool_runs_unhedged():
+    release = threading.Event()
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(lambda _: 'summary: ok'),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.05),
+        max_concurrency=1,
+    )
+    # every worker of the pool is busy until the end of the test
+    blockers = [prompt_runner._hedge_pool().submit(release.wait, 5) for _ in range(2)]
+
+    try:
+        assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+    finally:
+        release.set()
+        prompt_runner.close()
+
+    assert all(blocker.result() for blocker in blockers)
+    assert prompt_runner.hedging_stats() == HedgingStats(requests=1)
+
+
+def test_llm_prompt_runner_hedging_reads_back_hedge_wins():
+    release = threading.Event()
+    primary_calls = []
+
+    def slow(_: str) -> str:
+        primary_calls.append(1)
+        release.wait(timeout=5)
+        return 'summary: slow'
+
+    cache = InMemoryResponseCache()
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(slow, identity='model-a'),
+        formatter=KeyValuePromptFormatter(),
+        cache=cache,
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+        hedge_llm=FunctionBasedTextLLM(lambda _: 'summary: fast', identity='model-b'),
+    )
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'fast'}
+    release.set()
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'fast'}
+    prompt_runner.close()
+
+    assert len(primary_calls) == 1
+    assert cache.cache_info().currsize == 1
+
+
+def test_llm_prompt_runner_hedging_after_close():
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(lambda _: 'summary: ok'),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=1),
+        max_concurrency=2,
+    )
+    prompt_runner.close()
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+    assert prompt_runner._hedge_executor is not None
+    assert prompt_runner._hedge_executor._max_workers == 4
+    prompt_runner.close()
+    prompt_runner.close()
+
+    # a closed runner starts a new thread pool for the next hedged call
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+    prompt_runner.close()
+
+    with pytest.raises(ValueError):
+        TextLLMPromptRunner(llm=FunctionBasedTextLLM(lambda _: ''), formatter=KeyValuePromptFormatter(), max_concurrency=0)
+
+
+def test_llm_prompt_runner_hedging_takes_first_parseable_response():
+    def slow_but_valid(_: str) -> str:
+        time.sleep(0.1)
+        return 'summary: valid'
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(slow_but_valid),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+        hedge_llm=FunctionBasedTextLLM(lambda _: 'not a key-value output'),
+    )
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'valid'}
+    assert prompt_runner.hedging_stats().hedge_wins == 0
+
+
+def test_llm_prompt_runner_hedging_cancels_streaming_loser():
+    stopped = threading.Event()
+
+    def slow_stream(_: str):
+        try:
+            yield 'summary: '
+            for _ in range(100):
+                time.sleep(0.01)
+                yield 'slow '
+        finally:
+            stopped.set()
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedStreamingTextLLM(slow_stream),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.03),
+        hedge_llm=FunctionBasedTextLLM(lambda _: 'summary: fast'),
+    )
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'fast'}
+    assert stopped.wait(timeout=1)
+    time.sleep(0.02)
+    assert prompt_runner.hedging_stats().cancelled == 1
+
+
+def test_llm_prompt_runner_hedging_both_fail_with_retry():
+    llm, requests = _flaky_llm([ConnectionError('1'), ConnectionError('2'), 'summary: ok', 'summary: ok'])
+
+    def slow(raw_req: str) -> str:
+        time.sleep(0.05)
+        return llm.generate(raw_req)
+
+    prompt_runner = TextLLMPromptRunner(
+        llm=FunctionBasedTextLLM(slow),
+        formatter=KeyValuePromptFormatter(),
+        retry_policy=RetryPolicy(initial_backoff=0),
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+    )
+
+    assert prompt_runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+    assert prompt_runner.retry_stats().transport_retries == 1
+
+
+def test_async_llm_prompt_runner_hedging_cancels_loser():
+    cancelled = []
+
+    async def slow(_: str) -> str:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return 'summary: slow'
+
+    async def fast(_: str) -> str:
+        return 'summary: fast'
+
+    prompt_runner = AsyncTextLLMPromptRunner(
+        llm=FunctionBasedAsyncTextLLM(slow),
+        formatter=KeyValuePromptFormatter(),
+        hedging_policy=HedgingPolicy(initial_delay=0.01),
+        hedge_llm=FunctionBasedAsyncTextLLM(fast),
+    )
+
+    async def main():
+        resp = await prompt_runner.arun_prompt(TextSummarizerPrompt(), {'text': 'text'})
+        await asyncio.sleep(0)
+        return resp
+
+    assert asyncio.run(main()) == {'summary': 'fast'}
+    assert cancelled == [1]
+    stats = prompt_runner.hedging_stats()
+    assert (stats.hedges, stats.hedge_wins, stats.cancelled) == (1, 1, 1)
+
+
+def test_hedging_policy_delay():
+    policy = HedgingPolicy(percentile=90, min_samples=10, initial_delay=0.5, min_delay=0.05, max_delay=1)
+
+    assert policy.hedge_delay([0.1] * 9) == 0.5
+    assert policy.hedge_delay([i / 100 for i in range(1, 101)]) == 0.9
+    assert policy.hedge_delay([0.01] * 20) == 0.05
+    assert policy.hedge_delay([5.0] * 20) == 1
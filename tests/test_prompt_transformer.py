@@ -4,6 +4,7 @@ import pytest
 from promptogen.model.llm import FunctionBasedTextLLM
 from promptogen.model.prompt import IOExample, ParameterInfo, Prompt
 from promptogen.model.reasoning_extractor import ExampleReasoning
+from promptogen.prompt_formatter import JsonPromptFormatter
 from promptogen.prompt_tool.transformation.prompt_with_reasoning import PromptWithReasoningTransformer
 from promptogen.prompt_tool.understanding.llm_reasoning_extractor import TextLLMReasoningExtractor, ReasoningGeneratorPromptTransformer
 
@@ -68,6 +69,16 @@ def test_reasoning_generator_prompt_transformer_transform_prompt(prompt: Prompt)
     assert reasoning_prompt.output_parameters == [ParameterInfo(name='reasoning', description='Reasoning for the output')]
     assert len(reasoning_prompt.examples) == 0
 
+    # the returned prompt is a validated, ordinary prompt that callers may change
+    assert Prompt.from_dict(reasoning_prompt.to_dict()) == reasoning_prompt
+    formatter = JsonPromptFormatter()
+    formatter.format_prompt_prefix(reasoning_prompt)
+    reasoning_prompt.examples.append(IOExample(
+        input={**prompt.template.input, **prompt.template.output},
+        output={'reasoning': 'appended reasoning'},
+    ))
+    assert 'appended reasoning' in formatter.format_prompt_prefix(reasoning_prompt)
+
 
 def test_explanation_generator_generate(prompt: Prompt):
     generated_reasoning = 'Generated reasoning'
@@ -147,3 +158,21 @@ def test_reasoning_prompt_transformer_transform_prompt(prompt: Prompt):
             }),
         ],
     )
+
+
+def test_reasoning_prompt_transformer_does_not_share_values(prompt: Prompt):
+    prompt.template.output['test output parameter name'] = ['a']
+    text_llm = FunctionBasedTextLLM(generate_text_by_text=lambda s: 'Generated reasoning')
+    prompt_transformer = PromptWithReasoningTransformer(
+        reasoning_extractor=TextLLMReasoningExtractor(text_llm=text_llm, reasoning_template='Explanation Template'),
+    )
+    original = prompt.copy_me()
+
+    prompt_with_reasoning = prompt_transformer.transform_prompt(prompt)
+    prompt_with_reasoning.input_parameters[0].description = 'changed'
+    prompt_with_reasoning.template.input['test input parameter name'] = 'changed'
+    prompt_with_reasoning.template.output['test output parameter name'].append('b')
+    prompt_with_reasoning.examples[0].input['test input parameter name'] = 'changed'
+    prompt_with_reasoning.examples[0].output['test output parameter name'] = 'changed'
+
+    assert prompt == original
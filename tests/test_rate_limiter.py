@@ -0,0 +1,306 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from promptogen.model.llm import FunctionBasedAsyncTextLLM, FunctionBasedTextLLM
+from promptogen.model.prompt_runner import AsyncTextLLMPromptRunner, TextLLMPromptRunner
+from promptogen.prompt_collection.prompts.text_summarizer import TextSummarizerPrompt
+from promptogen.prompt_formatter.key_value_formatter import KeyValuePromptFormatter
+from promptogen.text_llm import (
+    ConcurrencyLimiter,
+    RateLimitedTextLLM,
+    RateLimiter,
+    TokenBucket,
+    estimate_tokens,
+    shared_rate_limiter,
+)
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(1) == pytest.approx(0.2, abs=0.01)
+
+
+def test_token_bucket_adjust():
+    bucket = TokenBucket(rate=1, capacity=10)
+    bucket.adjust(15)
+
+    assert bucket.available() == pytest.approx(-5, abs=0.01)
+
+    bucket.adjust(-100)
+
+    assert bucket.available() == 10
+
+
+def test_token_bucket_invalid_args():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, capacity=1)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, capacity=0)
+
+
+def _track_concurrency():
+    lock = threading.Lock()
+    state = {'running': 0, 'max': 0}
+
+    def enter():
+        with lock:
+            state['running'] += 1
+            state['max'] = max(state['max'], state['running'])
+
+    def leave():
+        with lock:
+            state['running'] -= 1
+
+    return state, enter, leave
+
+
+def test_concurrency_limiter_threads():
+    limiter = ConcurrencyLimiter(2)
+    state, enter, leave = _track_concurrency()
+
+    def work(_):
+        limiter.acquire()
+        try:
+            enter()
+            time.sleep(0.01)
+            leave()
+        finally:
+            limiter.release()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(work, range(16)))
+
+    assert state['max'] == 2
+    assert limiter.in_use() == 0
+
+
+def test_concurrency_limiter_async_and_threads():
+    limiter = ConcurrencyLimiter(3)
+    state, enter, leave = _track_concurrency()
+
+    def thread_work():
+        for _ in range(5):
+            limiter.acquire()
+            enter()
+            time.sleep(0.005)
+            leave()
+            limiter.release()
+
+    async def async_work():
+        await limiter.aacquire()
+        enter()
+        await asyncio.sleep(0.005)
+        leave()
+        limiter.release()
+
+    async def main():
+        await asyncio.gather(*[async_work() for _ in range(20)])
+
+    threads = [threading.Thread(target=thread_work) for _ in range(3)]
+    for t in threads:
+        t.start()
+    asyncio.run(main())
+    for t in threads:
+        t.join()
+
+    assert state['max'] <= 3
+    assert limiter.in_use() == 0
+
+
+def test_concurrency_limiter_async_cancel():
+    limiter = ConcurrencyLimiter(1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiting() == 0
+        limiter.release()
+        await asyncio.wait_for(limiter.aacquire(), timeout=1)
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert limiter.in_use() == 0
+
+
+def test_concurrency_limiter_async_cancel_after_handover():
+    limiter = ConcurrencyLimiter(1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        # hand the slot over, let _wake_future set the result, then cancel before the waiter resumes
+        limiter.release()
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.in_use() == 0
+        await asyncio.wait_for(limiter.aacquire(), timeout=1)
+        limiter.release()
+
+    asyncio.run(main())
+
+    assert limiter.in_use() == 0
+
+
+def test_rate_limiter_tokens_per_minute():
+    # 10 tokens per second, one token per character
+    limiter = RateLimiter(tokens_per_minute=600, estimate_tokens=len)
+
+    start = time.monotonic()
+    with limiter.limit('x' * 600):
+        pass
+    with limiter.limit('x' * 2):
+        pass
+
+    assert time.monotonic() - start >= 0.15
+    stats = limiter.stats()
+    assert stats.requests == 2
+    assert stats.tokens == 602
+    assert stats.max_wait >= 0.15
+    assert stats.in_flight == 0
+    assert stats.queue_depth == 0
+
+
+def test_rate_limiter_record_output():
+    limiter = RateLimiter(tokens_per_minute=600, estimate_tokens=len, expected_output_tokens=100)
+
+    with limiter.limit('x' * 100):
+        assert limiter.token_bucket is not None
+        assert limiter.token_bucket.available() == pytest.approx(400, abs=1)
+    limiter.record_output('x' * 300)
+
+    assert limiter.token_bucket.available() == pytest.approx(200, abs=1)
+    assert limiter.stats().tokens == 400
+
+
+def test_rate_limiter_queue_depth():
+    limiter = RateLimiter(max_concurrency=1)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def hold():
+        with limiter.limit('a'):
+            entered.set()
+            release.wait()
+
+    def wait():
+        with limiter.limit('b'):
+            pass
+
+    t1 = threading.Thread(target=hold)
+    t1.start()
+    entered.wait()
+    t2 = threading.Thread(target=wait)
+    t2.start()
+    time.sleep(0.05)
+
+    assert limiter.stats().in_flight == 1
+    assert limiter.stats().queue_depth == 1
+
+    release.set()
+    t1.join()
+    t2.join()
+
+    assert limiter.stats().requests == 2
+    assert limiter.stats().queue_depth == 0
+
+
+def test_rate_limiter_cancelled_while_waiting():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, max_concurrency=1, estimate_tokens=len)
+
+    async def main():
+        async with limiter.alimit('x' * 100):
+            # waits for the concurrency slot
+            waiter = asyncio.ensure_future(limiter.alimit('x' * 200).__aenter__())
+            await asyncio.sleep(0.01)
+            assert limiter.stats().queue_depth == 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        # waits for the token bucket
+        waiter = asyncio.ensure_future(limiter.alimit('x' * 600).__aenter__())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+
+    stats = limiter.stats()
+    assert stats.requests == 1
+    assert stats.tokens == 100
+    assert stats.in_flight == 0
+    assert stats.queue_depth == 0
+    assert limiter.concurrency is not None and limiter.concurrency.in_use() == 0
+    assert limiter.request_bucket is not None and limiter.request_bucket.available() == pytest.approx(59, abs=0.1)
+    assert limiter.token_bucket is not None and limiter.token_bucket.available() == pytest.approx(500, abs=1)
+
+
+def test_rate_limited_text_llm_sync_runner():
+    limiter = RateLimiter(requests_per_minute=60, max_concurrency=2)
+    llm = RateLimitedTextLLM(FunctionBasedTextLLM(lambda _: 'summary: a summary'), limiter)
+    runner = TextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter())
+
+    results = runner.run_prompt_batch(TextSummarizerPrompt(), [{'text': f'text {i}'} for i in range(4)])
+
+    assert results == [{'summary': 'a summary'}] * 4
+    assert limiter.stats().requests == 4
+    assert llm.identity() == llm.llm.identity()
+
+
+def test_rate_limited_text_llm_async_runner():
+    limiter = RateLimiter(max_concurrency=2)
+    state, enter, leave = _track_concurrency()
+
+    async def agenerate(_: str) -> str:
+        enter()
+        await asyncio.sleep(0.01)
+        leave()
+        return 'summary: a summary'
+
+    llm = RateLimitedTextLLM(FunctionBasedAsyncTextLLM(agenerate), limiter)
+    runner = AsyncTextLLMPromptRunner(llm=llm, formatter=KeyValuePromptFormatter())
+
+    results = asyncio.run(runner.arun_prompt_batch(TextSummarizerPrompt(), [{'text': f't{i}'} for i in range(6)]))
+
+    assert results == [{'summary': 'a summary'}] * 6
+    assert state['max'] == 2
+    assert runner.async_text_llm is llm
+    with pytest.raises(TypeError):
+        llm.generate('sync call to an async-only LLM')
+
+
+def test_rate_limited_text_llm_wraps_sync_llm_for_async_callers():
+    limiter = RateLimiter()
+    llm = RateLimitedTextLLM(FunctionBasedTextLLM(lambda s: s.upper()), limiter)
+
+    assert asyncio.run(llm.agenerate('abc')) == 'ABC'
+    assert list(llm.generate_stream('abc')) == ['ABC']
+    assert limiter.stats().requests == 2
+
+
+def test_shared_rate_limiter():
+    limiter = shared_rate_limiter('test-provider', requests_per_minute=10)
+
+    assert shared_rate_limiter('test-provider') is limiter
+    assert shared_rate_limiter('other-provider') is not limiter
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens('x' * 400) == 101
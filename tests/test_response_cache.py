@@ -0,0 +1,205 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+from promptogen.model.llm import FunctionBasedTextLLM, TextLLM
+from promptogen.model.prompt_runner import TextLLMPromptRunner
+from promptogen.model.response_cache import CachedResponse, response_cache_key
+from promptogen.prompt_collection.prompts.text_summarizer import TextSummarizerPrompt
+from promptogen.prompt_formatter.key_value_formatter import KeyValuePromptFormatter
+from promptogen.response_cache import InMemoryResponseCache, SQLiteResponseCache
+from promptogen.text_llm import RateLimitedTextLLM, RateLimiter, SingleFlightTextLLM
+
+
+def test_response_cache_key():
+    llm = FunctionBasedTextLLM(lambda s: s)
+    other_llm = FunctionBasedTextLLM(str.upper)
+
+    assert response_cache_key(llm, 'request') == response_cache_key(llm, 'request')
+    assert response_cache_key(llm, 'request') != response_cache_key(llm, 'other request')
+    assert response_cache_key(llm, 'request') != response_cache_key(other_llm, 'request')
+
+
+def _echo(s: str) -> str:
+    return s
+
+
+def test_llm_identity():
+    def make(model: str):
+        def gen(s: str) -> str:
+            return f'{model}: {s}'
+
+        return FunctionBasedTextLLM(gen)
+
+    closure_llm = make('a')
+    assert closure_llm.identity() == closure_llm.identity()
+    assert closure_llm.identity() != make('b').identity()
+    assert FunctionBasedTextLLM(lambda s: s).identity() != FunctionBasedTextLLM(lambda s: s).identity()
+
+    assert FunctionBasedTextLLM(_echo).identity() == f'{__name__}._echo'
+    assert FunctionBasedTextLLM(lambda s: s, identity='model-a').identity() == 'model-a'
+
+
+def test_llm_identity_of_subclass_instances():
+    class ConfiguredLLM(TextLLM):
+        def __init__(self, model: str):
+            self.model = model
+
+        def generate(self, input_text: str) -> str:
+            return f'{self.model}: {input_text}'
+
+    llm = ConfiguredLLM('a')
+
+    assert llm.identity() == llm.identity()
+    assert llm.identity() != ConfiguredLLM('b').identity()
+    assert not llm.has_stable_identity()
+
+
+def test_llm_has_stable_identity():
+    class NamedLLM(TextLLM):
+        def generate(self, input_text: str) -> str:
+            return input_text
+
+        def identity(self) -> str:
+            return 'named'
+
+    assert NamedLLM().has_stable_identity()
+    assert FunctionBasedTextLLM(_echo).has_stable_identity()
+    assert FunctionBasedTextLLM(lambda s: s, identity='model-a').has_stable_identity()
+    assert not FunctionBasedTextLLM(lambda s: s).has_stable_identity()
+    assert RateLimitedTextLLM(FunctionBasedTextLLM(_echo), RateLimiter()).has_stable_identity()
+    assert not SingleFlightTextLLM(FunctionBasedTextLLM(lambda s: s)).has_stable_identity()
+
+
+def test_persistent_cache_requires_stable_identity():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'cache.sqlite3')
+        cache = SQLiteResponseCache(path)
+
+        with pytest.raises(ValueError, match='stable identity'):
+            TextLLMPromptRunner(llm=FunctionBasedTextLLM(lambda s: s), formatter=KeyValuePromptFormatter(), cache=cache)
+        with pytest.raises(ValueError, match='stable identity'):
+            TextLLMPromptRunner(
+                llm=FunctionBasedTextLLM(_echo),
+                formatter=KeyValuePromptFormatter(),
+                cache=cache,
+                hedge_llm=FunctionBasedTextLLM(lambda s: s),
+            )
+        in_memory = SQLiteResponseCache(':memory:')
+        TextLLMPromptRunner(llm=FunctionBasedTextLLM(lambda s: s), formatter=KeyValuePromptFormatter(), cache=in_memory)
+
+        calls = []
+
+        def generate(s: str) -> str:
+            calls.append(s)
+            return 'summary: ok'
+
+        for _ in range(2):
+            # a new LLM instance, as in a new process, finds the responses of the previous one
+            runner = TextLLMPromptRunner(
+                llm=FunctionBasedTextLLM(generate, identity='summarizer'),
+                formatter=KeyValuePromptFormatter(),
+                cache=cache,
+            )
+            assert runner.run_prompt(TextSummarizerPrompt(), {'text': 'text'}) == {'summary': 'ok'}
+        assert len(calls) == 1
+        cache.close()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache_factory(request):
+    with tempfile.TemporaryDirectory() as d:
+        def factory(**kwargs):
+            if request.param == 'memory':
+                return InMemoryResponseCache(**kwargs)
+            return SQLiteResponseCache(os.path.join(d, 'cache.sqlite3'), **kwargs)
+
+        yield factory
+
+
+def test_response_cache_get_set(cache_factory):
+    cache = cache_factory()
+    cache.set('key', CachedResponse(raw_response='raw', value={'a': [1, 2]}))
+
+    assert cache.get('key') == CachedResponse(raw_response='raw', value={'a': [1, 2]})
+    assert cache.get('missing') is None
+    assert cache.cache_info().hits == 1
+    assert cache.cache_info().misses == 1
+    assert cache.cache_info().currsize == 1
+
+    cache.clear()
+    assert cache.get('key') is None
+
+
+def test_response_cache_eviction(cache_factory):
+    cache = cache_factory(maxsize=2)
+    cache.set('a', CachedResponse(raw_response='a'))
+    time.sleep(0.01)
+    cache.set('b', CachedResponse(raw_response='b'))
+    time.sleep(0.01)
+    cache.get('a')
+    cache.set('c', CachedResponse(raw_response='c'))
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.cache_info().currsize == 2
+
+
+def test_response_cache_ttl(cache_factory):
+    cache = cache_factory(ttl=0.05)
+    cache.set('key', CachedResponse(raw_response='raw'))
+
+    assert cache.get('key') is not None
+    time.sleep(0.06)
+    assert cache.get('key') is None
+
+
+def test_in_memory_response_cache_returns_copies():
+    cache = InMemoryResponseCache()
+    cache.set('key', CachedResponse(raw_response='raw', value={'a': [1]}))
+    cache.get('key').value['a'].append(2)  # type: ignore
+
+    assert cache.get('key').value == {'a': [1]}  # type: ignore
+
+
+def test_sqlite_response_cache_persists():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'cache.sqlite3')
+        cache = SQLiteResponseCache(path)
+        cache.set('key', CachedResponse(raw_response='raw', value={'a': object()}))
+        cache.close()
+
+        cache = SQLiteResponseCache(path)
+        assert cache.get('key') == CachedResponse(raw_response='raw')
+        assert cache.cache_info().currsize == 1
+        cache.close()
+
+
+def test_sqlite_response_cache_shared_by_processes():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'cache.sqlite3')
+        # two connections to the same file, as two processes would have
+        caches = [SQLiteResponseCache(path, maxsize=3), SQLiteResponseCache(path, maxsize=3)]
+        for i in range(8):
+            caches[i % 2].set(f'key {i}', CachedResponse(raw_response=str(i)))
+            time.sleep(0.001)
+
+        assert [cache.cache_info().currsize for cache in caches] == [3, 3]
+        assert [caches[0].get(f'key {i}') is not None for i in range(8)] == [False] * 5 + [True] * 3
+        for cache in caches:
+            cache.close()
+
+
+def test_sqlite_response_cache_keeps_only_values_that_round_trip():
+    cache = SQLiteResponseCache(':memory:')
+    cache.set('list', CachedResponse(raw_response='raw', value={'a': [1, 2]}))
+    cache.set('tuple', CachedResponse(raw_response='raw', value={'a': (1, 2)}))
+    cache.set('int keys', CachedResponse(raw_response='raw', value={'a': {1: 'x'}}))
+
+    assert cache.get('list') == CachedResponse(raw_response='raw', value={'a': [1, 2]})
+    assert cache.get('tuple') == CachedResponse(raw_response='raw')
+    assert cache.get('int keys') == CachedResponse(raw_response='raw')
+    cache.close()
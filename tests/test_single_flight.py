@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from promptogen.model.llm import FunctionBasedAsyncTextLLM, FunctionBasedTextLLM
+from promptogen.model.prompt_runner import AsyncTextLLMPromptRunner, TextLLMPromptRunner
+from promptogen.prompt_collection.prompts.text_summarizer import TextSummarizerPrompt
+from promptogen.prompt_formatter.key_value_formatter import KeyValuePromptFormatter
+from promptogen.text_llm import SingleFlightTextLLM
+
+
+def _slow_llm(delay: float = 0.05):
+    calls = []
+    lock = threading.Lock()
+
+    def generate(input_text: str) -> str:
+        with lock:
+            calls.append(input_text)
+        time.sleep(delay)
+        return f'summary: {len(calls)}'
+
+    return FunctionBasedTextLLM(generate), calls
+
+
+def test_single_flight_threads():
+    llm, calls = _slow_llm()
+    single_flight = SingleFlightTextLLM(llm)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(single_flight.generate, ['a'] * 6 + ['b'] * 2))
+
+    assert sorted(calls) == ['a', 'b']
+    assert results[:6] == [results[0]] * 6
+    assert results[6:] == [results[6]] * 2
+    stats = single_flight.stats()
+    assert (stats.calls, stats.coalesced, stats.in_flight) == (2, 6, 0)
+
+
+def test_single_flight_sequential_calls_are_not_coalesced():
+    llm, calls = _slow_llm(delay=0)
+    single_flight = SingleFlightTextLLM(llm)
+
+    single_flight.generate('a')
+    single_flight.generate('a')
+
+    assert calls == ['a', 'a']
+
+
+def test_single_flight_error_is_shared():
+    calls = []
+
+    def generate(_: str) -> str:
+        calls.append(1)
+        time.sleep(0.05)
+        raise ConnectionError('reset')
+
+    single_flight = SingleFlightTextLLM(FunctionBasedTextLLM(generate))
+
+    def call(_):
+        with pytest.raises(ConnectionError):
+            single_flight.generate('a')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(call, range(4)))
+
+    assert len(calls) == 1
+
+
+def test_single_flight_asyncio():
+    calls = []
+
+    async def agenerate(input_text: str) -> str:
+        calls.append(input_text)
+        await asyncio.sleep(0.02)
+        return input_text.upper()
+
+    single_flight = SingleFlightTextLLM(FunctionBasedAsyncTextLLM(agenerate))
+
+    async def main():
+        return await asyncio.gather(*[single_flight.agenerate(t) for t in ['a', 'a', 'b', 'a']])
+
+    assert asyncio.run(main()) == ['A', 'A', 'B', 'A']
+    assert sorted(calls) == ['a', 'b']
+    with pytest.raises(TypeError):
+        single_flight.generate('a')
+
+
+def test_single_flight_cancelled_leader_does_not_fail_followers():
+    async def agenerate(input_text: str) -> str:
+        await asyncio.sleep(0.05)
+        return input_text.upper()
+
+    single_flight = SingleFlightTextLLM(FunctionBasedAsyncTextLLM(agenerate))
+
+    async def main():
+        leader = asyncio.ensure_future(single_flight.agenerate('a'))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.agenerate('a'))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == 'A'
+
+
+def test_single_flight_threads_and_asyncio_share_calls():
+    llm, calls = _slow_llm(delay=0.1)
+    single_flight = SingleFlightTextLLM(llm)
+
+    thread = threading.Thread(target=single_flight.generate, args=('a',))
+    thread.start()
+    time.sleep(0.02)
+
+    result = asyncio.run(single_flight.agenerate('a'))
+    thread.join()
+
+    assert result == 'summary: 1'
+    assert calls == ['a']
+
+
+def test_single_flight_runners():
+    llm, calls = _slow_llm()
+    single_flight = SingleFlightTextLLM(llm)
+    prompt = TextSummarizerPrompt()
+    formatter = KeyValuePromptFormatter()
+
+    results = TextLLMPromptRunner(llm=single_flight, formatter=formatter).run_prompt_batch(
+        prompt, [{'text': 'same'}] * 4
+    )
+    assert results == [{'summary': '1'}] * 4
+
+    results = asyncio.run(
+        AsyncTextLLMPromptRunner(llm=single_flight, formatter=formatter).arun_prompt_batch(
+            prompt, [{'text': 'same'}] * 4
+        )
+    )
+    assert results == [{'summary': '2'}] * 4
+    assert len(calls) == 2
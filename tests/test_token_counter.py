@@ -0,0 +1,67 @@
+import sys
+
+import pytest
+
+from promptogen.model.token_counter import (
+    FunctionBasedTokenCounter,
+    HeuristicTokenCounter,
+    PromptTooLargeError,
+    TokenCounter,
+    estimate_tokens,
+)
+from promptogen.token_counter import TiktokenTokenCounter
+
+
+def test_heuristic_token_counter():
+    counter = HeuristicTokenCounter()
+
+    assert counter.count('') == 1
+    assert counter.count('x' * 400) == 101
+    # non-ASCII characters count as one token each
+    assert counter.count('こんにちは') == 6
+    assert counter.count('abcd' * 10 + 'こんにちは') == 16
+    assert counter('x' * 400) == 101
+
+
+def test_heuristic_token_counter_chars_per_token():
+    assert HeuristicTokenCounter(chars_per_token=2).count('x' * 10) == 6
+
+    with pytest.raises(ValueError):
+        HeuristicTokenCounter(chars_per_token=0)
+
+
+def test_estimate_tokens_uses_the_heuristic():
+    assert estimate_tokens('x' * 400) == HeuristicTokenCounter().count('x' * 400)
+
+
+def test_function_based_token_counter():
+    counter = FunctionBasedTokenCounter(lambda s: len(s.split()))
+
+    assert isinstance(counter, TokenCounter)
+    assert counter.count('a b c') == 3
+
+    with pytest.raises(TypeError):
+        FunctionBasedTokenCounter('not callable')  # type: ignore
+
+
+def test_prompt_too_large_error():
+    error = PromptTooLargeError(120, 100)
+
+    assert isinstance(error, ValueError)
+    assert error.tokens == 120
+    assert error.max_tokens == 100
+
+
+def test_tiktoken_token_counter_requires_tiktoken(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setitem(sys.modules, 'tiktoken', None)
+
+    with pytest.raises(ImportError, match='pip install promptogen\\[tiktoken\\]'):
+        TiktokenTokenCounter()
+
+
+def test_tiktoken_token_counter():
+    pytest.importorskip('tiktoken')
+    counter = TiktokenTokenCounter()
+
+    assert counter.count('hello world') == 2
+    assert counter.count('<|endoftext|>') > 1
@@ -2,7 +2,10 @@ from typing import List, Tuple
 from pydantic import BaseModel
 import pytest
 
-from promptogen.prompt_formatter import JsonValueFormatter, KeyValueFormatter
+from promptogen.model.value_formatter import OutputFormatError
+from promptogen.prompt_formatter import JsonValueFormatter, KeyValueFormatter, TextValueFormatter
+from promptogen.prompt_formatter.json_formatter import find_code_block, remove_code_block
+from promptogen.prompt_formatter.key_value_formatter import KeyValueParser, compile_key_value_parser
 
 
 @pytest.fixture
@@ -68,6 +71,71 @@ def test_json_value_formatter_parse_invalid_json(output_keys: List[Tuple[str, ty
 {"test output parameter name": "test output parameter value", "test output parameter name 2": "test output parameter value 2""")
 
 
+def test_json_value_formatter_parse_keeps_backticks_in_values():
+    f = JsonValueFormatter()
+    value = {'code': '```python\nprint(1)\n```', 'inline': 'a ``` b'}
+
+    assert f.parse([('code', str), ('inline', str)], f.format(value)) == value
+    assert f.parse([('code', str)], f.format(value) + '\n') == value
+
+
+@pytest.mark.parametrize('output', [
+    'Here is the result:\n```json\n{"key": "a ``` b"}\n```\nHope it helps.',
+    'Sure! ```json\n{"key": "a ``` b"}``` Anything else? ```python\nprint(1)\n```',
+    '```JSON\n{"key": "a ``` b"}\n```',
+    '```\n{"key": "a ``` b"}\n```',
+    '  {"key": "a ``` b"}  ',
+])
+def test_json_value_formatter_parse_non_strict_ignores_chatter(output: str):
+    f = JsonValueFormatter(strict=False)
+
+    assert f.parse([('key', str)], output) == {'key': 'a ``` b'}
+
+
+@pytest.mark.parametrize('output', [
+    'Here is the result:\n```json\n{"key": "value"}\n```',
+    '```json\n{"key": "value"}\n```\nHope it helps.',
+    '```json',
+])
+def test_json_value_formatter_parse_strict_rejects_chatter(output: str):
+    f = JsonValueFormatter()
+
+    with pytest.raises(ValueError):
+        f.parse([('key', str)], output)
+
+
+def test_find_code_block():
+    s = '  ```json\n{"a": 1}\n```  '
+    start, end = find_code_block('json', s)
+
+    assert s[start:end] == '\n{"a": 1}\n'
+    start, end = find_code_block('json', s, strict=False)
+    assert s[start:end].strip() == '{"a": 1}'
+    assert find_code_block('json', 'no code block', strict=False) == (0, 13)
+    assert remove_code_block('json', 'text ```json\n{"a": "`"}\n``` text') == '{"a": "`"}'
+
+
+def test_json_value_formatter_incremental_parser_non_strict_ignores_trailing_text():
+    f = JsonValueFormatter(strict=False)
+    parser = f.incremental_parser([('key', str)])
+
+    assert parser.feed('```json\n{"key": "value"}\n```\nHope it helps.') == [('key', 'value')]
+    assert parser.close() == {'key': 'value'}
+
+
+@pytest.mark.parametrize('output', [
+    '{"key": "value"}\nHope it helps.',
+    '{"key": "value"}\n```\nHope it helps.',
+    'Here it is: {"key": "value"} and some more text.',
+])
+def test_json_value_formatter_incremental_parser_non_strict_closes_what_feed_accepted(output: str):
+    f = JsonValueFormatter(strict=False)
+    parser = f.incremental_parser([('key', str)])
+
+    assert parser.feed(output) == [('key', 'value')]
+    assert parser.close() == {'key': 'value'}
+
+
 def test_key_value_formatter_description():
     f = KeyValueFormatter()
 
@@ -193,3 +261,130 @@ def test_key_value_formatter_parse_invalid_output():
 
     with pytest.raises(TypeError):
         f.parse([('key1', str)], 1) # type: ignore
+
+
+def test_key_value_formatter_parse_reuses_compiled_parser():
+    assert compile_key_value_parser([('key1', str), ('key2', int)]) is compile_key_value_parser([('key1', str), ('key2', int)])
+    assert compile_key_value_parser([('key1', str)]) is not compile_key_value_parser([('key1', int)])
+
+
+def test_key_value_formatter_parse_special_characters_in_key():
+    f = KeyValueFormatter()
+
+    assert f.parse([('a (b)', str), ('c*', int)], """a (b): 'value'
+c*: 3""") == {
+        'a (b)': 'value',
+        'c*': 3,
+    }
+
+
+def test_key_value_parser_split():
+    parser = KeyValueParser([('key1', str), ('key2', list)])
+
+    assert parser.split("""key1: 'value1'
+key2: [1, 2]""") == ["'value1'", '[1, 2]']
+
+    with pytest.raises(ValueError):
+        parser.split("""key2: [1, 2]""")
+
+
+def _feed_all(parser, chunks):
+    completed = []
+    for chunk in chunks:
+        completed.extend(parser.feed(chunk))
+    return completed, parser.close()
+
+
+def test_key_value_formatter_incremental_parser():
+    f = KeyValueFormatter()
+    output = """key1: 'value1'
+key2: [1, 2]
+key3: 'value3'"""
+    parser = f.incremental_parser([('key1', str), ('key2', list), ('key3', str)])
+
+    assert parser.feed(output[:10]) == []
+    assert parser.feed(output[10:17]) == []
+    assert parser.feed(output[17:22]) == [('key1', 'value1')]
+
+    completed, value = _feed_all(parser, [output[22:32], output[32:]])
+    assert completed == [('key2', [1, 2])]
+    assert value == {'key1': 'value1', 'key2': [1, 2], 'key3': 'value3'}
+
+
+def test_key_value_formatter_incremental_parser_single_characters():
+    f = KeyValueFormatter()
+    output = """key1: 'value1'
+key2: 'value2'"""
+
+    completed, value = _feed_all(f.incremental_parser([('key1', str), ('key2', str)]), list(output))
+
+    assert completed == [('key1', 'value1')]
+    assert value == f.parse([('key1', str), ('key2', str)], output)
+
+
+def test_json_value_formatter_incremental_parser():
+    f = JsonValueFormatter()
+    output = """```json
+{
+ "key1": "a \\"quoted\\" {value}, with comma",
+ "key2": {"nested": [1, {"x": "]"}]},
+ "ignored": 1,
+ "key3": 3
+}```"""
+    output_keys = [('key1', str), ('key2', dict), ('key3', int)]
+
+    completed, value = _feed_all(f.incremental_parser(output_keys), list(output))
+
+    assert completed == [
+        ('key1', 'a "quoted" {value}, with comma'),
+        ('key2', {'nested': [1, {'x': ']'}]}),
+        ('key3', 3),
+    ]
+    assert value == f.parse(output_keys, output)
+
+
+def test_json_value_formatter_incremental_parser_validates_on_close(output_keys: List[Tuple[str, type]]):
+    f = JsonValueFormatter(strict=False)
+    parser = f.incremental_parser(output_keys)
+    parser.feed('{"test output parameter name": "value"}')
+
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_text_value_formatter_incremental_parser():
+    f = TextValueFormatter('text')
+
+    completed, value = _feed_all(f.incremental_parser([('text', str)]), ['some ', 'text'])
+
+    assert completed == []
+    assert value == {'text': 'some text'}
+
+
+@pytest.mark.parametrize('chunks', [
+    ['{"test output parameter name": "value"}'],
+    ['``', '`JSON\n{'],
+    ['```json\n{"test output parameter name": "value"} and more'],
+    ['```json\n{"test output parameter name": nope,'],
+])
+def test_json_value_formatter_incremental_parser_aborts_early(output_keys: List[Tuple[str, type]], chunks: List[str]):
+    parser = JsonValueFormatter().incremental_parser(output_keys)
+
+    with pytest.raises(OutputFormatError):
+        for chunk in chunks:
+            parser.feed(chunk)
+
+
+def test_json_value_formatter_incremental_parser_accepts_valid_prefix(output_keys: List[Tuple[str, type]]):
+    parser = JsonValueFormatter().incremental_parser(output_keys)
+
+    for chunk in ['  `', '``js', 'on\n{"test output parameter name": "value",', '}', '\n`', '``\n']:
+        parser.feed(chunk)
+
+
+def test_key_value_formatter_incremental_parser_aborts_early():
+    parser = KeyValueFormatter().incremental_parser([('key1', list), ('key2', str)])
+
+    with pytest.raises(OutputFormatError):
+        parser.feed("""key1: [1, 2
+key2: 'value2'""")